@@ -1,17 +1,36 @@
-from backend.extensions import db, login_manager, csrf, migrate
+from backend.extensions import db, login_manager, csrf, migrate, fragment_cache, sql_instrumentation, replica_router, rate_limiter, user_cache, view_counter, job_queue, socketio, presence
 from backend.config import Config
+from backend import db_profiles, startup
 from flask import Flask, redirect, url_for, render_template
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 
 def create_app(*args,**kwargs):
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config.update(kwargs)  # per-instance overrides (benchmarks, scripts)
+    if app.config["TRUSTED_PROXY_HOPS"]:
+        hops = app.config["TRUSTED_PROXY_HOPS"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
 
     # Initialize extensions
+    db_profiles.configure_app(app)
     db.init_app(app)
+    db_profiles.install_app_pragmas(app, db)
+    replica_router.init_app(app, db)
     login_manager.init_app(app)
     csrf.init_app(app)
     migrate.init_app(app, db)
+    fragment_cache.init_app(app)
+    sql_instrumentation.init_app(app, db)
+    rate_limiter.init_app(app)
+    user_cache.init_app(app, db)
+    view_counter.init_app(app, db)
+    presence.init_app(app, db)
+    job_queue.init_app(app, db)
+    socketio.init_app(app, async_mode=app.config["SOCKETIO_ASYNC_MODE"],
+                      message_queue=app.config["SOCKETIO_MESSAGE_QUEUE"])
+    startup.init_templates(app)  # Jinja bytecode cache, before anything is compiled
 
     
     # Login manager configuration
@@ -36,6 +55,37 @@ def create_app(*args,**kwargs):
     app.register_blueprint(profile_bp)
     app.register_blueprint(notifications_bp)  # <- register notifications blueprint
 
+    # Socket.IO event handlers (conversation rooms, typing, read receipts)
+    from backend import realtime  # noqa: F401
+
+    # ORM queries skip soft-deleted users, posts and comments (opt out: include_deleted)
+    from backend import soft_delete  # noqa: F401
+
+    # CLI commands
+    from backend.seed import seed_command
+    from backend.db_routing import replica_sync_command
+    from backend.tags import reconcile_tags_command
+    from backend.ranking import rank_decay_command
+    from backend.geo import geocode_command
+    from backend.matching import rematch_command
+    from backend.wishlist import wishlist_alerts_command
+    from backend.lifecycle import archive_listings_command
+    from backend.jobs import worker_command, jobs_command
+    from backend.index_advisor import index_advisor_command
+    from backend.impact import impact_rebuild_command
+    app.cli.add_command(seed_command)
+    app.cli.add_command(replica_sync_command)
+    app.cli.add_command(reconcile_tags_command)
+    app.cli.add_command(rank_decay_command)
+    app.cli.add_command(geocode_command)
+    app.cli.add_command(rematch_command)
+    app.cli.add_command(wishlist_alerts_command)
+    app.cli.add_command(archive_listings_command)
+    app.cli.add_command(worker_command)
+    app.cli.add_command(jobs_command)
+    app.cli.add_command(index_advisor_command)
+    app.cli.add_command(impact_rebuild_command)
+
     # Context processor to inject models into templates globally
     @app.context_processor
     def inject_models():
@@ -49,4 +99,8 @@ def create_app(*args,**kwargs):
         
         return render_template('landing.html')
 
+    # compile templates and configure mappers here (once in a preloading master), not on the first requests
+    if app.config["STARTUP_WARM_UP"]:
+        startup.warm_up(app)
+
     return app
@@ -0,0 +1,76 @@
+# benchmarks/common.py
+"""Helpers shared by the benchmark scripts: percentiles, result files, comparisons."""
+from datetime import datetime
+import json
+import os
+import platform
+import subprocess
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "bench_results")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies):
+    """p50/p95/p99/mean/max in milliseconds for a list of durations in seconds."""
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(**extra):
+    return {
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **extra,
+    }
+
+
+def write_results(name, payload, path=None):
+    """Write ``payload`` as JSON (default ``bench_results/<name>-<timestamp>.json``) and return the path."""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+    with open(path, "w") as fh:
+        json.dump(payload, fh, indent=2, sort_keys=True, default=str)
+    return path
+
+
+def load_results(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def compare(current, baseline, metric="p95_ms", threshold=0.2):
+    """Yield (key, old, new, ratio) for entries whose ``metric`` grew by more than ``threshold``."""
+    for key, new in current.items():
+        old = baseline.get(key)
+        if not old or metric not in old or metric not in new or not old[metric]:
+            continue
+        ratio = new[metric] / old[metric]
+        if ratio > 1 + threshold:
+            yield key, old[metric], new[metric], ratio
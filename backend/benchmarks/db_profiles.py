@@ -0,0 +1,165 @@
+# benchmarks/db_profiles.py
+"""Read/write concurrency per engine profile.
+
+Each profile gets its own seeded database. Reader processes run the
+community feed query in a loop while writer processes insert comments and
+toggle upvotes, the same mix that hurts under gunicorn. Processes (not
+threads) are used so every worker has its own connection and file locks
+behave like separate gunicorn workers.
+
+    python -m backend.benchmarks.db_profiles --readers 6 --writers 2 --seconds 10
+    python -m backend.benchmarks.db_profiles --profile postgres --database-uri postgresql://...
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from backend.benchmarks.common import run_metadata, summarize, write_results
+
+
+def _engine(database_uri, profile):
+    from sqlalchemy import create_engine
+
+    from backend.db_profiles import (
+        ENGINE_PROFILES, engine_options, install_pragmas, install_transaction_settings, server_settings,
+    )
+
+    engine = create_engine(database_uri, **engine_options(profile, database_uri))
+    install_pragmas(engine, ENGINE_PROFILES[profile].get("pragmas"))
+    if ENGINE_PROFILES[profile].get("timeouts_per_transaction"):
+        install_transaction_settings(engine, server_settings(profile))
+    return engine
+
+
+def _reader(database_uri, profile, seconds, results):
+    from sqlalchemy import text
+
+    engine = _engine(database_uri, profile)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(
+                    "SELECT p.id, p.title, count(c.id) FROM posts p "
+                    "LEFT JOIN comments c ON c.post_id = p.id "
+                    "WHERE p.is_deleted = 0 GROUP BY p.id ORDER BY p.created_at DESC LIMIT 50"
+                )).all()
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            errors += 1
+    results.put(("read", latencies, errors))
+
+
+def _writer(database_uri, profile, seconds, post_ids, user_ids, results):
+    from sqlalchemy import text
+
+    engine = _engine(database_uri, profile)
+    rng = random.Random(os.getpid())
+    latencies, errors = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        post_id, user_id = rng.choice(post_ids), rng.choice(user_ids)
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "INSERT INTO comments (post_id, user_id, content, created_at, updated_at, is_deleted) "
+                    "VALUES (:post_id, :user_id, 'bench', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, false)"
+                ), {"post_id": post_id, "user_id": user_id})
+                conn.execute(text("UPDATE posts SET comment_count = coalesce(comment_count, 0) + 1 WHERE id = :id"),
+                             {"id": post_id})
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            errors += 1
+    results.put(("write", latencies, errors))
+
+
+def prepare(database_uri, scale):
+    """Seed a fresh database with the app's schema; return (post_ids, user_ids)."""
+    from backend.benchmarks.routes import build_app
+    from backend.extensions import db
+    from backend.models import Post, User
+    from backend.seed import DEFAULT_VOLUMES, generate
+
+    app = build_app(database_uri, DB_PROFILE="sqlite-default" if database_uri.startswith("sqlite") else "auto")
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generate({k: int(v * scale) for k, v in DEFAULT_VOLUMES.items()})
+        post_ids = [pid for (pid,) in db.session.query(Post.id)]
+        user_ids = [uid for (uid,) in db.session.query(User.id)]
+        db.engine.dispose()
+    return post_ids, user_ids
+
+
+def run_profile(database_uri, profile, readers, writers, seconds, scale):
+    post_ids, user_ids = prepare(database_uri, scale)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=_reader, args=(database_uri, profile, seconds, results)) for _ in range(readers)]
+    processes += [
+        context.Process(target=_writer, args=(database_uri, profile, seconds, post_ids, user_ids, results))
+        for _ in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    collected = {"read": ([], 0), "write": ([], 0)}
+    for _ in processes:
+        kind, latencies, errors = results.get()
+        collected[kind] = (collected[kind][0] + latencies, collected[kind][1] + errors)
+    for process in processes:
+        process.join()
+
+    report = {}
+    for kind, (latencies, errors) in collected.items():
+        report[kind] = summarize(latencies)
+        report[kind].update(ops_per_s=round(len(latencies) / seconds, 1), errors=errors)
+    return report
+
+
+def main(argv=None):
+    from backend.db_profiles import ENGINE_PROFILES
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--profile", action="append", choices=sorted(ENGINE_PROFILES),
+                        help="Profile to test; repeatable (default: sqlite-default and sqlite-wal).")
+    parser.add_argument("--database-uri", help="Required for postgres profiles; SQLite uses scratch files.")
+    parser.add_argument("--readers", type=int, default=6)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--scale", type=float, default=0.2)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="w2v-dbprof-")
+    profiles = {}
+    for profile in args.profile or ["sqlite-default", "sqlite-wal"]:
+        if profile.startswith("sqlite"):
+            database_uri = "sqlite:///" + os.path.join(workdir, f"{profile}.db")
+        elif args.database_uri:
+            database_uri = args.database_uri
+        else:
+            parser.error(f"--database-uri is required for profile {profile}")
+        profiles[profile] = run_profile(database_uri, profile, args.readers, args.writers, args.seconds, args.scale)
+        for kind in ("read", "write"):
+            r = profiles[profile][kind]
+            print(f"{profile:<20} {kind:<5} ops/s={r['ops_per_s']:>9.1f} p50={r.get('p50_ms', 0):>8.2f}ms "
+                  f"p95={r.get('p95_ms', 0):>8.2f}ms p99={r.get('p99_ms', 0):>8.2f}ms errors={r['errors']}")
+
+    results = {
+        "meta": run_metadata(readers=args.readers, writers=args.writers, seconds=args.seconds, scale=args.scale),
+        "profiles": profiles,
+    }
+    print(f"\nresults written to {write_results('db_profiles', results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+# benchmarks/geo.py
+"""Radius and nearest-neighbour search over a large synthetic listing table.
+
+Bulk-inserts ``--listings`` rows (default one million) clustered around the
+gazetteer's settlements into a scratch database, then times, per radius:
+
+* ``cells``: :func:`backend.geo.within` pruning through ``ix_listings_geo_cell``;
+* ``bbox``: the same search forced onto the latitude/longitude range;
+* ``scan``: every row's coordinates read and filtered in NumPy (the baseline
+  the index replaces; run for fewer iterations since it is slow);
+
+plus :func:`backend.geo.nearest` for ``k`` = 10.
+
+    python -m backend.benchmarks.geo
+    python -m backend.benchmarks.geo --listings 200000 --iterations 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from backend.benchmarks.common import run_metadata, summarize, write_results
+
+
+RADII_KM = (5, 20, 100, 300)
+INSERT_BATCH = 50000
+
+
+def populate(app, listings, seed):
+    """Fill a fresh schema with one owner and ``listings`` geocoded listings."""
+    from backend import geo
+    from backend.extensions import db
+    from backend.models import Listing, ListingTypeEnum, RoleEnum, User
+
+    rng = random.Random(seed)
+    places = geo._settlements()[0]
+    types = list(ListingTypeEnum)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        owner = User(username="bench", email="bench@example.com", role=RoleEnum.producer)
+        owner.set_password("bench")
+        db.session.add(owner)
+        db.session.commit()
+
+        table = Listing.__table__
+        started = time.perf_counter()
+        for first in range(0, listings, INSERT_BATCH):
+            rows = []
+            for i in range(first, min(first + INSERT_BATCH, listings)):
+                place = rng.choice(places)
+                latitude = max(-89.9, min(89.9, rng.gauss(place.latitude, 0.15)))
+                longitude = max(-179.9, min(179.9, rng.gauss(place.longitude, 0.15)))
+                rows.append({
+                    "title": f"listing {i}",
+                    "slug": f"listing-{i}",
+                    "listing_type": rng.choice(types),
+                    "owner_id": owner.id,
+                    "is_active": True,
+                    "location": place.name,
+                    "region": place.region,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "geo_cell": geo.cell_id(latitude, longitude),
+                })
+            db.session.execute(table.insert(), rows)
+            db.session.commit()
+        geo.analyze(Listing)  # as `flask geocode` does after a backfill
+        return places, time.perf_counter() - started
+
+
+def _time(fn, centres):
+    latencies, found = [], 0
+    for latitude, longitude in centres:
+        started = time.perf_counter()
+        found += len(fn(latitude, longitude))
+        latencies.append(time.perf_counter() - started)
+    report = summarize(latencies)
+    report["mean_results"] = round(found / max(len(centres), 1), 1)
+    return report
+
+
+def _scan(latitude, longitude, radius_km):
+    import numpy as np
+
+    from backend import geo
+    from backend.extensions import db
+    from backend.models import Listing
+
+    rows = db.session.query(Listing.id, Listing.latitude, Listing.longitude).filter(Listing.is_active == True).all()
+    coordinates = np.array([(r[1], r[2]) for r in rows], dtype=np.float64)
+    distances = geo.haversine_km(latitude, longitude, coordinates[:, 0], coordinates[:, 1])
+    return np.flatnonzero(distances <= radius_km)
+
+
+def run(app, places, iterations, scan_iterations, seed):
+    from backend import geo
+    from backend.models import Listing
+
+    rng = random.Random(seed + 1)
+    centres = [
+        (place.latitude + rng.uniform(-0.05, 0.05), place.longitude + rng.uniform(-0.05, 0.05))
+        for place in (rng.choice(places) for _ in range(iterations))
+    ]
+    report = {}
+    with app.app_context():
+        active = Listing.query.filter(Listing.is_active == True)
+        for radius in RADII_KM:
+            report[f"within {radius}km cells"] = _time(
+                lambda lat, lon: geo.within(active, Listing, lat, lon, radius), centres)
+
+            max_cells, geo.MAX_CELLS = geo.MAX_CELLS, 0
+            try:
+                report[f"within {radius}km bbox"] = _time(
+                    lambda lat, lon: geo.within(active, Listing, lat, lon, radius), centres)
+            finally:
+                geo.MAX_CELLS = max_cells
+
+            report[f"within {radius}km scan"] = _time(
+                lambda lat, lon: _scan(lat, lon, radius), centres[:scan_iterations])
+        report["nearest k=10"] = _time(lambda lat, lon: geo.nearest(active, Listing, lat, lon, 10), centres)
+    return report
+
+
+def main(argv=None):
+    from backend.benchmarks.routes import build_app
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-uri", help="Database to fill (default: a scratch SQLite file).")
+    parser.add_argument("--listings", type=int, default=1000000)
+    parser.add_argument("--iterations", type=int, default=50, help="Search centres per radius.")
+    parser.add_argument("--scan-iterations", type=int, default=3, help="Centres for the full-scan baseline.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    database_uri = args.database_uri or "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="w2v-geo-"), "geo.db")
+    app = build_app(database_uri, SQL_SAMPLE_RATE=0.0, FRAGMENT_CACHE_ENABLED=False)
+    places, insert_seconds = populate(app, args.listings, args.seed)
+    print(f"inserted {args.listings} listings in {insert_seconds:.1f}s")
+
+    report = run(app, places, args.iterations, args.scan_iterations, args.seed)
+    for name, r in report.items():
+        print(f"{name:<24} n={r['count']:>4} p50={r.get('p50_ms', 0):>9.2f}ms p95={r.get('p95_ms', 0):>9.2f}ms "
+              f"results={r['mean_results']:>9.1f}")
+
+    results = {
+        "meta": run_metadata(listings=args.listings, iterations=args.iterations, insert_seconds=round(insert_seconds, 1)),
+        "searches": report,
+    }
+    print(f"\nresults written to {write_results('geo', results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# benchmarks/rate_limit.py
+"""Overhead of the rate limiter (target: well under 100µs per request).
+
+Three measurements:
+
+* ``backend``: cost of one ``hit()`` per backend, single process,
+* ``contended``: ``hit()`` on the shared backend from several processes at
+  once, as gunicorn workers would,
+* ``request``: median latency of a limited vs an unlimited route through the
+  test client; the difference is what a request pays for the decorator.
+
+    python -m backend.benchmarks.rate_limit --iterations 200000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from backend.benchmarks.common import run_metadata, summarize, write_results
+
+
+def _time_hits(backend, iterations, keys):
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter_ns()
+        backend.hit(f"bench:{i % keys}", 1e9, 1e9, time.time())
+        samples.append((time.perf_counter_ns() - t0) / 1e9)
+    total = time.perf_counter() - started
+    result = summarize(samples)
+    result["mean_us"] = round(total / iterations * 1e6, 2)
+    result["p99_us"] = round(result.pop("p99_ms") * 1000, 2)
+    for key in ("p50_ms", "p95_ms", "max_ms", "mean_ms"):
+        result.pop(key)
+    return result
+
+
+def _contended_worker(path, iterations, keys, results):
+    from backend.rate_limit import SharedMemoryBackend
+
+    backend = SharedMemoryBackend(path=path)
+    results.put(_time_hits(backend, iterations, keys))
+
+
+def bench_backends(iterations, keys, path):
+    from backend.rate_limit import MemoryBackend, SharedMemoryBackend
+
+    return {
+        "memory": _time_hits(MemoryBackend(), iterations, keys),
+        "shared": _time_hits(SharedMemoryBackend(path=path), iterations, keys),
+    }
+
+
+def bench_contended(iterations, keys, path, processes):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_contended_worker, args=(path, iterations, keys, results)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    per_process = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return {
+        "processes": processes,
+        "mean_us": round(sum(r["mean_us"] for r in per_process) / processes, 2),
+        "p99_us": max(r["p99_us"] for r in per_process),
+    }
+
+
+def bench_request(iterations, path):
+    from backend.benchmarks.routes import build_app
+    from backend.extensions import rate_limiter
+
+    app = build_app(
+        "sqlite://",
+        RATELIMIT_ENABLED=True,
+        RATELIMIT_BACKEND="shared",
+        RATELIMIT_SHARED_PATH=path,
+        RATELIMITS={"bench": "1000000000/second"},
+        SQL_SAMPLE_RATE=0.0,
+    )
+
+    @app.route("/_bench/plain", methods=["POST"])
+    def plain():
+        return "ok"
+
+    @app.route("/_bench/limited", methods=["POST"])
+    @rate_limiter.limit("bench", per="ip")
+    def limited():
+        return "ok"
+
+    client = app.test_client()
+    urls = ("/_bench/plain", "/_bench/limited")
+    samples = {url: [] for url in urls}
+    for round_ in range(2):  # the first round is warm-up
+        for _ in range(iterations):
+            for url in urls:  # interleaved, so drift hits both routes equally
+                started = time.perf_counter()
+                client.post(url)
+                if round_:
+                    samples[url].append(time.perf_counter() - started)
+
+    plain, limited = summarize(samples[urls[0]]), summarize(samples[urls[1]])
+    return {
+        "plain": plain,
+        "limited": limited,
+        "overhead_us": round((limited["p50_ms"] - plain["p50_ms"]) * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--keys", type=int, default=5000, help="Distinct bucket keys to cycle through.")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--request-iterations", type=int, default=3000)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(prefix="w2v-rl-"), "buckets")
+    results = {
+        "meta": run_metadata(iterations=args.iterations, keys=args.keys),
+        "backend": bench_backends(args.iterations, args.keys, path),
+        "contended": bench_contended(args.iterations // args.processes, args.keys, path, args.processes),
+        "request": bench_request(args.request_iterations, path),
+    }
+
+    for name, r in results["backend"].items():
+        print(f"hit() {name:<8} mean={r['mean_us']:.2f}µs p99={r['p99_us']:.2f}µs")
+    c = results["contended"]
+    print(f"hit() shared x{c['processes']} processes mean={c['mean_us']:.2f}µs p99={c['p99_us']:.2f}µs")
+    print(f"per-request decorator overhead: {results['request']['overhead_us']:.1f}µs")
+    print(f"\nresults written to {write_results('rate_limit', results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
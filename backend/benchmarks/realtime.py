@@ -0,0 +1,140 @@
+# benchmarks/realtime.py
+"""Messages per second through Socket.IO versus the form POST + reload.
+
+Creates one conversation with a sender and ``--listeners`` other
+participants, each connected with Flask-SocketIO's test client, then times:
+
+* ``socket``: ``send_message`` with an ack (store, broadcast to the room,
+  acknowledge) for ``--messages`` messages; every listener must receive
+  every message, or the run fails;
+* ``http``: the old path, a form POST followed by the redirect and a full
+  render of the (growing) conversation, for ``--http-messages`` messages.
+
+Both run in this one process, so the rates are per worker, without the
+network. Rate limits are off.
+
+    python -m backend.benchmarks.realtime
+    python -m backend.benchmarks.realtime --messages 5000 --listeners 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from backend.benchmarks.common import run_metadata, summarize, write_results
+
+
+def populate(app, listeners):
+    """One sender and ``listeners`` recipients in a single group conversation; return (conversation, user ids)."""
+    from backend.extensions import db
+    from backend.models import Conversation, User
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        users = []
+        for i in range(listeners + 1):
+            user = User(username=f"bench{i}", email=f"bench{i}@example.com")
+            user.set_password("bench")
+            users.append(user)
+        conversation = Conversation(is_group=listeners > 1, participants=users)
+        db.session.add(conversation)
+        db.session.commit()
+        return conversation.id, [user.id for user in users]
+
+
+def _socket_client(app, user_id):
+    from backend.benchmarks.routes import login
+    from backend.extensions import socketio
+
+    client = app.test_client()
+    login(client, user_id)
+    return socketio.test_client(app, flask_test_client=client)
+
+
+def run_socket(app, conversation_id, user_ids, messages):
+    sender, *listeners = [_socket_client(app, user_id) for user_id in user_ids]
+    for client in [sender, *listeners]:
+        ack = client.emit("join", {"conversation_id": conversation_id}, callback=True)
+        if not (ack and ack["ok"]):
+            raise RuntimeError(f"join failed: {ack}")
+        client.get_received()  # drop connection noise
+
+    latencies, failed = [], 0
+    started = time.perf_counter()
+    for i in range(messages):
+        sent = time.perf_counter()
+        ack = sender.emit("send_message", {"conversation_id": conversation_id, "content": f"message {i}",
+                                           "client_id": str(i)}, callback=True)
+        latencies.append(time.perf_counter() - sent)
+        failed += not (ack and ack["ok"])
+    elapsed = time.perf_counter() - started
+
+    delivered = [sum(1 for packet in client.get_received() if packet["name"] == "message") for client in listeners]
+    for client in [sender, *listeners]:
+        client.disconnect()
+    if failed or any(count != messages for count in delivered):
+        raise RuntimeError(f"{failed} send(s) failed; listeners received {delivered} of {messages}")
+    report = summarize(latencies)
+    report.update(messages_per_second=round(messages / elapsed, 1), listeners=len(listeners),
+                  deliveries_per_second=round(messages * len(listeners) / elapsed, 1))
+    return report
+
+
+def run_http(app, conversation_id, user_id, messages):
+    from backend.benchmarks.routes import login
+
+    client = app.test_client()
+    login(client, user_id)
+    url = f"/messages/{conversation_id}"
+    latencies = []
+    started = time.perf_counter()
+    for i in range(messages):
+        sent = time.perf_counter()
+        response = client.post(url, data={"content": f"form message {i}"}, follow_redirects=True)
+        latencies.append(time.perf_counter() - sent)
+        if response.status_code != 200:
+            raise RuntimeError(f"POST {url} returned {response.status_code}")
+    elapsed = time.perf_counter() - started
+    report = summarize(latencies)
+    report["messages_per_second"] = round(messages / elapsed, 1)
+    return report
+
+
+def main(argv=None):
+    from backend.benchmarks.routes import build_app
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-uri", help="Database to fill (default: a scratch SQLite file).")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages sent over the socket.")
+    parser.add_argument("--http-messages", type=int, default=200, help="Messages sent with the form POST.")
+    parser.add_argument("--listeners", type=int, default=3, help="Other connected participants.")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    database_uri = args.database_uri or "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="w2v-rt-"), "rt.db")
+    app = build_app(database_uri, SQL_SAMPLE_RATE=0.0, SOCKETIO_ASYNC_MODE="threading")
+    conversation_id, user_ids = populate(app, args.listeners)
+
+    report = {
+        "socket": run_socket(app, conversation_id, user_ids, args.messages),
+        "http": run_http(app, conversation_id, user_ids[0], args.http_messages),
+    }
+    for name, r in report.items():
+        print(f"{name:<8} n={r['count']:>6} {r['messages_per_second']:>9.1f} msg/s "
+              f"p50={r['p50_ms']:>8.2f}ms p95={r['p95_ms']:>8.2f}ms")
+    print(f"socket delivers {report['socket']['deliveries_per_second']:.0f} message(s)/s to "
+          f"{report['socket']['listeners']} listener(s)")
+
+    results = {
+        "meta": run_metadata(database=database_uri.split("://")[0], messages=args.messages,
+                             http_messages=args.http_messages, listeners=args.listeners),
+        "paths": report,
+    }
+    print(f"\nresults written to {write_results('realtime', results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
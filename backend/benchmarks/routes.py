@@ -0,0 +1,308 @@
+# benchmarks/routes.py
+"""Per-route benchmark through the Flask test client.
+
+Seeds a scratch database (see ``backend/seed.py``), then drives every GET
+route of every blueprint, plus the hot write endpoints, as a logged-in
+power user. For each route it reports p50/p95/p99 latency, queries per
+request (from the ``X-SQL-Stats`` header) and peak Python memory, and saves
+everything as JSON so two runs can be compared:
+
+    python -m backend.benchmarks.routes --scale 0.5
+    python -m backend.benchmarks.routes --compare bench_results/routes-<old>.json
+
+``--check-budgets`` renders with the fragment cache off and fails when a
+route issues more queries than its entry in ``QUERY_BUDGETS``. The budgets
+do not depend on the seed volume, so a new N+1 fails at any ``--scale``.
+``tests/test_query_budgets.py`` runs the same check under pytest.
+
+``--capture-sql FILE`` records the statement shapes the routes run, with
+sample parameters, as input for ``flask index-advisor`` (``backend/index_advisor.py``).
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from backend.benchmarks.common import compare, load_results, run_metadata, summarize, write_results
+
+
+_STATS = re.compile(r"queries=(\d+); time_ms=([\d.]+); n_plus_one=(\d+)")
+
+# Writes worth timing; each entry is (endpoint, method, form data).
+WRITE_SCENARIOS = [
+    ("community.upvote_post", "POST", {}),
+    ("community.post_comment", "POST", {"content": "Benchmark comment"}),
+    ("messaging.view_conversation", "POST", {"content": "Benchmark message"}),
+]
+
+# Most queries a request may issue, by "METHOD endpoint" (cold fragment cache,
+# logged in; includes the session's user load and flush/commit statements).
+QUERY_BUDGETS = {
+    "GET community.ask_post": 0,
+    "GET community.community": 4,
+    "GET community.tag_cloud": 1,
+    "GET community.tag_posts": 4,
+    "GET community.view_post": 4,
+    "GET dashboard.main_dashboard": 12,
+    "GET dashboard.impact_json": 4,  # rollups only: by type, category, region, month
+    "GET dashboard.impact_page": 4,
+    "GET marketplace.create_listing": 1,
+    "GET marketplace.marketplace": 1,
+    "GET marketplace.matches": 3,
+    "GET marketplace.view_listing": 2,
+    "GET marketplace.view_wishlist": 1,
+    "GET messaging.conversations": 3,
+    "GET messaging.search_messages": 1,
+    "GET messaging.view_conversation": 4,
+    "GET notifications.list_notifications": 1,
+    "GET profile.online_users": 0,  # presence store only
+    "GET profile.profile": 1,
+    "POST community.post_comment": 5,
+    "POST community.upvote_post": 5,  # 4 when the voter is the author (no notification job)
+    "POST messaging.view_conversation": 3,  # nothing reloads after the commit
+}
+
+# Routes that are not worth timing (redirect-only, or would end the session).
+SKIP_ENDPOINTS = {"static", "auth.logout", "sql_debug"}
+
+
+def build_app(database_uri, **overrides):
+    from backend.app import create_app
+
+    config = {
+        "SQLALCHEMY_DATABASE_URI": database_uri,
+        "SECRET_KEY": "benchmark",
+        "WTF_CSRF_ENABLED": False,
+        "TESTING": True,
+        "PROPAGATE_EXCEPTIONS": False,  # record 500s instead of aborting the run
+        "SQL_SAMPLE_RATE": 1.0,
+        "SQL_STATS_HEADER": True,
+        "RATELIMIT_ENABLED": False,  # repeated writes would otherwise measure 429s
+    }
+    config.update(overrides)
+    return create_app(**config)
+
+
+def sample_values(app, user_id):
+    """Concrete URL arguments taken from the seeded data, seen from ``user_id``."""
+    from sqlalchemy import func
+
+    from backend.extensions import db
+    from backend.models import Listing, Post, Tag, User, Notification, Conversation, conversation_participants
+
+    with app.app_context():
+        hottest = (
+            db.session.query(Post.id, Post.slug)
+            .outerjoin(Post.comments)
+            .group_by(Post.id, Post.slug)
+            .order_by(func.count().desc())
+            .first()
+        )
+        tag_slug = db.session.query(Tag.slug).order_by(Tag.post_count.desc(), Tag.id).limit(1).scalar()
+        listing_slug = db.session.query(Listing.slug).filter_by(is_active=True).order_by(Listing.id).limit(1).scalar()
+        username = db.session.get(User, user_id).username
+        other_user = db.session.query(User.id).filter(User.id != user_id).order_by(User.id).limit(1).scalar()
+        note_id = db.session.query(Notification.id).filter_by(user_id=user_id).order_by(Notification.id).limit(1).scalar()
+        conversation_id = (
+            db.session.query(Conversation.id)
+            .join(conversation_participants)
+            .filter(conversation_participants.c.user_id == user_id)
+            .order_by(Conversation.id)
+            .limit(1)
+            .scalar()
+        )
+
+    post_id, post_slug = hottest if hottest else (None, None)
+    return {
+        "community.view_post": {"slug": post_slug},
+        "community.post_comment": {"slug": post_slug},
+        "community.tag_posts": {"slug": tag_slug},
+        "community.upvote_post": {"post_id": post_id},
+        "marketplace.view_listing": {"slug": listing_slug},
+        "profile.profile": {"username": username},
+        "notifications.read_notification": {"note_id": note_id},
+        "messaging.view_conversation": {"conversation_id": conversation_id},
+        "messaging.new_conversation": {"user_id": other_user},
+        "messaging.search_messages": {"q": "plastic"},  # a common seed word: a full page and a next link
+    }
+
+
+def discover_routes(app, values):
+    """Yield (endpoint, method, url, data) for every routable blueprint GET plus WRITE_SCENARIOS."""
+    from flask import url_for
+
+    skipped = []
+    targets = []
+    with app.test_request_context():
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.endpoint):
+            if rule.endpoint in SKIP_ENDPOINTS or "GET" not in rule.methods:
+                continue
+            args = dict(values.get(rule.endpoint, {}))  # keys beyond the rule's become the query string
+            if any(args.get(name) is None for name in rule.arguments):
+                skipped.append(rule.endpoint)
+                continue
+            targets.append((rule.endpoint, "GET", url_for(rule.endpoint, **args), None))
+
+        for endpoint, method, data in WRITE_SCENARIOS:
+            if endpoint not in app.view_functions:
+                continue
+            args = values.get(endpoint, {})
+            if any(value is None for value in args.values()):
+                skipped.append(f"{method} {endpoint}")
+                continue
+            targets.append((endpoint, method, url_for(endpoint, **args), data))
+    return targets, skipped
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def measure(client, method, url, data, iterations, warmup):
+    for _ in range(warmup):
+        client.open(url, method=method, data=data)
+
+    latencies, queries, sql_ms, statuses, n_plus_one = [], [], [], set(), 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = client.open(url, method=method, data=data)
+        latencies.append(time.perf_counter() - started)
+        statuses.add(response.status_code)
+        match = _STATS.search(response.headers.get("X-SQL-Stats", ""))
+        if match:
+            queries.append(int(match.group(1)))
+            sql_ms.append(float(match.group(2)))
+            n_plus_one = max(n_plus_one, int(match.group(3)))
+
+    # Memory is measured on a separate request: tracemalloc would distort the timings above.
+    tracemalloc.start()
+    client.open(url, method=method, data=data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = summarize(latencies)
+    result.update(
+        url=url,
+        method=method,
+        status=sorted(statuses),
+        queries=max(queries) if queries else None,
+        sql_ms_mean=round(sum(sql_ms) / len(sql_ms), 3) if sql_ms else None,
+        n_plus_one=n_plus_one,
+        peak_kib=round(peak / 1024, 1),
+    )
+    return result
+
+
+def power_user(app):
+    """The user with the most posts: the worst case for per-user pages."""
+    from sqlalchemy import func
+
+    from backend.extensions import db
+    from backend.models import Post
+
+    with app.app_context():
+        return (
+            db.session.query(Post.user_id)
+            .group_by(Post.user_id)
+            .order_by(func.count().desc())
+            .limit(1)
+            .scalar()
+        )
+
+
+def over_budget(routes, budgets=QUERY_BUDGETS):
+    """Yield (key, queries, budget) for every measured route above its query budget."""
+    for key, budget in sorted(budgets.items()):
+        queries = routes.get(key, {}).get("queries")
+        if queries is not None and queries > budget:
+            yield key, queries, budget
+
+
+def run(database_uri, scale=1.0, seed=42, iterations=30, warmup=3, reseed=True, **overrides):
+    from backend.extensions import db
+    from backend.seed import DEFAULT_VOLUMES, generate
+
+    app = build_app(database_uri, **overrides)
+    seeded = None
+    if reseed:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            seeded = generate({k: int(v * scale) for k, v in DEFAULT_VOLUMES.items()}, seed=seed)
+
+    user_id = power_user(app)
+    targets, skipped = discover_routes(app, sample_values(app, user_id))
+
+    client = app.test_client()
+    login(client, user_id)
+
+    routes = {}
+    for endpoint, method, url, data in targets:
+        key = f"{method} {endpoint}"
+        routes[key] = measure(client, method, url, data, iterations, warmup)
+        r = routes[key]
+        print(f"{key:<45} p50={r['p50_ms']:>8.2f}ms p95={r['p95_ms']:>8.2f}ms "
+              f"p99={r['p99_ms']:>8.2f}ms queries={r['queries']} peak={r['peak_kib']}KiB status={r['status']}")
+
+    return {
+        "meta": run_metadata(database=database_uri.split("://")[0], scale=scale, seed=seed,
+                             iterations=iterations, warmup=warmup, user_id=user_id, seeded=seeded),
+        "routes": routes,
+        "skipped": skipped,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-uri", help="Database to benchmark (default: a scratch SQLite file).")
+    parser.add_argument("--scale", type=float, default=1.0, help="Seed volume multiplier.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--no-seed", action="store_true", help="Benchmark the database as it is.")
+    parser.add_argument("--output", help="Result file (default: bench_results/routes-<timestamp>.json).")
+    parser.add_argument("--compare", help="Previous result file; report routes whose p95 regressed.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regression threshold for --compare.")
+    parser.add_argument("--check-budgets", action="store_true",
+                        help="Fail when a route exceeds its QUERY_BUDGETS entry (fragment cache off).")
+    parser.add_argument("--capture-sql", metavar="FILE",
+                        help="Append the query shapes (with sample parameters) to FILE for `flask index-advisor`.")
+    args = parser.parse_args(argv)
+    logging.getLogger("backend.sql").setLevel(logging.ERROR)  # N+1s are in the results already
+
+    database_uri = args.database_uri
+    if database_uri is None:
+        database_uri = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="w2v-bench-"), "bench.db")
+
+    overrides = {"FRAGMENT_CACHE_ENABLED": False} if args.check_budgets else {}
+    if args.capture_sql:
+        overrides.update(SQL_CAPTURE_FILE=args.capture_sql, SQL_CAPTURE_PARAMETERS=True)
+    results = run(database_uri, args.scale, args.seed, args.iterations, args.warmup,
+                  reseed=not args.no_seed, **overrides)
+    path = write_results("routes", results, args.output)
+    print(f"\nresults written to {path}")
+    if results["skipped"]:
+        print("skipped (no sample arguments): " + ", ".join(results["skipped"]))
+
+    failed = False
+    if args.compare:
+        regressions = list(compare(results["routes"], load_results(args.compare)["routes"], threshold=args.threshold))
+        for key, old, new, ratio in regressions:
+            print(f"REGRESSION {key}: p95 {old:.2f}ms -> {new:.2f}ms (x{ratio:.2f})")
+        failed = failed or bool(regressions)
+    if args.check_budgets:
+        exceeded = list(over_budget(results["routes"]))
+        for key, queries, budget in exceeded:
+            print(f"OVER BUDGET {key}: {queries} queries (budget {budget})")
+        failed = failed or bool(exceeded)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+# benchmarks/soak.py
+"""Concurrent soak test against a real gunicorn server.
+
+Seeds a database, starts ``gunicorn "backend.app:create_app()"`` once per
+worker class (``sync`` and ``eventlet`` by default) and ramps virtual users
+through mixed journeys (browse, upvote, comment, message, upload avatar).
+Every virtual user is a separate seeded account with its own cookie jar
+and goes through the real login form and CSRF tokens.
+
+Per worker class and concurrency level it reports throughput, error rate,
+p50/p95/p99 latency and the database time of write requests taken from the
+``X-SQL-Stats`` header (SQL + COMMIT time, which is where SQLite write-lock
+and busy_timeout waits land). Results are saved as JSON like the route
+benchmark:
+
+    python -m backend.benchmarks.soak --levels 1,8,32 --stage-seconds 20
+    python -m backend.benchmarks.soak --database-uri postgresql://... --worker-class sync
+"""
+import argparse
+from http.cookiejar import CookieJar
+import io
+import os
+import random
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from backend.benchmarks.common import run_metadata, summarize, write_results
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_CSRF_META = re.compile(r'name="csrf-token" content="([^"]+)"')
+_POST_ID = re.compile(r'data-post-id="(\d+)"')
+_POST_SLUG = re.compile(r'href="/community/([\w-]+-[0-9a-f]+)"')
+_CONVERSATION = re.compile(r'href="/messages/(\d+)"')
+_STATS = re.compile(r"time_ms=([\d.]+);.*commit_ms=([\d.]+)")
+
+# journey -> relative weight
+JOURNEYS = {
+    "browse": 55,
+    "upvote": 15,
+    "comment": 12,
+    "message": 12,
+    "upload_avatar": 6,
+}
+
+WORKER_SETTINGS = {
+    "sync": ["--worker-class", "sync"],
+    "eventlet": ["--worker-class", "eventlet", "--worker-connections", "1000"],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def tiny_png():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (40, 160, 90)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class Recorder:
+    """Thread-safe sample sink for one stage."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []  # (journey, step, latency, status, db_seconds or None)
+
+    def add(self, *sample):
+        with self.lock:
+            self.samples.append(sample)
+
+    def report(self, elapsed):
+        with self.lock:
+            samples = list(self.samples)
+        errors = [s for s in samples if s[3] == 0 or s[3] >= 500]
+        throttled = [s for s in samples if s[3] == 429]
+        write_db = [s[4] for s in samples if s[1] != "GET" and s[4] is not None]
+        by_journey = {}
+        for journey, _, latency, _, _ in samples:
+            by_journey.setdefault(journey, []).append(latency)
+        return {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(len(errors) / len(samples), 4) if samples else 0.0,
+            "errors": len(errors),
+            "throttled": len(throttled),
+            "latency": summarize([s[2] for s in samples]),
+            "write_db_time": summarize(write_db),
+            "journeys": {name: summarize(values) for name, values in by_journey.items()},
+        }
+
+
+class VirtualUser:
+    """One logged-in browser: cookie jar, CSRF token and the ids it has seen."""
+
+    def __init__(self, base_url, email, password, avatar, timeout=30):
+        self.base_url = base_url
+        self.email = email
+        self.password = password
+        self.avatar = avatar
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        self.csrf = None
+        self.post_ids, self.post_slugs, self.conversations = [], [], []
+        self.rng = random.Random()
+
+    def request(self, recorder, journey, method, path, data=None, headers=None, body=None):
+        headers = dict(headers or {})
+        if method != "GET" and self.csrf:
+            headers["X-CSRFToken"] = self.csrf
+        if data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+
+        started = time.perf_counter()
+        status, text, db_seconds = 0, "", None
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                status, text = response.status, response.read().decode("utf-8", "replace")
+                stats = response.headers.get("X-SQL-Stats")
+        except urllib.error.HTTPError as exc:
+            status, stats = exc.code, exc.headers.get("X-SQL-Stats")
+        except (urllib.error.URLError, OSError):
+            stats = None
+        latency = time.perf_counter() - started
+
+        match = _STATS.search(stats or "")
+        if match:
+            db_seconds = (float(match.group(1)) + float(match.group(2))) / 1000
+        if recorder is not None:
+            recorder.add(journey, method, latency, status, db_seconds)
+
+        token = _CSRF_META.search(text)
+        if token:
+            self.csrf = token.group(1)
+        return status, text
+
+    def login(self):
+        self.request(None, "login", "GET", "/auth/login")
+        status, _ = self.request(None, "login", "POST", "/auth/login", {"email": self.email, "password": self.password})
+        _, community = self.request(None, "login", "GET", "/community")
+        self.post_ids = _POST_ID.findall(community)
+        self.post_slugs = _POST_SLUG.findall(community)
+        _, inbox = self.request(None, "login", "GET", "/messages")
+        self.conversations = _CONVERSATION.findall(inbox)
+        return status == 200
+
+    # ----------------------------
+    # Journeys
+    # ----------------------------
+    def browse(self, recorder):
+        self.request(recorder, "browse", "GET", "/community")
+        self.request(recorder, "browse", "GET", "/marketplace")
+        if self.post_slugs:
+            self.request(recorder, "browse", "GET", f"/community/{self.rng.choice(self.post_slugs)}")
+        self.request(recorder, "browse", "GET", "/dashboard")
+
+    def upvote(self, recorder):
+        if self.post_ids:
+            self.request(recorder, "upvote", "POST", f"/community/upvote/{self.rng.choice(self.post_ids)}", {})
+
+    def comment(self, recorder):
+        if self.post_slugs:
+            slug = self.rng.choice(self.post_slugs)
+            self.request(recorder, "comment", "POST", f"/community/comment/{slug}", {"content": "Soak test comment"})
+
+    def message(self, recorder):
+        if self.conversations:
+            conv = self.rng.choice(self.conversations)
+            self.request(recorder, "message", "POST", f"/messages/{conv}", {"content": "Soak test message"})
+
+    def upload_avatar(self, recorder):
+        self.request(recorder, "upload_avatar", "GET", "/profile/edit")
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"csrf_token\"\r\n\r\n{self.csrf}\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"avatar\"; filename=\"soak.png\"\r\n"
+            f"Content-Type: image/png\r\n\r\n"
+        ).encode() + self.avatar + f"\r\n--{boundary}--\r\n".encode()
+        self.request(recorder, "upload_avatar", "POST", "/profile/upload-avatar", body=body,
+                     headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+    def run(self, recorder, stop):
+        names, weights = zip(*JOURNEYS.items())
+        while not stop.is_set():
+            getattr(self, self.rng.choices(names, weights=weights)[0])(recorder)
+
+
+def prepare_database(database_uri, scale, reseed):
+    """Seed the database and return (email, password) pairs of users with conversations."""
+    from backend.benchmarks.routes import build_app
+    from backend.extensions import db
+    from backend.models import User, conversation_participants
+    from backend.seed import DEFAULT_VOLUMES, generate
+
+    app = build_app(database_uri)
+    with app.app_context():
+        if reseed:
+            db.drop_all()
+            db.create_all()
+            generate({k: int(v * scale) for k, v in DEFAULT_VOLUMES.items()})
+        emails = [
+            email for (email,) in db.session.query(User.email)
+            .join(conversation_participants, conversation_participants.c.user_id == User.id)
+            .distinct()
+            .order_by(User.email)
+        ]
+        db.engine.dispose()
+    return [(email, "password") for email in emails]
+
+
+def start_server(worker_class, workers, database_uri, workdir, extra_env=None):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "DATABASE_URL": database_uri,
+        "SECRET_KEY": env.get("SECRET_KEY") or "soak-test",
+        "SQL_SAMPLE_RATE": "1",
+        "SQL_STATS_HEADER": "1",  # off by default outside debug mode
+    })
+    env.update(extra_env or {})
+    # uploads are written relative to the cwd, so run the server from a scratch directory
+    cmd = [
+        sys.executable, "-m", "gunicorn", "backend.app:create_app()",
+        "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+        "--log-level", "warning", *WORKER_SETTINGS[worker_class],
+    ]
+    process = subprocess.Popen(cmd, cwd=workdir, env=env, start_new_session=True)
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn ({worker_class}) exited with {process.returncode}")
+        try:
+            urllib.request.urlopen(base_url + "/auth/login", timeout=1).read()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"gunicorn ({worker_class}) did not start within 30s")
+
+
+def stop_server(process):
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+
+
+def ramp(base_url, accounts, levels, stage_seconds):
+    """Run one stage per concurrency level, adding virtual users as the level rises."""
+    avatar = tiny_png()
+    users, stages = [], {}
+    for level in levels:
+        while len(users) < level:
+            email, password = accounts[len(users) % len(accounts)]
+            user = VirtualUser(base_url, email, password, avatar)
+            user.login()
+            users.append(user)
+
+        recorder, stop = Recorder(), threading.Event()
+        threads = [threading.Thread(target=u.run, args=(recorder, stop), daemon=True) for u in users[:level]]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(stage_seconds)
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=60)
+        stages[str(level)] = recorder.report(time.perf_counter() - started)
+
+        s = stages[str(level)]
+        print(f"  concurrency={level:<4} rps={s['throughput_rps']:>8.1f} errors={s['error_rate']:.2%} "
+              f"p50={s['latency'].get('p50_ms', 0):.1f}ms p95={s['latency'].get('p95_ms', 0):.1f}ms "
+              f"p99={s['latency'].get('p99_ms', 0):.1f}ms write-db-p95={s['write_db_time'].get('p95_ms', 0):.1f}ms")
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-uri", help="Database to test (default: a scratch SQLite file).")
+    parser.add_argument("--worker-class", action="append", choices=sorted(WORKER_SETTINGS),
+                        help="Worker class to test; repeatable (default: sync and eventlet).")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn worker processes.")
+    parser.add_argument("--levels", default="1,4,16,32", help="Comma-separated concurrency levels.")
+    parser.add_argument("--stage-seconds", type=float, default=15)
+    parser.add_argument("--scale", type=float, default=0.2, help="Seed volume multiplier.")
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the server, e.g. --env DB_PROFILE=sqlite-wal.")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="w2v-soak-")
+    os.makedirs(os.path.join(workdir, "static", "uploads", "avatars"))
+    os.makedirs(os.path.join(workdir, "static", "uploads", "posts"))
+    database_uri = args.database_uri or "sqlite:///" + os.path.join(workdir, "soak.db")
+    levels = [int(level) for level in args.levels.split(",")]
+    extra_env = dict(item.split("=", 1) for item in args.env)
+
+    accounts = prepare_database(database_uri, args.scale, reseed=not args.no_seed)
+    if not accounts:
+        parser.error("no users with conversations in the database; seed it first")
+
+    results = {
+        "meta": run_metadata(database=database_uri.split("://")[0], workers=args.workers, levels=levels,
+                             stage_seconds=args.stage_seconds, scale=args.scale, env=extra_env),
+        "worker_classes": {},
+    }
+    try:
+        for worker_class in args.worker_class or ["sync", "eventlet"]:
+            print(f"{worker_class} x{args.workers}")
+            process, base_url = start_server(worker_class, args.workers, database_uri, workdir, extra_env)
+            try:
+                results["worker_classes"][worker_class] = ramp(base_url, accounts, levels, args.stage_seconds)
+            finally:
+                stop_server(process)
+    finally:
+        if args.database_uri is None:
+            results["meta"]["workdir"] = workdir
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\nresults written to {write_results('soak', results, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
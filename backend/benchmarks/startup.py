@@ -0,0 +1,212 @@
+# benchmarks/startup.py
+"""Worker cold start: import time, create_app and time to first byte.
+
+Each run is a fresh interpreter (the ``.pyc`` files are warm, as after a
+deploy's first boot) that imports ``backend.app``, calls ``create_app`` and
+requests a few pages through the test client, anonymous ones and then, as a
+seeded user, the main logged-in ones. Scenarios:
+
+* ``cold``: no Jinja bytecode cache, no warm-up. Each template is parsed and
+  compiled on its first request, as before ``backend/startup.py``;
+* ``bytecode_cache``: the on-disk bytecode cache, filled by an earlier boot;
+* ``warm_up``: bytecode cache plus ``STARTUP_WARM_UP``. ``create_app`` compiles
+  the templates and configures the mappers, so the first request does not;
+* ``preload``: as ``warm_up``, then the process forks and the child serves.
+  This is a worker under gunicorn's ``preload_app``, whose boot cost is
+  only the fork.
+
+``ttfb_ms`` is the time from the start of the import (or from the fork)
+to the first response. Medians over ``--repeat`` runs:
+
+    python -m backend.benchmarks.startup
+    python -m backend.benchmarks.startup --compare bench_results/startup-<old>.json --imports 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from backend.benchmarks.common import compare, load_results, run_metadata, write_results
+
+
+ANONYMOUS_URLS = ["/", "/auth/login", "/auth/register"]
+USER_URLS = ["/dashboard", "/marketplace", "/community", "/messages"]
+
+# Runs in the child interpreter; prints one JSON line.
+_CHILD = r"""
+import json, os, sys, time
+started = time.perf_counter()
+import backend.app
+imported = time.perf_counter()
+options = json.loads(sys.argv[1])
+app = backend.app.create_app(**options["config"])
+created = time.perf_counter()
+
+
+def serve(since):
+    from backend.benchmarks.routes import login
+    client = app.test_client()
+    first, timings = None, {}
+    for url in options["anonymous_urls"] + options["user_urls"]:
+        if url == options["user_urls"][0]:
+            login(client, options["user_id"])
+        sent = time.perf_counter()
+        status = client.get(url).status_code
+        timings[url] = (time.perf_counter() - sent) * 1000
+        first = first or (time.perf_counter() - since) * 1000
+        if status != 200:
+            raise SystemExit(f"GET {url} returned {status}")
+    return first, timings
+
+
+result = {"import_ms": (imported - started) * 1000, "create_app_ms": (created - imported) * 1000}
+if options["fork"]:
+    read_end, write_end = os.pipe()
+    forked = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        ttfb, timings = serve(forked)
+        os.write(write_end, json.dumps([ttfb, timings]).encode())
+        os._exit(0)
+    os.close(write_end)
+    chunks = []
+    while chunk := os.read(read_end, 65536):
+        chunks.append(chunk)
+    os.waitpid(pid, 0)
+    result["ttfb_ms"], result["first_request_ms"] = json.loads(b"".join(chunks))
+else:
+    result["ttfb_ms"], result["first_request_ms"] = serve(started)
+print(json.dumps(result))
+"""
+
+SCENARIOS = {
+    "cold": {"JINJA_BYTECODE_CACHE_DIR": "", "STARTUP_WARM_UP": False},
+    "bytecode_cache": {"STARTUP_WARM_UP": False},
+    "warm_up": {"STARTUP_WARM_UP": True},
+    "preload": {"STARTUP_WARM_UP": True},
+}
+
+
+def prepare(database_uri):
+    """Seed a small database; return a user id for the logged-in pages."""
+    from backend.benchmarks.routes import build_app, power_user
+    from backend.extensions import db
+    from backend.seed import DEFAULT_VOLUMES, generate
+
+    app = build_app(database_uri, SQL_SAMPLE_RATE=0.0)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generate({k: max(1, int(v * 0.02)) for k, v in DEFAULT_VOLUMES.items()}, seed=42)
+    return power_user(app)
+
+
+def boot(config, user_id, fork=False, python_args=()):
+    """One fresh interpreter; returns the child's timings plus the process wall time."""
+    options = {"config": config, "user_id": user_id, "fork": fork,
+               "anonymous_urls": ANONYMOUS_URLS, "user_urls": USER_URLS}
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = {**os.environ, "PYTHONPATH": root}
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, *python_args, "-c", _CHILD, json.dumps(options)],
+                               capture_output=True, text=True, env=env, cwd=root)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"boot failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_ms"] = wall_ms
+    return result, completed.stderr
+
+
+def median_of(runs):
+    report = {key: round(statistics.median(run[key] for run in runs), 2)
+              for key in ("import_ms", "create_app_ms", "ttfb_ms", "process_ms")}
+    report["first_request_ms"] = {
+        url: round(statistics.median(run["first_request_ms"][url] for run in runs), 2)
+        for url in runs[0]["first_request_ms"]
+    }
+    report["runs"] = len(runs)
+    return report
+
+
+def slowest_imports(stderr, count):
+    """The ``count`` largest cumulative entries of ``-X importtime`` output, two levels deep."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            entries.append((name.strip(), round(int(cumulative) / 1000, 2)))
+    return sorted(entries, key=lambda entry: -entry[1])[:count]
+
+
+def run(database_uri, repeat=5, imports=0, scenarios=tuple(SCENARIOS)):
+    user_id = prepare(database_uri)
+    cache_dir = tempfile.mkdtemp(prefix="w2v-jinja-bench-")
+    base = {"SQLALCHEMY_DATABASE_URI": database_uri, "SECRET_KEY": "benchmark", "TESTING": True,
+            "WTF_CSRF_ENABLED": False, "SQL_SAMPLE_RATE": 0.0, "PRESENCE_FLUSH_INTERVAL": 0,
+            "VIEW_COUNTER_FLUSH_INTERVAL": 0, "JINJA_BYTECODE_CACHE_DIR": cache_dir}
+
+    boot(base, user_id)  # fills the bytecode cache (and warms the OS file cache)
+    runs = {name: [] for name in scenarios}
+    for _ in range(repeat):  # round-robin, so drift in machine load hits every scenario alike
+        for name in scenarios:
+            runs[name].append(boot({**base, **SCENARIOS[name]}, user_id, fork=name == "preload")[0])
+    report = {}
+    for name in scenarios:
+        report[name] = median_of(runs[name])
+        r = report[name]
+        print(f"{name:<15} import={r['import_ms']:>7.1f}ms create_app={r['create_app_ms']:>7.1f}ms "
+              f"ttfb={r['ttfb_ms']:>7.1f}ms first pages={sum(r['first_request_ms'].values()):>7.1f}ms "
+              f"process={r['process_ms']:>7.1f}ms")
+
+    slowest = []
+    if imports:
+        _, stderr = boot({**base, **SCENARIOS["cold"]}, user_id, python_args=("-X", "importtime"))
+        slowest = slowest_imports(stderr, imports)
+        for name, ms in slowest:
+            print(f"  import {name:<40} {ms:>8.1f}ms")
+    return {"scenarios": report, "slowest_imports": slowest, "user_id": user_id}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-uri", help="Database to seed (default: a scratch SQLite file).")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per scenario.")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS),
+                        help="Run only these scenarios (repeatable).")
+    parser.add_argument("--imports", type=int, default=0, metavar="N",
+                        help="Also list the N slowest imports (python -X importtime).")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", help="Previous result file; report scenarios whose ttfb regressed.")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    database_uri = args.database_uri or "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="w2v-start-"), "start.db")
+    results = run(database_uri, args.repeat, args.imports, args.scenario or tuple(SCENARIOS))
+    results["meta"] = run_metadata(database=database_uri.split("://")[0], repeat=args.repeat)
+    path = write_results("startup", results, args.output)
+    print(f"\nresults written to {path}")
+
+    if args.compare:
+        baseline = load_results(args.compare)["scenarios"]
+        for name, old in baseline.items():
+            new = results["scenarios"].get(name)
+            if new:
+                print(f"{name:<15} import {old['import_ms']:.1f} -> {new['import_ms']:.1f}ms, "
+                      f"ttfb {old['ttfb_ms']:.1f} -> {new['ttfb_ms']:.1f}ms")
+        regressions = list(compare(results["scenarios"], baseline, metric="ttfb_ms", threshold=args.threshold))
+        for name, old, new, ratio in regressions:
+            print(f"REGRESSION {name}: ttfb {old:.1f}ms -> {new:.1f}ms (x{ratio:.2f})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
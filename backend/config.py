@@ -8,3 +8,75 @@ class Config:
 
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")  # direct full URL
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Read replicas: comma-separated URLs, exposed as binds replica_1, replica_2, ...
+    SQLALCHEMY_BINDS = {
+        f"replica_{index}": url.strip()
+        for index, url in enumerate(os.getenv("DATABASE_REPLICA_URLS", "").split(","), start=1)
+        if url.strip()
+    }
+    READ_REPLICA_RYW_SECONDS = int(os.getenv("READ_REPLICA_RYW_SECONDS", 10))
+
+    # Token-bucket rate limits (rate_limit.py); "shared" spans all gunicorn workers on the host
+    RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "1") == "1"
+    RATELIMIT_BACKEND = os.getenv("RATELIMIT_BACKEND", "shared")
+
+    # Reverse proxies in front of gunicorn (nginx, a load balancer): trust that many X-Forwarded-For/-Proto
+    # hops, so request.remote_addr (per-IP rate limits) is the client, not the proxy. 0: no proxy.
+    TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
+
+    # Seconds a worker may reuse a logged-in user's row without querying it (0 disables)
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 30))
+
+    # Buffered post/listing view counters (view_counter.py): flush period and per-visitor dedupe window
+    VIEW_COUNTER_FLUSH_INTERVAL = int(os.getenv("VIEW_COUNTER_FLUSH_INTERVAL", 10))
+    VIEW_COUNTER_DEDUPE_SECONDS = int(os.getenv("VIEW_COUNTER_DEDUPE_SECONDS", 1800))
+
+    # Engine profile (see db_profiles.py): auto, sqlite-default, sqlite-wal, postgres, postgres-pgbouncer
+    DB_PROFILE = os.getenv("DB_PROFILE", "auto")
+
+    # Jinja {% cache %} fragments (post / listing cards)
+    FRAGMENT_CACHE_ENABLED = os.getenv("FRAGMENT_CACHE_ENABLED", "1") == "1"
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", 2000))
+    FRAGMENT_CACHE_DEFAULT_TTL = int(os.getenv("FRAGMENT_CACHE_DEFAULT_TTL", 600))
+
+    # Per-request SQL stats / N+1 detection (fraction of requests sampled)
+    SQL_SAMPLE_RATE = float(os.getenv("SQL_SAMPLE_RATE", "0.01"))
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+    SQL_DEBUG_ENDPOINT = os.getenv("SQL_DEBUG_ENDPOINT", "0") == "1"
+    # X-SQL-Stats response header (query count, SQL time, N+1s): benchmarks only, it is internal detail
+    SQL_STATS_HEADER = os.getenv("SQL_STATS_HEADER", "0") == "1"
+    # Query shapes of sampled requests appended to this file for `flask index-advisor` (unset: off);
+    # sample parameter values are only written with SQL_CAPTURE_PARAMETERS=1 (they are user data)
+    SQL_CAPTURE_FILE = os.getenv("SQL_CAPTURE_FILE") or None
+    SQL_CAPTURE_FLUSH_INTERVAL = int(os.getenv("SQL_CAPTURE_FLUSH_INTERVAL", 60))
+    SQL_CAPTURE_PARAMETERS = os.getenv("SQL_CAPTURE_PARAMETERS", "0") == "1"
+
+    # Listing lifecycle (lifecycle.py): days until a new listing expires (0: never), and days an
+    # inactive or expired listing stays in the hot `listings` table before `flask archive-listings` moves it
+    LISTING_TTL_DAYS = int(os.getenv("LISTING_TTL_DAYS", 90))
+    LISTING_ARCHIVE_AFTER_DAYS = int(os.getenv("LISTING_ARCHIVE_AFTER_DAYS", 30))
+
+    # Background jobs (jobs.py, `flask worker`)
+    JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", 4))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+    JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", 600))        # seconds before a running job is presumed lost
+    JOB_BACKOFF_SECONDS = int(os.getenv("JOB_BACKOFF_SECONDS", 10))   # first retry delay, doubled per attempt
+    JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", 7))
+
+    # Socket.IO (realtime.py). Auto-detected async mode is eventlet when installed; run it with
+    # `gunicorn -k eventlet -w 1 main:app`. More than one web process needs a message queue
+    # (e.g. redis://...) so rooms span processes and `flask worker` can emit too.
+    SOCKETIO_ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE") or None
+    SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE") or None
+
+    # Presence (presence.py): "shared" spans all gunicorn workers on the host, "memory" is per process
+    PRESENCE_BACKEND = os.getenv("PRESENCE_BACKEND", "shared")
+    PRESENCE_FLUSH_INTERVAL = int(os.getenv("PRESENCE_FLUSH_INTERVAL", 60))   # seconds between last_seen writes
+    PRESENCE_ONLINE_SECONDS = int(os.getenv("PRESENCE_ONLINE_SECONDS", 300))  # "online now" window
+
+    # Worker boot (startup.py): Jinja bytecode cache directory (unset: Jinja's per-user directory under
+    # the temp dir; empty: off; a directory another user can write to is refused), and whether create_app compiles every template and configures the ORM
+    # up front (gunicorn.conf.py turns it on when preloading the app)
+    JINJA_BYTECODE_CACHE_DIR = os.getenv("JINJA_BYTECODE_CACHE_DIR")
+    STARTUP_WARM_UP = os.getenv("STARTUP_WARM_UP", "0") == "1"
@@ -0,0 +1,175 @@
+# db_profiles.py
+"""Named database engine profiles.
+
+``DB_PROFILE`` picks one of :data:`ENGINE_PROFILES`; the default ``auto``
+chooses by the scheme of ``SQLALCHEMY_DATABASE_URI``. A profile provides
+
+* ``engine_options`` -> ``SQLALCHEMY_ENGINE_OPTIONS`` (pool sizing,
+  pre-ping, recycle, driver ``connect_args``),
+* ``pragmas`` -> SQLite ``PRAGMA`` statements run on every new connection,
+  and
+* PostgreSQL timeouts, sent as the ``options`` startup parameter. PgBouncer
+  refuses startup parameters it does not know, and in transaction pooling
+  a session ``SET`` lands on whichever server connection serves it, so the
+  ``postgres-pgbouncer`` profile sets them with ``set_config(..., true)``
+  (``SET LOCAL``) at the start of every transaction instead.
+
+Individual ``DB_*`` environment variables override the profile values, so
+a deployment can keep the profile and only resize the pool.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+ENGINE_PROFILES = {
+    # SQLite as shipped: rollback journal, a writer blocks every reader.
+    "sqlite-default": {
+        "engine_options": {},
+        "pragmas": {},
+    },
+    # WAL lets readers run while one writer commits; NORMAL sync is safe in WAL mode.
+    "sqlite-wal": {
+        "engine_options": {},  # the lock wait is busy_timeout below, not sqlite3's connect timeout
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,          # ms to wait on a lock before "database is locked"
+            "mmap_size": 256 * 1024 * 1024,
+            "cache_size": -32000,          # negative = KiB, i.e. ~32MB page cache per connection
+            "temp_store": "MEMORY",
+        },
+    },
+    "postgres": {
+        "engine_options": {
+            "pool_size": 10,
+            "max_overflow": 10,
+            "pool_timeout": 10,
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+            "pool_use_lifo": True,     # keep a warm core of connections, let the rest idle out
+            "query_cache_size": 1200,  # SQLAlchemy compiled-statement cache per engine
+        },
+        "statement_timeout_ms": 5000,
+        "idle_in_transaction_timeout_ms": 30000,
+        "prepare_threshold": 5,
+    },
+    # Small pools for many gunicorn workers behind PgBouncer (transaction pooling).
+    "postgres-pgbouncer": {
+        "engine_options": {
+            "pool_size": 2,
+            "max_overflow": 2,
+            "pool_timeout": 10,
+            "pool_recycle": 600,
+            "pool_pre_ping": True,
+        },
+        "statement_timeout_ms": 5000,
+        "idle_in_transaction_timeout_ms": 30000,
+        "timeouts_per_transaction": True,  # no startup options through PgBouncer
+        "prepare_threshold": None,  # server-side prepared statements break transaction pooling
+    },
+}
+
+_ENV_OVERRIDES = {
+    "DB_POOL_SIZE": ("pool_size", int),
+    "DB_MAX_OVERFLOW": ("max_overflow", int),
+    "DB_POOL_TIMEOUT": ("pool_timeout", int),
+    "DB_POOL_RECYCLE": ("pool_recycle", int),
+}
+
+
+def resolve_profile(name, database_uri):
+    """Return the profile name to use for ``database_uri`` (``auto`` picks by scheme)."""
+    if name and name != "auto":
+        if name not in ENGINE_PROFILES:
+            raise ValueError(f"Unknown DB_PROFILE {name!r}; expected one of {sorted(ENGINE_PROFILES)}")
+        return name
+    backend = make_url(database_uri).get_backend_name() if database_uri else "sqlite"
+    return "postgres" if backend == "postgresql" else "sqlite-wal"
+
+
+def engine_options(profile_name, database_uri, environ=os.environ):
+    """Build ``create_engine`` keyword arguments for a profile and database URL."""
+    profile = ENGINE_PROFILES[profile_name]
+    options = dict(profile["engine_options"])
+    options["connect_args"] = dict(options.get("connect_args", {}))
+
+    for env_name, (key, cast) in _ENV_OVERRIDES.items():
+        if environ.get(env_name):
+            options[key] = cast(environ[env_name])
+
+    url = make_url(database_uri) if database_uri else None
+    if url is not None and url.get_backend_name() == "postgresql":
+        settings = server_settings(profile_name, environ)
+        if settings and not profile.get("timeouts_per_transaction"):
+            options["connect_args"]["options"] = " ".join(f"-c {key}={value}" for key, value in settings.items())
+
+        # psycopg 3 prepares a statement server-side after it ran prepare_threshold
+        # times on a connection; psycopg2 has no server-side prepared statements.
+        if url.get_driver_name() == "psycopg" and profile.get("prepare_threshold") is not None:
+            options["connect_args"]["prepare_threshold"] = profile["prepare_threshold"]
+
+    if not options["connect_args"]:
+        del options["connect_args"]
+    return options
+
+
+def server_settings(profile_name, environ=os.environ):
+    """PostgreSQL settings (name -> value) the profile applies to every session."""
+    profile = ENGINE_PROFILES[profile_name]
+    settings = {}
+    timeout = int(environ.get("DB_STATEMENT_TIMEOUT_MS", profile.get("statement_timeout_ms") or 0))
+    if timeout:
+        settings["statement_timeout"] = timeout
+    if profile.get("idle_in_transaction_timeout_ms"):
+        settings["idle_in_transaction_session_timeout"] = profile["idle_in_transaction_timeout_ms"]
+    return settings
+
+
+def install_transaction_settings(engine, settings):
+    """Apply ``settings`` with ``set_config(..., true)`` at the start of every transaction of ``engine``."""
+    if not settings or engine.dialect.name != "postgresql":
+        return
+    # one statement for all of them: a round trip per transaction, not per setting
+    statement = "SELECT " + ", ".join(f"set_config('{key}', '{value}', true)" for key, value in settings.items())
+
+    def _set_local(connection):
+        connection.exec_driver_sql(statement)
+
+    event.listen(engine, "begin", _set_local)
+
+
+def install_pragmas(engine, pragmas):
+    """Run ``PRAGMA key=value`` for each pragma on every new DBAPI connection of ``engine``."""
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f"PRAGMA {key}={value}")
+        finally:
+            cursor.close()
+
+    event.listen(engine, "connect", _set_pragmas)
+
+
+def configure_app(app):
+    """Fill ``SQLALCHEMY_ENGINE_OPTIONS`` from the profile; call before ``db.init_app``."""
+    name = resolve_profile(app.config.get("DB_PROFILE"), app.config.get("SQLALCHEMY_DATABASE_URI"))
+    app.config["DB_PROFILE"] = name
+    options = engine_options(name, app.config.get("SQLALCHEMY_DATABASE_URI"))
+    options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})  # explicit config wins
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def install_app_pragmas(app, db):
+    """Attach the profile's pragmas and per-transaction settings to every engine; call after ``db.init_app``."""
+    profile = ENGINE_PROFILES[app.config["DB_PROFILE"]]
+    settings = server_settings(app.config["DB_PROFILE"]) if profile.get("timeouts_per_transaction") else {}
+    with app.app_context():
+        for engine in db.engines.values():
+            install_pragmas(engine, profile.get("pragmas"))
+            install_transaction_settings(engine, settings)
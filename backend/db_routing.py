@@ -0,0 +1,117 @@
+# db_routing.py
+"""Read-replica routing for safe GET views.
+
+Replicas are ordinary Flask-SQLAlchemy binds (``replica_1``, ``replica_2``,
+...) built from ``DATABASE_REPLICA_URLS``. :class:`RoutingSession` is used
+as ``db.session``'s class; it sends a query to the request's replica only
+when all of these hold:
+
+* the request is a GET/HEAD on one of ``READ_REPLICA_BLUEPRINTS``,
+* the query would otherwise go to the primary (default bind),
+* the session has not written anything yet (flush or DML statement), and
+* the user is not inside their read-your-writes window, i.e. they did not
+  write in the last ``READ_REPLICA_RYW_SECONDS`` (tracked in the signed
+  session cookie, so it holds across gunicorn workers).
+
+Everything else goes to the primary.
+"""
+import random
+import sqlite3
+import time
+
+import click
+from flask import current_app, request, session as cookie_session
+from flask.cli import with_appcontext
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+RYW_COOKIE_KEY = "_db_ryw_until"
+
+
+class RoutingSession(Session):
+    """``db.session`` class that can serve reads from a replica bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+        replica = self.info.get("replica")
+        if replica is None or bind is not None or self._flushing or self.info.get("wrote"):
+            return engine
+        if clause is not None and getattr(clause, "is_dml", False):
+            return engine
+        if engine is not self._db.engines.get(None):
+            return engine  # model has its own bind key
+        return self._db.engines[replica]
+
+
+def _mark_written_on_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+def _mark_written_on_dml(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+class ReplicaRouter:
+    """Flask extension switching ``db.session`` to a replica for safe GET requests."""
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        app.config.setdefault("READ_REPLICA_BLUEPRINTS", ("marketplace", "community", "profile", "dashboard"))
+        app.config.setdefault("READ_REPLICA_RYW_SECONDS", 10)
+
+        app.extensions["replica_router"] = self
+        replicas = sorted(key for key in (app.config.get("SQLALCHEMY_BINDS") or {}) if key.startswith("replica_"))
+        app.config["READ_REPLICA_KEYS"] = replicas
+        if not replicas:
+            return
+
+        if not event.contains(db.session, "after_flush", _mark_written_on_flush):
+            event.listen(db.session, "after_flush", _mark_written_on_flush)
+            event.listen(db.session, "do_orm_execute", _mark_written_on_dml)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        config = current_app.config
+        if request.method not in ("GET", "HEAD") or request.blueprint not in config["READ_REPLICA_BLUEPRINTS"]:
+            return
+        if cookie_session.get(RYW_COOKIE_KEY, 0) > time.time():
+            return
+        self.db.session.info["replica"] = random.choice(config["READ_REPLICA_KEYS"])
+
+    def _after_request(self, response):
+        if self.db.session.info.get("wrote"):
+            cookie_session[RYW_COOKIE_KEY] = time.time() + current_app.config["READ_REPLICA_RYW_SECONDS"]
+        return response
+
+
+@click.command("replica-sync")
+@with_appcontext
+def replica_sync_command():
+    """Copy a SQLite primary onto every SQLite replica (local testing only)."""
+    primary = make_url(current_app.config["SQLALCHEMY_DATABASE_URI"])
+    if primary.get_backend_name() != "sqlite":
+        raise click.UsageError("replica-sync only copies SQLite databases; use streaming replication for Postgres")
+
+    source = sqlite3.connect(primary.database)
+    try:
+        for key in current_app.config["READ_REPLICA_KEYS"]:
+            replica = make_url(current_app.config["SQLALCHEMY_BINDS"][key])
+            target = sqlite3.connect(replica.database)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+            click.echo(f"{key}: copied {primary.database} -> {replica.database}")
+    finally:
+        source.close()
@@ -2,12 +2,40 @@ from flask_sqlalchemy import SQLAlchemy
 
 from flask_login import LoginManager
 from flask_wtf import CSRFProtect
-from flask_migrate import Migrate
+from flask_socketio import SocketIO
 
-db= SQLAlchemy()
+from backend.db_routing import RoutingSession, ReplicaRouter
+from backend.fragment_cache import FragmentCache
+from backend.jobs import JobQueue
+from backend.presence import Presence
+from backend.rate_limit import RateLimiter
+from backend.sql_instrumentation import SQLInstrumentation
+from backend.startup import LazyMigrate
+from backend.user_cache import UserCache
+from backend.view_counter import ViewCounter
+
+db= SQLAlchemy(session_options={"class_": RoutingSession})
+
+replica_router = ReplicaRouter()
 
 login_manager= LoginManager()
 
 csrf= CSRFProtect()
 
-migrate = Migrate()
\ No newline at end of file
+migrate = LazyMigrate()  # Flask-Migrate (and Alembic) load only for `flask db`
+
+fragment_cache = FragmentCache()
+
+sql_instrumentation = SQLInstrumentation()
+
+rate_limiter = RateLimiter()
+
+user_cache = UserCache()
+
+view_counter = ViewCounter()
+
+job_queue = JobQueue()
+
+socketio = SocketIO()
+
+presence = Presence()
@@ -4,7 +4,7 @@ from wtforms import StringField, PasswordField, SubmitField, SelectField, Intege
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError, NumberRange,URL,Optional
 from flask_wtf.file import FileField, FileRequired, FileAllowed
 
-from backend.models import User, RoleEnum, Category
+from backend.models import User, RoleEnum, Category, ListingTypeEnum
 
 class RegistrationForm(FlaskForm):
     username = StringField(
@@ -31,11 +31,12 @@ class RegistrationForm(FlaskForm):
     submit = SubmitField("Register")
 
     def validate_email(self, email):
-        if User.query.filter_by(email=email.data).first():
+        # deleted accounts keep their email and username: look past the soft-delete filter
+        if User.query.execution_options(include_deleted=True).filter_by(email=email.data).first():
             raise ValidationError("Email already registered.")
 
     def validate_username(self, username):
-        if User.query.filter_by(username=username.data).first():
+        if User.query.execution_options(include_deleted=True).filter_by(username=username.data).first():
             raise ValidationError("Username already taken.")
 
 
@@ -56,6 +57,12 @@ class ListingForm(FlaskForm):
     quantity = IntegerField("Quantity", validators=[DataRequired(), NumberRange(min=1)])
     unit = StringField("Unit (kg, pcs, etc.)", validators=[DataRequired(), Length(min=1, max=20)])
     category_id = SelectField("Category", coerce=int, validators=[DataRequired()])
+    listing_type = SelectField(
+        "Type",
+        choices=[(t.value, t.value.capitalize()) for t in ListingTypeEnum],
+        validators=[DataRequired()]
+    )
+    location = StringField("Location (town or neighbourhood)", validators=[Optional(), Length(max=200)])
     submit = SubmitField("Post Listing")
 
     def set_choices(self):
@@ -63,6 +70,17 @@ class ListingForm(FlaskForm):
         self.category_id.choices = [(c.id, c.name) for c in Category.query.order_by(Category.name).all()]
 
 
+class InterestForm(FlaskForm):
+    category_id = SelectField("Material", coerce=int, validators=[DataRequired()])
+    region = StringField("Region or town (leave blank for anywhere)", validators=[Optional(), Length(max=120)])
+    max_distance_km = IntegerField("Max distance (km)", validators=[Optional(), NumberRange(min=1, max=2000)])
+    min_quantity = IntegerField("Min quantity", validators=[Optional(), NumberRange(min=1)])
+    submit = SubmitField("Add Interest")
+
+    def set_choices(self):
+        self.category_id.choices = [(c.id, c.name) for c in Category.query.order_by(Category.name).all()]
+
+
 
 
 ## Community forms
@@ -74,6 +92,7 @@ class PostForm(FlaskForm):
     content = TextAreaField("Content", validators=[DataRequired(), Length(min=5)])
 
     image=FileField('Upload an image', validators=[FileAllowed(["jpg", "jpeg", "png", "webp"],'images only!')])
+    tags = StringField("Tags (comma separated)", validators=[Optional(), Length(max=200)])
     submit = SubmitField("Post")
 
 
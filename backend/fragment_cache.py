@@ -0,0 +1,138 @@
+# fragment_cache.py
+"""Jinja fragment caching: ``{% cache key, ttl %} ... {% endcache %}``.
+
+Wrap per-item markup (post cards, listing cards) whose output only changes
+when the item changes, and put a version in the key, for example::
+
+    {% cache ('post-card', p.id, p.updated_at), 600 %} ... {% endcache %}
+
+A new ``updated_at`` produces a new key, so stale fragments are never served;
+they simply age out of the bounded LRU backend.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class MemoryFragmentBackend:
+    """Bounded in-process LRU store with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[0] is not None and entry[0] < now):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def make_key(key):
+    """Turn a tuple/list key such as ``('post', 7, updated_at)`` into a string."""
+    if isinstance(key, (tuple, list)):
+        return ":".join(str(part) for part in key)
+    return str(key)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the ``{% cache %}`` tag; the backend is read from ``environment.fragment_cache``."""
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_cache_default_ttl=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+
+        body = parser.parse_statements(["name:endcache"], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_cache_support", args), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, key, ttl, caller):
+        backend = self.environment.fragment_cache
+        if backend is None:
+            return caller()
+
+        key = make_key(key)
+        value = backend.get(key)
+        if value is None:
+            value = caller()
+            backend.set(key, value, ttl if ttl is not None else self.environment.fragment_cache_default_ttl)
+        return value
+
+
+class FragmentCache:
+    """Flask extension wiring :class:`FragmentCacheExtension` into ``app.jinja_env``."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("FRAGMENT_CACHE_ENABLED", True)
+        app.config.setdefault("FRAGMENT_CACHE_MAX_ENTRIES", 2000)
+        app.config.setdefault("FRAGMENT_CACHE_DEFAULT_TTL", 600)
+
+        self.backend = MemoryFragmentBackend(app.config["FRAGMENT_CACHE_MAX_ENTRIES"])
+
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self.backend if app.config["FRAGMENT_CACHE_ENABLED"] else None
+        app.jinja_env.fragment_cache_default_ttl = app.config["FRAGMENT_CACHE_DEFAULT_TTL"]
+
+        app.extensions["fragment_cache"] = self
+
+    def stats(self):
+        return self.backend.stats() if self.backend else {}
+
+    def clear(self):
+        if self.backend:
+            self.backend.clear()
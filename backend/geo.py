@@ -0,0 +1,318 @@
+# geo.py
+"""Location normalisation and radius / nearest-neighbour search.
+
+Free-text locations ("Kimironko, Kigali", "Gisenyi") are resolved against
+the offline gazetteer in ``data/gazetteer.csv`` into latitude/longitude, a
+normalised ``region`` and a ``geo_cell``: the id of the 0.1° x 0.1° grid
+cell (about 11 km) containing the point. ``Listing`` and ``User`` are
+geocoded on insert/update whenever ``location`` changes.
+
+Searches never scan the table. :func:`within` turns the radius into the
+grid cells its bounding box touches, fetches only (id, lat, lon) for rows in
+those cells through ``ix_*_geo_cell``, and applies the exact haversine
+distance to the candidates with NumPy. Radii spanning more than
+``MAX_CELLS`` cells fall back to a latitude/longitude range on
+``ix_*_lat_lon``. :func:`nearest` widens the radius until it holds ``k``
+rows.
+"""
+import csv
+from dataclasses import dataclass
+from functools import lru_cache
+import math
+import os
+import re
+import unicodedata
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, event, inspect, select, update
+
+from backend.extensions import db
+from backend.models import Listing, User
+
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), "data", "gazetteer.csv")
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+CELL_DEGREES = 0.1
+CELL_COLUMNS = int(360 / CELL_DEGREES)
+MAX_CELLS = 400  # ~100 km radius at the equator; larger searches use the lat/lon range
+REGION_SNAP_KM = 50  # raw coordinates take the region of a gazetteer place this close
+
+
+@dataclass(frozen=True)
+class Place:
+    name: str
+    region: str
+    country: str
+    kind: str
+    latitude: float
+    longitude: float
+
+
+# ----------------------------
+# Gazetteer
+# ----------------------------
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.casefold()).split())
+
+
+_NOISE = re.compile(r"\b(city|district|province|town|county|region|centre|center)\b")
+_COORDINATES = re.compile(r"^\s*(-?\d{1,2}(?:\.\d+)?)\s*[,; ]\s*(-?\d{1,3}(?:\.\d+)?)\s*$")
+
+
+@lru_cache(maxsize=None)
+def gazetteer(path=GAZETTEER_PATH):
+    """{normalised name or alias: Place}, loaded once per process."""
+    places = {}
+    with open(path, newline="", encoding="utf-8") as fh:
+        for row in csv.DictReader(fh):
+            place = Place(row["name"], row["region"], row["country"], row["kind"],
+                          float(row["latitude"]), float(row["longitude"]))
+            for name in [row["name"], *filter(None, row["aliases"].split("|"))]:
+                places.setdefault(_normalize(name), place)
+    return places
+
+
+@lru_cache(maxsize=None)
+def _settlements():
+    import numpy as np  # numpy is imported on first use, not at worker boot
+
+    places = sorted({p for p in gazetteer().values() if p.kind != "country"}, key=lambda p: p.name)
+    return places, np.array([p.latitude for p in places]), np.array([p.longitude for p in places])
+
+
+def geocode(text):
+    """The ``Place`` for a free-text location or "lat, lon" pair, or None if unknown.
+
+    Comma-separated parts are tried most specific first, so
+    "Kimironko, Kigali, Rwanda" resolves to Kimironko.
+    """
+    if not text or not text.strip():
+        return None
+    match = _COORDINATES.match(text)
+    if match:
+        latitude, longitude = float(match.group(1)), float(match.group(2))
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            return _place_at(latitude, longitude)
+
+    places = gazetteer()
+    for part in [text, *re.split(r"[,/;]| - ", text)]:
+        key = _normalize(part)
+        place = places.get(key) or places.get(" ".join(_NOISE.sub(" ", key).split()))
+        if place is not None:
+            return place
+    return None
+
+
+def _place_at(latitude, longitude):
+    import numpy as np
+
+    places, latitudes, longitudes = _settlements()
+    distances = haversine_km(latitude, longitude, latitudes, longitudes)
+    closest = int(np.argmin(distances))
+    near = places[closest] if distances[closest] <= REGION_SNAP_KM else None
+    return Place(
+        near.name if near else f"{latitude:.4f}, {longitude:.4f}",
+        near.region if near else None,
+        near.country if near else None,
+        "point",
+        latitude,
+        longitude,
+    )
+
+
+# ----------------------------
+# Grid cells and distances
+# ----------------------------
+def cell_id(latitude, longitude):
+    row = int(math.floor((latitude + 90) / CELL_DEGREES))
+    column = int(math.floor((longitude + 180) / CELL_DEGREES)) % CELL_COLUMNS
+    return row * CELL_COLUMNS + column
+
+
+def location_fields(place):
+    """Column values for a geocoded ``Place`` (or the cleared columns for None)."""
+    if place is None:
+        return {"latitude": None, "longitude": None, "geo_cell": None, "region": None}
+    return {
+        "latitude": place.latitude,
+        "longitude": place.longitude,
+        "geo_cell": cell_id(place.latitude, place.longitude),
+        "region": place.region,
+    }
+
+
+def _bounding_box(latitude, longitude, radius_km):
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return latitude - dlat, latitude + dlat, longitude - dlon, longitude + dlon
+
+
+def cells_for_radius(latitude, longitude, radius_km):
+    """Ids of the grid cells covering the circle's bounding box, or None if more than MAX_CELLS."""
+    south, north, west, east = _bounding_box(latitude, longitude, radius_km)
+    first_row = int(math.floor((max(south, -90) + 90) / CELL_DEGREES))
+    last_row = int(math.floor((min(north, 90) + 90) / CELL_DEGREES))
+    first_col = int(math.floor((west + 180) / CELL_DEGREES))
+    last_col = int(math.floor((east + 180) / CELL_DEGREES))
+    if (last_row - first_row + 1) * (last_col - first_col + 1) > MAX_CELLS:
+        return None
+    return [
+        row * CELL_COLUMNS + column % CELL_COLUMNS
+        for row in range(first_row, last_row + 1)
+        for column in range(first_col, last_col + 1)
+    ]
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distance from one point to arrays of points, vectorised."""
+    import numpy as np
+
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# ----------------------------
+# Queries
+# ----------------------------
+def within(query, model, latitude, longitude, radius_km, limit=None):
+    """[(id, distance_km)] of rows of ``query`` within ``radius_km``, nearest first.
+
+    ``query`` is a ``Model.query`` (with any extra filters) on ``model``,
+    which must have the ``latitude``/``longitude``/``geo_cell`` columns.
+    """
+    cells = cells_for_radius(latitude, longitude, radius_km)
+    candidates = query.with_entities(model.id, model.latitude, model.longitude)
+    if cells is not None:
+        candidates = candidates.filter(model.geo_cell.in_(cells))
+    else:
+        south, north, west, east = _bounding_box(latitude, longitude, radius_km)
+        candidates = candidates.filter(model.latitude.between(south, north))
+        if east - west < 360:
+            candidates = candidates.filter(model.longitude.between(west, east))
+    rows = candidates.all()
+    if not rows:
+        return []
+
+    import numpy as np
+
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    coordinates = np.array([(r[1], r[2]) for r in rows], dtype=np.float64)
+    distances = haversine_km(latitude, longitude, coordinates[:, 0], coordinates[:, 1])
+    inside = np.flatnonzero(distances <= radius_km)
+    if limit is not None and len(inside) > limit:
+        inside = inside[np.argpartition(distances[inside], limit - 1)[:limit]]
+    inside = inside[np.argsort(distances[inside], kind="stable")]
+    return [(int(ids[i]), float(distances[i])) for i in inside]
+
+
+def nearest(query, model, latitude, longitude, k, max_radius_km=500):
+    """The ``k`` nearest rows as [(id, distance_km)], searching up to ``max_radius_km``."""
+    radius = CELL_DEGREES * KM_PER_DEGREE
+    while True:
+        radius = min(radius, max_radius_km)
+        found = within(query, model, latitude, longitude, radius, limit=k)
+        if len(found) >= k or radius >= max_radius_km:
+            return found
+        radius *= 2
+
+
+def search_args(args, default_radius_km=20, max_radius_km=500):
+    """(latitude, longitude, radius_km, k, label) from ``?near=``/``?lat=&lon=``, ``?radius_km=`` and ``?k=``.
+
+    Raises ValueError with a user-facing message when the centre is missing
+    or unknown.
+    """
+    if args.get("near"):
+        place = geocode(args["near"])
+        if place is None:
+            raise ValueError(f"Unknown location: {args['near']}")
+        latitude, longitude, label = place.latitude, place.longitude, place.name
+    elif args.get("lat") is not None and args.get("lon") is not None:
+        latitude, longitude = args.get("lat", type=float), args.get("lon", type=float)
+        if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError("lat/lon must be valid coordinates")
+        label = f"{latitude:.4f}, {longitude:.4f}"
+    else:
+        raise ValueError("Pass ?near=<place> or ?lat=&lon=")
+    radius_km = min(max(args.get("radius_km", default_radius_km, type=float), 0.1), max_radius_km)
+    k = args.get("k", type=int)
+    return latitude, longitude, radius_km, (min(max(k, 1), 100) if k else None), label
+
+
+# ----------------------------
+# Keeping rows geocoded
+# ----------------------------
+def _geocode_on_insert(mapper, connection, target):
+    if target.location and target.latitude is None:
+        for key, value in location_fields(geocode(target.location)).items():
+            setattr(target, key, value)
+
+
+def _geocode_on_update(mapper, connection, target):
+    if inspect(target).attrs.location.history.has_changes():
+        for key, value in location_fields(geocode(target.location)).items():
+            setattr(target, key, value)
+
+
+for _model in (Listing, User):
+    event.listen(_model, "before_insert", _geocode_on_insert)
+    event.listen(_model, "before_update", _geocode_on_update)
+
+
+def backfill(model, batch_size=1000, refresh=False):
+    """Geocode rows whose location was never resolved (or all rows); return rows updated."""
+    table = model.__table__
+    statement = select(table.c.id, table.c.location).where(table.c.location.isnot(None))
+    if not refresh:
+        statement = statement.where(table.c.latitude.is_(None))
+    update_statement = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values(latitude=bindparam("lat"), longitude=bindparam("lon"),
+                geo_cell=bindparam("cell"), region=bindparam("reg"),
+                updated_at=table.c.updated_at)
+    )
+    last_id, updated = 0, 0
+    while True:
+        rows = db.session.execute(statement.where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)).all()
+        if not rows:
+            return updated
+        params = []
+        for row_id, location in rows:
+            fields = location_fields(geocode(location))
+            params.append({"row_id": row_id, "lat": fields["latitude"], "lon": fields["longitude"],
+                           "cell": fields["geo_cell"], "reg": fields["region"]})
+        db.session.execute(update_statement, params)
+        db.session.commit()
+        updated += len(params)
+        last_id = rows[-1][0]
+
+
+def analyze(model):
+    """Refresh planner statistics for ``model``'s table after bulk changes.
+
+    Without them SQLite assumes every equality is selective and drives a
+    radius search through an ``is_active`` index instead of the cell index.
+    """
+    db.session.execute(db.text(f"ANALYZE {model.__tablename__}"))
+    db.session.commit()
+
+
+@click.command("geocode")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--refresh", is_flag=True, help="Re-geocode every row, not only unresolved ones.")
+@with_appcontext
+def geocode_command(batch_size, refresh):
+    """Resolve listing and user locations against the bundled gazetteer."""
+    for model in (Listing, User):
+        click.echo(f"{model.__tablename__}: {backfill(model, batch_size, refresh)} row(s) geocoded")
+        analyze(model)
+    from backend import impact  # backfill() writes listing regions past the rollup hook
+
+    click.echo(f"impact rollups: {impact.rebuild_rollups()} row(s) corrected")
@@ -0,0 +1,255 @@
+# impact.py
+"""Headline impact metrics: listings and kilograms per category, region and month.
+
+``impact_rollups`` holds one row per (month, listing type, category,
+region) with the number of listings created and their quantity in kg, in
+total and for the listings still active. The impact page and its JSON
+endpoint read only this table. It has one row per combination actually
+used, not one per listing, so the answers take milliseconds at any
+listing volume.
+
+An ``after_flush`` hook keeps the rows current. It sees listings created,
+updated, deactivated or deleted through the ORM (the marketplace, ``flask
+archive-listings``' expiry pass). For each one it subtracts the listing's
+old contribution from its old row and adds the new one to its new row,
+one upsert per touched row, in the same transaction as the change.
+Archiving moves a listing out of ``listings`` without changing the
+rollups, so the totals keep counting it.
+
+Quantities are converted to kg by ``unit``; listings in units that are
+not a mass ("pcs", "bags") are counted but add no kilograms. Writes that
+bypass the unit of work (bulk inserts in ``seed.py``, ``geo.backfill``,
+raw SQL) are not seen. :func:`rebuild_rollups` recomputes every row from
+``listings`` and ``listings_archive`` in one INSERT ... SELECT. Seeding
+and ``flask geocode`` call it when they finish, ``flask worker`` runs it
+daily, and ``flask impact-rebuild`` runs it on demand and reports the
+rows that had drifted.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Date, case, cast, delete, event, func, inspect, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+
+from backend.extensions import db, job_queue
+from backend.models import Category, ImpactRollup, Listing, ListingArchive, ListingTypeEnum
+
+
+KG_PER_UNIT = {
+    "kg": 1.0, "kgs": 1.0, "kilo": 1.0, "kilos": 1.0, "kilogram": 1.0, "kilograms": 1.0,
+    "g": 0.001, "gram": 0.001, "grams": 0.001,
+    "t": 1000.0, "ton": 1000.0, "tons": 1000.0, "tonne": 1000.0, "tonnes": 1000.0,
+}
+KEY = ("period", "listing_type", "category_id", "region")
+MEASURES = ("listings", "quantity_kg", "active_listings", "active_kg")
+DEFAULT_MONTHS = 12
+
+_rollups = ImpactRollup.__table__
+_INSERT = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def kilograms(quantity, unit):
+    """``quantity`` of ``unit`` in kg; 0 when the unit is not a mass or the quantity is unset."""
+    return (quantity or 0) * KG_PER_UNIT.get((unit or "").strip().lower() or "kg", 0)
+
+
+def month(moment):
+    return date(moment.year, moment.month, 1)
+
+
+# ----------------------------
+# Incremental maintenance
+# ----------------------------
+FIELDS = ("created_at", "listing_type", "category_id", "region", "quantity", "unit", "is_active")
+
+
+def _contribution(values):
+    """(rollup key, measures) of one listing, or None if it has no creation time yet."""
+    if values["created_at"] is None or values["listing_type"] is None:
+        return None
+    kg = kilograms(values["quantity"], values["unit"])
+    active = bool(values["is_active"])
+    key = (month(values["created_at"]), ListingTypeEnum(values["listing_type"]),
+           values["category_id"] or 0, values["region"] or "")
+    return key, (1, kg, int(active), kg if active else 0.0)
+
+
+def _before(state):
+    values = {}
+    for name in FIELDS:
+        history = state.attrs[name].history
+        values[name] = history.deleted[0] if history.deleted else state.attrs[name].value
+    return values
+
+
+def _rollup_deltas(session):
+    deltas = defaultdict(lambda: [0, 0.0, 0, 0.0])
+
+    def apply(contribution, sign):
+        if contribution is not None:
+            key, measures = contribution
+            for i, value in enumerate(measures):
+                deltas[key][i] += sign * value
+
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, Listing):
+            continue
+        state = inspect(obj)
+        if obj in session.dirty and not any(state.attrs[name].history.has_changes() for name in FIELDS):
+            continue  # views, price, title...: no need to load the rest
+        after = {name: state.attrs[name].value for name in FIELDS}
+        if obj in session.new:
+            apply(_contribution(after), +1)
+        elif obj in session.deleted:
+            apply(_contribution(_before(state)), -1)
+        else:
+            before = _before(state)
+            if before != after:
+                apply(_contribution(before), -1)
+                apply(_contribution(after), +1)
+    return {key: measures for key, measures in deltas.items() if any(measures)}
+
+
+def _upsert(connection, rows):
+    statement = _INSERT[connection.dialect.name](_rollups)
+    statement = statement.on_conflict_do_update(
+        index_elements=[_rollups.c[name] for name in KEY],
+        set_={name: _rollups.c[name] + statement.excluded[name] for name in MEASURES},
+    )
+    connection.execute(statement, rows)
+
+
+@event.listens_for(db.session, "after_flush")
+def _update_rollups(session, flush_context):
+    deltas = _rollup_deltas(session)
+    if not deltas:
+        return
+    rows = [dict(zip(KEY + MEASURES, key + tuple(measures))) for key, measures in sorted(deltas.items())]
+    _upsert(session.connection(), rows)
+
+
+# ----------------------------
+# Rebuild
+# ----------------------------
+def _month_expression(column):
+    if db.engine.dialect.name == "sqlite":
+        return func.date(column, "start of month")
+    return cast(func.date_trunc("month", column), Date)
+
+
+def _kg_expression(quantity, unit):
+    unit = func.coalesce(func.nullif(func.lower(func.trim(unit)), ""), "kg")  # as kilograms() reads it
+    factor = case(*[(unit == name, literal(value)) for name, value in KG_PER_UNIT.items()], else_=literal(0.0))
+    return func.coalesce(quantity, 0) * factor
+
+
+def _rebuild_select():
+    parts = [
+        select(
+            table.c.created_at, table.c.listing_type, table.c.category_id, table.c.region,
+            _kg_expression(table.c.quantity, table.c.unit).label("kg"),
+            case((table.c.is_active == True, 1), else_=0).label("active"),
+        ).where(table.c.created_at.isnot(None))
+        for table in (Listing.__table__, ListingArchive.__table__)
+    ]
+    listings = union_all(*parts).subquery()
+    period = _month_expression(listings.c.created_at)
+    category_id = func.coalesce(listings.c.category_id, 0)
+    region = func.coalesce(listings.c.region, "")
+    return (
+        select(
+            period, listings.c.listing_type, category_id, region,
+            func.count(), func.sum(listings.c.kg),
+            func.sum(listings.c.active), func.sum(listings.c.kg * listings.c.active),
+        )
+        .group_by(period, listings.c.listing_type, category_id, region)
+    )
+
+
+def _snapshot():
+    return {
+        tuple(row[:4]): (row[4], round(row[5], 3), row[6], round(row[7], 3))
+        for row in db.session.execute(select(*[_rollups.c[name] for name in KEY + MEASURES]))
+        if row[4]  # rows emptied by deletes count as absent
+    }
+
+
+def rebuild_rollups():
+    """Recompute ``impact_rollups`` from the listings and the archive; return the number of drifted rows."""
+    before = _snapshot()
+    db.session.execute(delete(_rollups))
+    db.session.execute(_rollups.insert().from_select(list(KEY + MEASURES), _rebuild_select()))
+    after = _snapshot()
+    db.session.commit()
+    return sum(before.get(key) != measures for key, measures in after.items()) + len(before.keys() - after.keys())
+
+
+# scheduled daily by `flask worker` (backend.jobs)
+job_queue.task("rebuild-impact", every=86400)(rebuild_rollups)
+
+
+@click.command("impact-rebuild")
+@with_appcontext
+def impact_rebuild_command():
+    """Recompute the impact rollups from listings (after bulk imports; safe to run from cron)."""
+    drifted = rebuild_rollups()
+    rows = db.session.scalar(select(func.count()).select_from(_rollups))
+    click.echo(f"{rows} rollup row(s), {drifted} corrected")
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+def _since(months, today=None):
+    start = month(today or datetime.utcnow())
+    for _ in range(months - 1):
+        start = month(start - timedelta(days=1))
+    return start
+
+
+def _grouped(columns, filters, order_by, source=_rollups):
+    totals = [func.sum(_rollups.c[name]).label(name) for name in MEASURES]
+    return db.session.execute(
+        select(*columns, *totals).select_from(source).where(*filters).group_by(*columns).order_by(order_by)
+    ).all()
+
+
+def _measures(row):
+    return {
+        "listings": row.listings,
+        "kg": round(row.quantity_kg, 1),
+        "active_listings": row.active_listings,
+        "active_kg": round(row.active_kg, 1),
+    }
+
+
+def summary(listing_type=None, months=DEFAULT_MONTHS):
+    """Totals, per category, per region and per month over the last ``months`` months (0: all time)."""
+    filters = []
+    if months:
+        filters.append(_rollups.c.period >= _since(months))
+    if listing_type is not None:
+        filters.append(_rollups.c.listing_type == listing_type)
+
+    by_type = _grouped([_rollups.c.listing_type], filters, _rollups.c.listing_type)
+    by_category = _grouped(
+        [_rollups.c.category_id, Category.name], filters, func.sum(_rollups.c.quantity_kg).desc(),
+        source=_rollups.outerjoin(Category, Category.id == _rollups.c.category_id),
+    )
+    by_region = _grouped([_rollups.c.region], filters, func.sum(_rollups.c.quantity_kg).desc())
+    by_month = _grouped([_rollups.c.period], filters, _rollups.c.period)
+
+    return {
+        "listing_type": listing_type.value if listing_type is not None else None,
+        "months": months,
+        "since": _since(months).isoformat() if months else None,
+        "by_type": [{"type": row.listing_type.value, **_measures(row)} for row in by_type],
+        "by_category": [
+            {"category_id": row.category_id or None, "category": row.name, **_measures(row)}
+            for row in by_category
+        ],
+        "by_region": [{"region": row.region or None, **_measures(row)} for row in by_region],
+        "by_month": [{"month": f"{row.period:%Y-%m}", **_measures(row)} for row in by_month],
+    }
@@ -0,0 +1,645 @@
+# index_advisor.py
+"""Index advice from captured production queries.
+
+The indexes in ``models.py`` were chosen by hand. This module checks them
+against what the app actually runs:
+
+1. Capture: with ``SQL_CAPTURE_FILE`` set, sampled requests append their
+   statement shapes (calls, total and max time, endpoints and one sample
+   statement) to that file (``QueryCapture`` in ``sql_instrumentation.py``).
+   ``python -m backend.benchmarks.routes --capture-sql FILE`` produces one
+   from the benchmark's traffic.
+2. ``flask index-advisor FILE...`` explains every captured read, UPDATE
+   and DELETE (``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN (FORMAT JSON)``
+   on PostgreSQL) and proposes
+
+   * a composite index where a plan scans a whole table, filters rows an
+     index lookup did not narrow down, or sorts in a temp B-tree: the
+     equality columns of the WHERE/JOIN clause first, then the ORDER BY (or
+     one range) columns. On a table with a partial index (``partial()`` in
+     ``models.py``), a statement that pins the index's predicate columns
+     gets a partial addition over the same rows, without those columns;
+   * dropping an index whose columns lead another index (after the
+     additions) and covers the same rows (a partial index never stands in
+     for a full one, or the other way round), and a single-column index on
+     a boolean flag that no captured plan needs once the additions exist. ``--drop-unused`` adds
+     every such index that is not unique and not a foreign key's only one.
+
+   Additions are ranked by the captured time of the statements they serve,
+   removals report the index size and the captured writes that maintain it.
+3. ``--what-if`` creates each addition inside a savepoint that is rolled
+   back, explains its statements again (and times the SELECTs with their
+   sample parameters, when the capture kept them), so an addition the
+   planner would not use is dropped from the proposal. CREATE INDEX locks
+   the table's writes until the rollback: run it against a restored copy,
+   not the primary.
+4. ``--emit-migration`` writes the proposal as an Alembic revision on top
+   of the current head. ``models.py`` has to be changed to match by hand;
+   the command prints what to change.
+
+Plans depend on the data: run the advisor against a database of production
+size, and ``ANALYZE`` it first so both planners have statistics.
+"""
+from dataclasses import dataclass, field
+import json
+import os
+import re
+import statistics
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import Boolean, inspect
+from sqlalchemy.exc import DBAPIError
+
+from backend.extensions import db
+
+
+MAX_COLUMNS = 4      # widest composite proposed
+TIMING_REPEAT = 5    # executions per SELECT and side with --what-if
+
+_READ = re.compile(r"^\s*(?:SELECT|WITH|UPDATE|DELETE)\b", re.I)
+_WRITE = re.compile(r"^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+(\w+)", re.I)
+_KEYWORDS = {
+    "AS", "ON", "WHERE", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "FULL", "NATURAL", "ORDER",
+    "GROUP", "LIMIT", "OFFSET", "SET", "USING", "VALUES", "HAVING", "UNION", "EXCEPT", "INTERSECT",
+    "RETURNING", "WINDOW", "AND", "OR", "FOR",
+}
+_SQLITE_STEP = re.compile(
+    r"^(SCAN|SEARCH) (\w+)(?: AS \w+)?(?: USING (?:(?:COVERING )?INDEX (\w+)|(?:INTEGER )?PRIMARY KEY)(?: \((.*)\))?)?"
+)
+_PYFORMAT = re.compile(r"%\((\w+)\)s")
+_VALUE = r"(?:\?|%\(\w+\)s|NULL\b|TRUE\b|FALSE\b|-?\d+(?:\.\d+)?|'(?:[^']|'')*')"
+
+
+# ----------------------------
+# Captures
+# ----------------------------
+def load(paths):
+    """Merge capture files into {shape: entry}, adding up counts and times."""
+    shapes = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                entry = shapes.get(record["shape"])
+                if entry is None:
+                    shapes[record["shape"]] = record
+                    continue
+                entry["count"] += record["count"]
+                entry["total_ms"] += record["total_ms"]
+                entry["max_ms"] = max(entry["max_ms"], record["max_ms"])
+                for endpoint, count in record["endpoints"].items():
+                    entry["endpoints"][endpoint] = entry["endpoints"].get(endpoint, 0) + count
+                if entry["parameters"] is None and record["parameters"] is not None:
+                    entry["statement"], entry["parameters"] = record["statement"], record["parameters"]
+    return shapes
+
+
+# ----------------------------
+# Schema
+# ----------------------------
+@dataclass
+class IndexInfo:
+    table: str
+    name: str
+    columns: tuple
+    unique: bool = False
+    primary: bool = False
+    where: str = None   # predicate of a partial index, as the database reports it
+
+    @property
+    def fixed(self):
+        """Columns the predicate pins to one value (``is_deleted = 0``); none unless it is a plain AND."""
+        if not self.where or re.search(r"\bOR\b|\bNOT\b|<|>", self.where, re.I):
+            return set()
+        return set(re.findall(rf"\b(\w+)\s*(?:=|\bIS\b)\s*{_VALUE}", self.where.replace("(", " ").replace(")", " "), re.I))
+
+
+def _predicate(index):
+    options = index.get("dialect_options", {})
+    where = options.get("sqlite_where", options.get("postgresql_where"))
+    return None if where is None else " ".join(str(where).split())
+
+
+def existing_indexes(connection, tables):
+    """{table: [IndexInfo]} as the database has them, primary keys and unique constraints included."""
+    inspector = inspect(connection)
+    result = {}
+    for table in tables:
+        found = []
+        primary = inspector.get_pk_constraint(table)["constrained_columns"]
+        if primary:
+            found.append(IndexInfo(table, "PRIMARY KEY", tuple(primary), unique=True, primary=True))
+        for constraint in inspector.get_unique_constraints(table):
+            found.append(IndexInfo(table, constraint["name"] or f"UNIQUE {table}",
+                                   tuple(constraint["column_names"]), unique=True))
+        for index in inspector.get_indexes(table):
+            if None in index["column_names"]:  # expression index, e.g. the full-text one
+                continue
+            found.append(IndexInfo(table, index["name"], tuple(index["column_names"]), unique=index["unique"],
+                                   where=_predicate(index)))
+        result[table] = found
+    return result
+
+
+def _index_bytes(connection, name):
+    try:
+        if connection.dialect.name == "sqlite":
+            return connection.exec_driver_sql("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (name,)).scalar()
+        if connection.dialect.name == "postgresql":
+            return connection.exec_driver_sql("SELECT pg_relation_size(%(name)s::regclass)", {"name": name}).scalar()
+    except DBAPIError:  # no dbstat in this SQLite build
+        connection.rollback()
+    return None
+
+
+# ----------------------------
+# Plans
+# ----------------------------
+@dataclass
+class Plan:
+    order: list = field(default_factory=list)         # aliases, outermost loop first
+    scans: set = field(default_factory=set)           # aliases read in full
+    searched: dict = field(default_factory=dict)      # alias: index columns the lookup used
+    filtered: set = field(default_factory=set)        # aliases with rows filtered after an index lookup
+    indexes: set = field(default_factory=set)
+    sorts: bool = False
+    cost: float = None
+    lines: list = field(default_factory=list)
+
+
+def _bind(connection, entry):
+    """The sample statement and parameters ready for the DBAPI, or (statement, None) to run unbound."""
+    statement, parameters = entry["statement"], entry["parameters"]
+    if connection.dialect.name == "sqlite":
+        expected = statement.count("?")
+        if parameters is None or len(parameters) != expected:
+            parameters = [None] * expected  # EXPLAIN QUERY PLAN does not depend on the values
+        return statement, tuple(parameters)
+    return statement, parameters
+
+
+def explain(connection, entry):
+    statement, parameters = _bind(connection, entry)
+    plan = Plan()
+    if connection.dialect.name == "sqlite":
+        for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+            detail = row[3]
+            plan.lines.append(detail)
+            if detail.startswith("USE TEMP B-TREE FOR") and "ORDER BY" in detail:
+                plan.sorts = True
+            step = _SQLITE_STEP.match(detail)
+            if step is None or " VIRTUAL TABLE " in detail:
+                continue
+            kind, alias, index, condition = step.groups()
+            plan.order.append(alias)
+            if index:
+                plan.indexes.add(index)
+            if kind == "SCAN" and not index:
+                plan.scans.add(alias)
+            elif kind == "SEARCH":  # an alias can appear in several subqueries: keep its best lookup
+                width = len(condition.split(" AND ")) if condition else 0
+                plan.searched[alias] = max(plan.searched.get(alias, 0), width)
+        return plan
+
+    if parameters is not None:
+        rows = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+    else:
+        # without sample values PostgreSQL 16 plans the statement with unbound $n placeholders
+        numbered = {}
+        generic = _PYFORMAT.sub(lambda m: "$%d" % numbered.setdefault(m.group(1), len(numbered) + 1), statement)
+        options = "GENERIC_PLAN, FORMAT JSON" if numbered else "FORMAT JSON"
+        rows = connection.exec_driver_sql(f"EXPLAIN ({options}) " + generic.replace("%%", "%"))
+    root = rows.scalar()[0]["Plan"]
+    plan.cost = root["Total Cost"]
+    nodes = [root]
+    while nodes:
+        node = nodes.pop(0)
+        kind, alias = node["Node Type"], node.get("Alias")
+        plan.lines.append(f"{kind} {alias or ''} {node.get('Index Name', '')}".strip())
+        if kind == "Sort":
+            plan.sorts = True
+        if alias:
+            plan.order.append(alias)
+        if kind == "Seq Scan":
+            plan.scans.add(alias)
+        elif "Index Name" in node:
+            plan.indexes.add(node["Index Name"])
+            if kind != "Bitmap Index Scan":
+                width = len(node["Index Cond"].split(" AND ")) if "Index Cond" in node else 0
+                plan.searched[alias] = max(plan.searched.get(alias, 0), width)
+                if "Filter" in node:
+                    plan.filtered.add(alias)
+        elif kind == "Bitmap Heap Scan" and "Filter" in node:
+            plan.filtered.add(alias)
+        nodes.extend(node.get("Plans", ()))
+    return plan
+
+
+def _time(connection, entry):
+    """Median milliseconds of the sample SELECT, or None when it cannot be replayed."""
+    if entry["parameters"] is None and ("?" in entry["statement"] or "%(" in entry["statement"]):
+        return None
+    if not entry["statement"].lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    statement, parameters = _bind(connection, entry)
+    timings = []
+    for _ in range(TIMING_REPEAT + 1):
+        started = time.perf_counter()
+        connection.exec_driver_sql(statement, parameters).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings[1:])
+
+
+# ----------------------------
+# Candidates
+# ----------------------------
+def aliases(statement, tables):
+    """{alias: table} for every known table in the statement (a table is its own alias)."""
+    found = {}
+    for table in tables:
+        pattern = re.compile(rf"\b{table}\b(?!\.)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+        for match in pattern.finditer(statement):
+            found.setdefault(table, table)
+            alias = match.group(1)
+            if alias and alias.upper() not in _KEYWORDS and alias not in tables and not alias.startswith("anon_"):
+                found[alias] = table
+    return found
+
+
+def predicates(statement, alias):
+    """Columns of ``alias`` compared to a value ((column, comparison) pairs), to another table's
+    column, by range, and its ORDER BY ((column, direction) pairs)."""
+    column = rf"\b{re.escape(alias)}\.(\w+)"
+    valued = [(m.start(), m.group(1), m.group(2)) for m in re.finditer(
+        column + rf"\s*(=\s*{_VALUE}|IS\s+{_VALUE}|IN\s*\()", statement, re.I)]
+    valued += [(m.start(), m.group(2), m.group(1)) for m in re.finditer(
+        rf"({_VALUE})\s*=\s*" + column, statement, re.I)]
+    # (column, comparison) in statement order
+    valued = [(name, comparison.upper()) for _, name, comparison in sorted(valued)]
+    joined = [c for c, other in re.findall(column + r"\s*=\s*(\w+)\.\w+", statement) if other != alias]
+    joined += [c for other, c in re.findall(r"\b(\w+)\.\w+\s*=\s*" + column, statement) if other != alias]
+    ranged = re.findall(column + r"\s*(?:<|>|BETWEEN\b|LIKE\b)", statement, re.I)
+
+    ordered = []
+    clause = re.search(r"\bORDER BY (.+?)(?:\bLIMIT\b|\bOFFSET\b|\)|$)", statement, re.I | re.S)
+    if clause:
+        for item in clause.group(1).split(","):
+            match = re.fullmatch(column + r"(?:\s+(ASC|DESC))?", item.strip(), re.I)
+            if match is None:  # sorted on another table or an expression: no index on this one avoids the sort
+                ordered = []
+                break
+            ordered.append((match.group(1), (match.group(2) or "ASC").upper()))
+    return valued, joined, ranged, ordered
+
+
+def candidate_columns(table, valued, joined, ranged, ordered):
+    """(columns, how many narrow the lookup) of the index serving one table: equalities, then ORDER BY or one range."""
+    columns = set(table.c.keys())
+    equal = [c for c in dict.fromkeys([name for name, _ in valued] + joined) if c in columns]
+    # selective columns first; a boolean flag or an IS NULL test narrows the least
+    weak = {name for name, comparison in valued if comparison.startswith("IS") and "NULL" in comparison}
+    equal.sort(key=lambda c: isinstance(table.c[c].type, Boolean) or c in weak)
+    chosen = equal[:MAX_COLUMNS]
+    narrowing = len(chosen)
+    # an IN list reads several ranges of the index, so their union still needs sorting
+    in_list = any(comparison.startswith("IN") for _, comparison in valued)
+    if ordered and not in_list and all(c in columns for c, _ in ordered):
+        direction = ordered[0][1]
+        for name, order in ordered:  # an index is read one way: stop where the direction changes
+            if order != direction or name in chosen:
+                break
+            chosen.append(name)
+    else:
+        chosen += [c for c in ranged if c in columns and c not in chosen][:1]
+        narrowing = len(chosen)
+    return tuple(chosen[:MAX_COLUMNS]), narrowing
+
+
+@dataclass
+class Addition:
+    table: str
+    columns: tuple
+    where: str = None   # proposed as partial, with the predicate of the table's partial indexes
+    shapes: list = field(default_factory=list)
+    reasons: dict = field(default_factory=dict)   # shape: plan summary before
+    verified: bool = None
+    saved_ms: float = None
+
+    @property
+    def name(self):
+        suffix = "_partial" if self.where else ""  # next to a full index on the same columns
+        return f"ix_{self.table}_{'_'.join(self.columns)}"[:63 - len(suffix)] + suffix
+
+    def captured(self, entries):
+        return sum(entries[s]["count"] for s in self.shapes), sum(entries[s]["total_ms"] for s in self.shapes)
+
+
+@dataclass
+class Removal:
+    index: IndexInfo
+    reason: str
+    bytes: int = None
+    writes: int = 0
+    write_ms: float = 0.0
+
+
+def _covered(columns, indexes, equal=()):
+    """True if an index leads with ``columns``; a partial index's pinned columns count as served when
+    the statement tests them for equality (``equal``), as the soft-delete filter does."""
+    for index in indexes:
+        pinned = index.fixed & set(equal)
+        wanted = tuple(c for c in columns if c not in pinned)
+        if wanted and index.columns[:len(wanted)] == wanted:
+            return True
+    return False
+
+
+def _problems(plan, alias, narrowing, sorted_here):
+    if alias in plan.scans:
+        return "full scan"
+    if alias in plan.filtered or plan.searched.get(alias, narrowing) < narrowing:
+        return "index lookup narrows on fewer columns than the WHERE clause"
+    if plan.sorts and sorted_here:
+        return "sorts in a temp B-tree"
+    return None
+
+
+def propose_additions(entries, plans, indexes, metadata):
+    additions = {}
+    for shape, plan in plans.items():
+        statement = entries[shape]["statement"]
+        for alias, table_name in aliases(statement, indexes).items():
+            table = metadata.tables[table_name]
+            valued, joined, ranged, ordered = predicates(statement, alias)
+            # the outermost loop is read once; inner tables are probed with each joined row's values
+            outer = bool(plan.order) and plan.order[0] == alias
+            joined = [] if outer else joined
+            equal = {name for name, _ in valued} | set(joined)
+            if any(index.unique and set(index.columns) <= equal for index in indexes[table_name]):
+                continue  # at most one row per lookup already
+            columns, narrowing = candidate_columns(table, valued, joined, ranged, ordered if outer else [])
+            if not columns or _covered(columns, indexes[table_name], equal):
+                continue
+            reason = _problems(plan, alias, narrowing, outer and bool(ordered))
+            if reason is None:
+                continue
+            # the table keeps its hot indexes partial (WHERE is_deleted = false): propose the same shape
+            # rather than a full index with the flag as a column
+            partial = next((i for i in indexes[table_name] if i.fixed and i.fixed <= equal), None)
+            where = None
+            if partial is not None and any(c not in partial.fixed for c in columns):
+                columns, where = tuple(c for c in columns if c not in partial.fixed), partial.where
+            addition = additions.setdefault((table_name, columns, where), Addition(table_name, columns, where))
+            if shape not in addition.reasons:
+                addition.shapes.append(shape)
+                addition.reasons[shape] = reason
+
+    # a candidate leading a longer one on the same table is served by it
+    merged = sorted(additions.values(), key=lambda a: -len(a.columns))
+    kept = []
+    for addition in merged:
+        longer = next((k for k in kept if k.table == addition.table and k.where == addition.where
+                       and k.columns[:len(addition.columns)] == addition.columns), None)
+        if longer is None:
+            kept.append(addition)
+            continue
+        for shape in addition.shapes:
+            if shape not in longer.reasons:
+                longer.shapes.append(shape)
+                longer.reasons[shape] = addition.reasons[shape]
+    return kept
+
+
+def what_if(connection, addition, entries, plans):
+    """Create the index in a savepoint, re-plan (and time) its statements, roll back."""
+    before_ms = {shape: _time(connection, entries[shape]) for shape in addition.shapes}
+    savepoint = connection.begin_nested()
+    try:
+        columns = ", ".join(addition.columns)
+        where = f" WHERE {addition.where}" if addition.where else ""
+        connection.exec_driver_sql(f"CREATE INDEX {addition.name} ON {addition.table} ({columns}){where}")
+        after = {shape: explain(connection, entries[shape]) for shape in addition.shapes}
+        after_ms = {shape: _time(connection, entries[shape]) for shape in addition.shapes}
+    finally:
+        savepoint.rollback()
+
+    used = [shape for shape in addition.shapes if addition.name in after[shape].indexes]
+    addition.verified = bool(used)
+    addition.shapes = used
+    saved = 0.0
+    for shape in used:
+        entry, ratio = entries[shape], None
+        if before_ms[shape] and after_ms[shape] is not None:
+            ratio = after_ms[shape] / before_ms[shape]
+        elif plans[shape].cost and after[shape].cost is not None:
+            ratio = after[shape].cost / plans[shape].cost
+        if ratio is None:
+            return  # no measurement for some statement: leave the estimate as an upper bound
+        saved += entry["total_ms"] * max(0.0, 1.0 - ratio)
+    addition.saved_ms = saved
+
+
+def propose_removals(entries, used, indexes, additions, metadata, drop_unused=False):
+    removals = []
+    for table_name, found in indexes.items():
+        table = metadata.tables[table_name]
+        proposed = [IndexInfo(a.table, a.name, a.columns, where=a.where) for a in additions if a.table == table_name]
+        foreign = {fk.parent.name for fk in table.foreign_keys}
+        for index in found:
+            if index.unique or index.primary:
+                continue
+            others = [o for o in found + proposed if o is not index]
+            # only an index over the same rows can stand in: never a partial for a full one or back
+            longer = next((o for o in others if o.where == index.where and len(o.columns) >= len(index.columns)
+                           and o.columns[:len(index.columns)] == index.columns
+                           and (len(o.columns) > len(index.columns) or o.unique or o.name < index.name)), None)
+            if longer is not None:
+                removals.append(Removal(index, f"its columns lead {longer.name} {longer.columns}"))
+            elif index.name in used:
+                continue
+            elif len(index.columns) == 1 and isinstance(table.c[index.columns[0]].type, Boolean):
+                removals.append(Removal(index, "single boolean column, no captured plan needs it"))
+            elif drop_unused and not (index.columns[0] in foreign and not _covered(index.columns[:1], others)):
+                removals.append(Removal(index, "no captured plan needs it"))
+
+    for entry in entries.values():
+        write = _WRITE.match(entry["statement"])
+        if write is None:
+            continue
+        for removal in removals:
+            if removal.index.table == write.group(1):
+                removal.writes += entry["count"]
+                removal.write_ms += entry["total_ms"]
+    return removals
+
+
+# ----------------------------
+# Report and migration
+# ----------------------------
+def advise(entries, what_if_run=False, drop_unused=False, min_calls=1):
+    """Analyse merged captures against the current database; returns the report as a dict."""
+    metadata = db.metadata
+    report = {"shapes": len(entries), "calls": sum(e["count"] for e in entries.values()),
+              "captured_ms": sum(e["total_ms"] for e in entries.values()), "skipped": {}, "errors": []}
+
+    with db.engine.connect() as connection:
+        dialect = report["dialect"] = connection.dialect.name
+        inspector = inspect(connection)
+        indexes = existing_indexes(connection, [t for t in metadata.tables if inspector.has_table(t)])
+        plans = {}
+        for shape, entry in entries.items():
+            if entry["dialect"] != dialect:
+                reason = f"captured on {entry['dialect']}"
+            elif not _READ.match(entry["statement"]):
+                reason = "not a read, UPDATE or DELETE"
+            elif entry["count"] < min_calls:
+                reason = "fewer calls than --min-calls"
+            else:
+                try:
+                    plans[shape] = explain(connection, entry)
+                    continue
+                except DBAPIError as exc:
+                    connection.rollback()
+                    reason = "could not be explained"
+                    report["errors"].append({"shape": shape, "error": str(exc.orig)})
+            report["skipped"][reason] = report["skipped"].get(reason, 0) + 1
+
+        additions = propose_additions(entries, plans, indexes, metadata)
+        if what_if_run:
+            for addition in additions:
+                what_if(connection, addition, entries, plans)
+            additions = [a for a in additions if a.verified]
+        # index: statements whose plan uses it and that no addition takes over
+        served = {shape for addition in additions for shape in addition.shapes}
+        used = {}
+        for shape, plan in plans.items():
+            for name in plan.indexes:
+                if shape not in served:
+                    used.setdefault(name, set()).add(shape)
+        removals = propose_removals(entries, used, indexes, additions, metadata, drop_unused)
+        for removal in removals:
+            removal.bytes = _index_bytes(connection, removal.index.name)
+        connection.rollback()
+
+    def addition_dict(a):
+        calls, total_ms = a.captured(entries)
+        return {
+            "name": a.name, "table": a.table, "columns": list(a.columns), "where": a.where, "calls": calls,
+            "captured_ms": round(total_ms, 3), "verified": a.verified,
+            "saved_ms": None if a.saved_ms is None else round(a.saved_ms, 3),
+            "statements": [{"shape": s, "reason": a.reasons[s], "endpoints": entries[s]["endpoints"],
+                            "plan": plans[s].lines} for s in a.shapes],
+        }
+
+    report["additions"] = sorted((addition_dict(a) for a in additions),
+                                 key=lambda a: -(a["saved_ms"] if a["saved_ms"] is not None else a["captured_ms"]))
+    report["removals"] = [{
+        "name": r.index.name, "table": r.index.table, "columns": list(r.index.columns), "where": r.index.where,
+        "reason": r.reason, "bytes": r.bytes, "writes": r.writes, "write_ms": round(r.write_ms, 3),
+    } for r in removals]
+    return report
+
+
+def format_report(report):
+    lines = [f"{report['shapes']} statement shapes, {report['calls']:,} calls, {report['captured_ms']:.1f} ms captured"]
+    for reason, count in report["skipped"].items():
+        lines.append(f"  skipped {count}: {reason}")
+    lines.append("")
+    lines.append("Add:" if report["additions"] else "Add: nothing")
+    for a in report["additions"]:
+        if a["saved_ms"] is not None:
+            impact = f"saves ~{a['saved_ms']:.1f} of {a['captured_ms']:.1f} ms captured"
+        else:
+            impact = f"serves {a['captured_ms']:.1f} ms captured (upper bound on the saving)"
+        where = f" WHERE {a['where']}" if a["where"] else ""
+        lines.append(f"  {a['name']} ON {a['table']} ({', '.join(a['columns'])}){where}: "
+                     f"{len(a['statements'])} statement(s), {a['calls']:,} calls, {impact}")
+        for statement in a["statements"]:
+            endpoints = ", ".join(sorted(statement["endpoints"], key=statement["endpoints"].get, reverse=True)[:3])
+            lines.append(f"      {statement['reason']} ({endpoints}): {statement['shape'][:100]}")
+    lines.append("")
+    lines.append("Drop:" if report["removals"] else "Drop: nothing")
+    for r in report["removals"]:
+        size = "?" if r["bytes"] is None else f"{r['bytes'] / 1024:.1f} KiB"
+        where = f" WHERE {r['where']}" if r["where"] else ""
+        lines.append(f"  {r['name']} ON {r['table']} ({', '.join(r['columns'])}){where}: {r['reason']}; "
+                     f"{size}, maintained by {r['writes']:,} captured writes ({r['write_ms']:.1f} ms)")
+    return "\n".join(lines)
+
+
+def write_migration(report, message, directory):
+    """Write the proposal as an Alembic revision after the current head; returns its path."""
+    import sqlalchemy as sa
+    from alembic.autogenerate import render_python_code
+    from alembic.config import Config
+    from alembic.operations import ops
+    from alembic.script import ScriptDirectory
+    from alembic.util import rev_id
+
+    by_table = {}
+    for a in report["additions"]:
+        where = {f"{report['dialect']}_where": sa.text(a["where"])} if a["where"] else {}
+        by_table.setdefault(a["table"], []).append(ops.CreateIndexOp(a["name"], a["table"], a["columns"], **where))
+    for r in report["removals"]:
+        # a detached copy of the index, so the downgrade can recreate it
+        table = sa.Table(r["table"], sa.MetaData(), *(sa.Column(c, sa.Integer) for c in r["columns"]))
+        where = {f"{report['dialect']}_where": sa.text(r["where"])} if r["where"] else {}
+        index = sa.Index(r["name"], *(table.c[c] for c in r["columns"]), **where)
+        by_table.setdefault(r["table"], []).append(ops.DropIndexOp.from_index(index))
+    upgrade = ops.UpgradeOps(ops=[ops.ModifyTableOps(t, table_ops) for t, table_ops in sorted(by_table.items())])
+
+    config = Config(os.path.join(directory, "alembic.ini"))
+    config.set_main_option("script_location", directory)
+    script = ScriptDirectory.from_config(config).generate_revision(
+        rev_id(), message, head="head",
+        upgrades=render_python_code(upgrade, render_as_batch=True).strip(),
+        downgrades=render_python_code(upgrade.reverse(), render_as_batch=True).strip(),
+    )
+    return script.path
+
+
+def model_changes(report):
+    """What ``models.py`` needs so the next autogenerate agrees with the migration."""
+    models = {mapper.local_table.name: mapper.class_.__name__ for mapper in db.Model.registry.mappers}
+    lines = []
+    for a in report["additions"]:
+        owner = models.get(a["table"])
+        columns = (f"{owner}.{c}" if owner else f"{a['table']}.c.{c}" for c in a["columns"])
+        where = f', **partial(<{a["where"]}>)' if a["where"] else ""
+        lines.append(f'  add: Index("{a["name"]}", {", ".join(columns)}{where})')
+    for r in report["removals"]:
+        if len(r["columns"]) == 1 and r["name"] == f"ix_{r['table']}_{r['columns'][0]}":
+            owner = models.get(r["table"])
+            column = f"{owner}.{r['columns'][0]}" if owner else f"{r['table']}.c.{r['columns'][0]}"
+            lines.append(f"  drop: index=True on {column}")
+        else:
+            lines.append(f'  drop: Index("{r["name"]}", ...)')
+    return lines
+
+
+@click.command("index-advisor")
+@click.argument("captures", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--what-if", "what_if_run", is_flag=True,
+              help="Verify each addition with a rolled-back CREATE INDEX (locks writes: use a copy).")
+@click.option("--drop-unused", is_flag=True, help="Also drop every index no captured plan needs.")
+@click.option("--min-calls", default=1, show_default=True, help="Ignore statements captured fewer times.")
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON.")
+@click.option("--emit-migration", is_flag=True, help="Write the proposal as an Alembic revision.")
+@click.option("--message", default="index advisor", show_default=True, help="Revision message.")
+@click.option("--directory", default=None, help="Migrations directory (default: backend/migrations).")
+@with_appcontext
+def index_advisor_command(captures, what_if_run, drop_unused, min_calls, as_json, emit_migration, message, directory):
+    """Propose index additions and removals from SQL_CAPTURE_FILE captures."""
+    report = advise(load(captures), what_if_run, drop_unused, min_calls)
+    click.echo(json.dumps(report, indent=2) if as_json else format_report(report))
+    if emit_migration and (report["additions"] or report["removals"]):
+        directory = directory or os.path.join(current_app.root_path, "migrations")
+        path = write_migration(report, message, directory)
+        click.echo(f"\nwrote {path}; update models.py to match:", err=as_json)
+        for line in model_changes(report):
+            click.echo(line, err=as_json)
@@ -0,0 +1,377 @@
+# jobs.py
+"""Durable background jobs in the ``jobs`` table; no broker needed.
+
+Register a task and enqueue it from a request::
+
+    @job_queue.task("notify-upvote", max_attempts=3)
+    def notify_upvote(post_id, user_id): ...
+
+    notify_upvote.enqueue(post_id=post.id, user_id=current_user.id)
+    db.session.commit()
+
+:meth:`JobQueue.enqueue` only adds a ``Job`` row to the current session,
+so the job is committed (or rolled back) with the request's own changes:
+no job for a write that failed, no lost job for one that succeeded.
+Payloads are JSON and tasks must be idempotent, because a job whose
+worker dies mid-run is run again.
+
+``flask worker`` runs the jobs on a thread pool, each thread in its own
+app context:
+
+* ready jobs are claimed with one ``UPDATE ... WHERE id IN (SELECT ...
+  FOR UPDATE SKIP LOCKED)`` (SQLite ignores the locking clause and
+  serialises writers instead), so any number of workers can share the
+  table;
+* a failed job is retried after ``JOB_BACKOFF_SECONDS * 2**(attempt - 1)``
+  (+-25% jitter, capped at an hour); after ``max_attempts`` it is *dead*
+  and stays in the table until ``flask jobs retry``;
+* jobs still *running* ``JOB_LOCK_TIMEOUT`` seconds after they were
+  claimed (the worker crashed) are put back in the queue;
+* tasks registered with ``every=<seconds>`` are enqueued once per period
+  (the ``unique_key`` makes concurrent schedulers agree), and not while a
+  previous run is still queued or running;
+* finished jobs are pruned after ``JOB_RETENTION_DAYS``.
+
+The worker logs per-task counters and timings every minute and on exit;
+``flask jobs stats`` shows queue depth and lag.
+"""
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+
+log = logging.getLogger(__name__)
+
+MAX_BACKOFF_SECONDS = 3600
+STATS_LOG_INTERVAL = 60
+
+
+class Task:
+    """A registered job function; call it directly or :meth:`enqueue` it."""
+
+    def __init__(self, queue, name, func, max_attempts, every):
+        self.queue = queue
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.every = every
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, run_at=None, **payload):
+        return self.queue.enqueue(self.name, payload, run_at=run_at)
+
+
+class JobQueue:
+    """Flask extension: task registry, enqueueing and the ``flask worker`` loop."""
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.db = db
+        self.tasks = {}
+        self.stats = Counter()  # (task name, "succeeded" | "retried" | "dead") -> count, this process
+        self.seconds = defaultdict(float)  # task name -> total run time, this process
+        self._stats_lock = threading.Lock()
+        self._scheduled = {}  # periodic task name -> last slot this process enqueued
+        self.task("prune-jobs", every=3600)(self.prune)
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.app = app
+        self.db = db
+        self.concurrency = app.config.setdefault("JOB_WORKER_CONCURRENCY", 4)
+        self.poll_interval = app.config.setdefault("JOB_POLL_INTERVAL", 1.0)
+        self.lock_timeout = app.config.setdefault("JOB_LOCK_TIMEOUT", 600)
+        self.backoff_seconds = app.config.setdefault("JOB_BACKOFF_SECONDS", 10)
+        self.retention_days = app.config.setdefault("JOB_RETENTION_DAYS", 7)
+        app.extensions["job_queue"] = self
+
+    @property
+    def _jobs(self):
+        from backend.models import Job
+
+        return Job.__table__
+
+    # ----------------------------
+    # Registering / enqueueing
+    # ----------------------------
+    def task(self, name, max_attempts=5, every=None):
+        """Decorator registering a job function under ``name``; ``every``: also run it periodically."""
+        def register(func):
+            task = Task(self, name, func, max_attempts, every)
+            self.tasks[name] = task
+            return task
+        return register
+
+    def enqueue(self, name, payload=None, run_at=None):
+        """Add a job to the current session; it is committed with the caller's transaction."""
+        from backend.models import Job
+
+        task = self.tasks[name]  # KeyError for an unknown task: fail in the request, not in the worker
+        job = Job(name=name, payload=payload or {}, max_attempts=task.max_attempts,
+                  run_at=run_at or datetime.utcnow())
+        self.db.session.add(job)
+        return job
+
+    def schedule_periodic(self, now=None):
+        """Enqueue each periodic task whose current period has no run yet; return how many."""
+        now = now or datetime.utcnow()
+        jobs, session = self._jobs, self.db.session
+        scheduled = 0
+        for task in self.tasks.values():
+            if not task.every:
+                continue
+            slot = int(now.timestamp() // task.every)
+            if self._scheduled.get(task.name) == slot:
+                continue
+            pending = session.scalar(select(func.count()).select_from(jobs).where(
+                jobs.c.name == task.name, jobs.c.status.in_(("queued", "running"))
+            ))
+            if not pending:
+                try:
+                    session.execute(insert(jobs).values(
+                        name=task.name, payload={}, status="queued", attempts=0, max_attempts=task.max_attempts,
+                        run_at=now, unique_key=f"{task.name}:{slot}", created_at=now,
+                    ))
+                    session.commit()
+                    scheduled += 1
+                except IntegrityError:
+                    session.rollback()  # another worker scheduled this period first
+            self._scheduled[task.name] = slot
+        session.commit()
+        return scheduled
+
+    # ----------------------------
+    # Claiming / running
+    # ----------------------------
+    def claim(self, worker_id, limit, now=None):
+        """Mark up to ``limit`` ready jobs as running for this worker; return their ids."""
+        now = now or datetime.utcnow()
+        jobs, session = self._jobs, self.db.session
+        token = f"{worker_id}:{uuid.uuid4().hex[:12]}"
+        ready = (
+            select(jobs.c.id)
+            .where(jobs.c.status == "queued", jobs.c.run_at <= now)
+            .order_by(jobs.c.run_at, jobs.c.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        session.execute(
+            update(jobs).where(jobs.c.id.in_(ready))
+            .values(status="running", locked_by=token, locked_at=now, attempts=jobs.c.attempts + 1)
+        )
+        session.commit()
+        return session.scalars(select(jobs.c.id).where(jobs.c.locked_by == token, jobs.c.status == "running")).all()
+
+    def run(self, job_id):
+        """Run one claimed job in a fresh app context and record the outcome."""
+        from backend.models import Job
+
+        with self.app.app_context():
+            session = self.db.session
+            job = session.get(Job, job_id)
+            name, payload, attempts, max_attempts = job.name, job.payload, job.attempts, job.max_attempts
+            session.commit()  # do not hold the read transaction while the task runs
+            started = time.perf_counter()
+            try:
+                task = self.tasks.get(name)
+                if task is None:
+                    raise LookupError(f"no task registered as {name!r}")
+                task.func(**payload)
+            except Exception:
+                session.rollback()
+                outcome = self._failed(job_id, attempts, max_attempts, traceback.format_exc())
+                log.warning("job %s (%s) failed, attempt %s/%s: %s", job_id, name, attempts, max_attempts, outcome)
+            else:
+                session.execute(update(self._jobs).where(self._jobs.c.id == job_id).values(
+                    status="done", finished_at=datetime.utcnow(), last_error=None,
+                ))
+                session.commit()
+                outcome = "succeeded"
+            with self._stats_lock:
+                self.stats[name, outcome] += 1
+                self.seconds[name] += time.perf_counter() - started
+            return outcome
+
+    def backoff(self, attempts):
+        delay = min(self.backoff_seconds * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+        return delay * random.uniform(0.75, 1.25)
+
+    def _failed(self, job_id, attempts, max_attempts, error):
+        now = datetime.utcnow()
+        if attempts >= max_attempts:
+            values, outcome = {"status": "dead", "finished_at": now}, "dead"
+        else:
+            values, outcome = {"status": "queued", "run_at": now + timedelta(seconds=self.backoff(attempts))}, "retried"
+        self.db.session.execute(update(self._jobs).where(self._jobs.c.id == job_id).values(
+            locked_by=None, last_error=error[-4000:], **values,
+        ))
+        self.db.session.commit()
+        return outcome
+
+    def requeue_stale(self, now=None):
+        """Put back jobs whose worker died mid-run (dead if out of attempts); return how many."""
+        now = now or datetime.utcnow()
+        jobs, session = self._jobs, self.db.session
+        stale = (jobs.c.status == "running", jobs.c.locked_at < now - timedelta(seconds=self.lock_timeout))
+        dead = session.execute(update(jobs).where(*stale, jobs.c.attempts >= jobs.c.max_attempts).values(
+            status="dead", finished_at=now, locked_by=None, last_error="worker lost while running the job",
+        )).rowcount
+        requeued = session.execute(update(jobs).where(*stale).values(
+            status="queued", run_at=now, locked_by=None,
+        )).rowcount
+        session.commit()
+        return dead + requeued
+
+    def prune(self, now=None):
+        """Delete finished jobs older than JOB_RETENTION_DAYS (dead jobs are kept)."""
+        now = now or datetime.utcnow()
+        jobs = self._jobs
+        result = self.db.session.execute(delete(jobs).where(
+            jobs.c.status == "done", jobs.c.finished_at < now - timedelta(days=self.retention_days),
+        ))
+        self.db.session.commit()
+        return result.rowcount
+
+    def work(self, concurrency=None, poll_interval=None, burst=False):
+        """The ``flask worker`` loop; ``burst``: exit once no job is ready (no periodic scheduling)."""
+        concurrency = concurrency or self.concurrency
+        poll_interval = poll_interval or self.poll_interval
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stop.set())
+
+        running = set()
+        next_maintenance, next_stats = 0.0, time.monotonic() + STATS_LOG_INTERVAL
+        log.info("worker %s started with %s thread(s)", worker_id, concurrency)
+        with ThreadPoolExecutor(concurrency, thread_name_prefix="job") as executor:
+            while not stop.is_set():
+                if time.monotonic() >= next_maintenance:
+                    if not burst:
+                        self.schedule_periodic()
+                    self.requeue_stale()
+                    next_maintenance = time.monotonic() + poll_interval * 10
+                claimed = self.claim(worker_id, concurrency - len(running)) if len(running) < concurrency else []
+                running.update(executor.submit(self.run, job_id) for job_id in claimed)
+                if burst and not running:
+                    break
+                if not claimed:
+                    if running:
+                        _, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    else:
+                        stop.wait(poll_interval)
+                running = {future for future in running if not future.done()}
+                if time.monotonic() >= next_stats:
+                    self.log_stats()
+                    next_stats = time.monotonic() + STATS_LOG_INTERVAL
+            # graceful stop: in-flight jobs finish, nothing new is claimed
+        self.log_stats()
+        log.info("worker %s stopped", worker_id)
+
+    # ----------------------------
+    # Metrics
+    # ----------------------------
+    def log_stats(self):
+        with self._stats_lock:
+            for name in sorted({name for name, _ in self.stats}):
+                counts = {outcome: self.stats[name, outcome] for outcome in ("succeeded", "retried", "dead")}
+                runs = sum(counts.values())
+                log.info("jobs %s: %s, avg %.3fs", name, counts, self.seconds[name] / runs if runs else 0)
+
+    def queue_stats(self, now=None):
+        """{"by_status": {status: count}, "ready": n, "lag_seconds": age of the oldest ready job}."""
+        now = now or datetime.utcnow()
+        jobs, session = self._jobs, self.db.session
+        by_status = dict(session.execute(select(jobs.c.status, func.count()).group_by(jobs.c.status)).all())
+        ready = (jobs.c.status == "queued", jobs.c.run_at <= now)
+        oldest = session.scalar(select(func.min(jobs.c.run_at)).where(*ready))
+        return {
+            "by_status": {getattr(status, "value", status): count for status, count in by_status.items()},
+            "ready": session.scalar(select(func.count()).select_from(jobs).where(*ready)),
+            "lag_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+        }
+
+    def retry(self, job_ids=None, now=None):
+        """Requeue dead jobs (all of them when ``job_ids`` is None) with a fresh set of attempts."""
+        jobs = self._jobs
+        statement = update(jobs).where(jobs.c.status == "dead")
+        if job_ids is not None:
+            statement = statement.where(jobs.c.id.in_(job_ids))
+        result = self.db.session.execute(statement.values(
+            status="queued", attempts=0, run_at=now or datetime.utcnow(), finished_at=None,
+        ))
+        self.db.session.commit()
+        return result.rowcount
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+@click.command("worker")
+@click.option("--concurrency", type=int, default=None, help="Worker threads [JOB_WORKER_CONCURRENCY].")
+@click.option("--poll-interval", type=float, default=None, help="Seconds between polls when idle [JOB_POLL_INTERVAL].")
+@click.option("--burst", is_flag=True, help="Exit once no job is ready; do not schedule periodic jobs.")
+@with_appcontext
+def worker_command(concurrency, poll_interval, burst):
+    """Run background jobs (and schedule the periodic ones) until stopped."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    current_app.extensions["job_queue"].work(concurrency, poll_interval, burst)
+
+
+@click.group("jobs")
+def jobs_command():
+    """Inspect and manage background jobs."""
+
+
+@jobs_command.command("stats")
+@with_appcontext
+def jobs_stats_command():
+    """Queue depth per status and the lag of the oldest ready job."""
+    stats = current_app.extensions["job_queue"].queue_stats()
+    for status, count in sorted(stats["by_status"].items()):
+        click.echo(f"{status:<10}{count:>10,}")
+    click.echo(f"ready now {stats['ready']:,}, oldest waiting {stats['lag_seconds']:.1f}s")
+
+
+@jobs_command.command("dead")
+@click.option("--limit", default=50, show_default=True)
+@with_appcontext
+def jobs_dead_command(limit):
+    """List dead jobs with the last line of their error."""
+    from backend.models import Job, JobStatusEnum
+
+    dead = Job.query.filter_by(status=JobStatusEnum.dead).order_by(Job.finished_at.desc()).limit(limit).all()
+    for job in dead:
+        error = (job.last_error or "").strip().splitlines()[-1:] or [""]
+        click.echo(f"{job.id:>8} {job.name:<24} {job.attempts} attempt(s)  {job.payload}  {error[0][:120]}")
+
+
+@jobs_command.command("retry")
+@click.argument("job_ids", nargs=-1, type=int)
+@click.option("--all", "retry_all", is_flag=True, help="Requeue every dead job.")
+@with_appcontext
+def jobs_retry_command(job_ids, retry_all):
+    """Requeue dead jobs by id (or --all)."""
+    if not job_ids and not retry_all:
+        raise click.UsageError("give job ids or --all")
+    count = current_app.extensions["job_queue"].retry(None if retry_all else list(job_ids))
+    click.echo(f"{count} job(s) requeued")
@@ -0,0 +1,194 @@
+# lifecycle.py
+"""Listing expiry and archival.
+
+New listings get ``expires_at = now + LISTING_TTL_DAYS``. Two chunked
+passes do the rest, scheduled by ``flask worker`` (or together with
+``flask archive-listings`` from cron):
+
+1. *expire*: active listings past ``expires_at`` are deactivated through
+   the ORM, so the wishlist ("no longer available") and matching hooks see
+   the change like any other deactivation;
+2. *archive*: listings inactive for ``LISTING_ARCHIVE_AFTER_DAYS`` are
+   copied with their images to ``listings_archive`` /
+   ``listing_images_archive`` and deleted from the hot tables, one
+   ``batch_size`` chunk per transaction. Their wishlist rows, matches and
+   pending alerts go with them.
+
+Archived listings keep their id and slug, and ``view_listing`` falls back
+to :func:`find_archived` when a slug is not in ``listings``, so old links
+and notifications still resolve. :func:`table_sizes` is the before/after
+report the command prints.
+"""
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, literal, or_, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import joinedload, selectinload
+
+from backend.extensions import db, job_queue
+from backend.models import (
+    Listing, ListingAlert, ListingArchive, ListingImage, ListingImageArchive, ListingMatch, wishlist,
+)
+from backend import geo
+
+
+ARCHIVE_BATCH = 500
+REPORT_TABLES = ("listings", "listing_images", "listings_archive", "listing_images_archive")
+
+_listings = Listing.__table__
+_images = ListingImage.__table__
+_archive = ListingArchive.__table__
+_archive_images = ListingImageArchive.__table__
+
+
+def expiry(start=None):
+    """``expires_at`` for a listing created at ``start`` (default now); None when expiry is off."""
+    days = current_app.config["LISTING_TTL_DAYS"]
+    return (start or datetime.utcnow()) + timedelta(days=days) if days > 0 else None
+
+
+def find_archived(slug):
+    return (
+        ListingArchive.query.options(joinedload(ListingArchive.category), selectinload(ListingArchive.images))
+        .filter_by(slug=slug)
+        .first()
+    )
+
+
+# ----------------------------
+# Expire / archive
+# ----------------------------
+def expire_listings(batch_size=ARCHIVE_BATCH, now=None):
+    """Deactivate active listings past their ``expires_at``; return how many."""
+    now = now or datetime.utcnow()
+    expired = 0
+    while True:
+        listings = (
+            Listing.query.filter(Listing.is_active == True, Listing.expires_at <= now)
+            .order_by(Listing.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not listings:
+            return expired
+        for listing in listings:
+            listing.is_active = False  # through the ORM: wishlist alerts and matching hooks fire
+        db.session.commit()
+        expired += len(listings)
+
+
+def _move(ids, now):
+    listing_columns = [column.name for column in _listings.columns]
+    db.session.execute(_archive.insert().from_select(
+        listing_columns + ["archived_at"],
+        select(*_listings.columns, literal(now, db.DateTime)).where(_listings.c.id.in_(ids)),
+    ))
+    db.session.execute(_archive_images.insert().from_select(
+        [column.name for column in _images.columns],
+        select(*_images.columns).where(_images.c.listing_id.in_(ids)),
+    ))
+    # explicit deletes: SQLite does not enforce the ON DELETE CASCADEs unless foreign_keys is on
+    db.session.execute(delete(wishlist).where(wishlist.c.listing_id.in_(ids)))
+    db.session.execute(delete(ListingMatch.__table__).where(ListingMatch.__table__.c.listing_id.in_(ids)))
+    db.session.execute(delete(ListingAlert.__table__).where(ListingAlert.__table__.c.listing_id.in_(ids)))
+    db.session.execute(delete(_images).where(_images.c.listing_id.in_(ids)))
+    db.session.execute(delete(_listings).where(_listings.c.id.in_(ids)))
+
+
+def archive_listings(batch_size=ARCHIVE_BATCH, now=None):
+    """Move listings inactive for LISTING_ARCHIVE_AFTER_DAYS to the archive; return how many."""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=current_app.config["LISTING_ARCHIVE_AFTER_DAYS"])
+    # SQLite hands out max(rowid) + 1 for new rows: archiving the newest listing would let
+    # the next one reuse its id (and collide in listings_archive), so it always stays
+    newest = db.session.scalar(select(func.max(_listings.c.id))) or 0
+    archived, last_id = 0, 0
+    while True:
+        ids = db.session.scalars(
+            select(_listings.c.id)
+            .where(
+                or_(_listings.c.is_active == False, _listings.c.is_active.is_(None)),
+                func.coalesce(_listings.c.updated_at, _listings.c.created_at) < cutoff,
+                _listings.c.id > last_id,
+                _listings.c.id < newest,
+            )
+            .order_by(_listings.c.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        _move(ids, now)
+        db.session.commit()
+        archived += len(ids)
+        last_id = ids[-1]
+    if archived:
+        geo.analyze(Listing)  # the planner statistics describe the table before the move
+    return archived
+
+
+# ----------------------------
+# Size report
+# ----------------------------
+def _table_bytes(table):
+    dialect = db.engine.dialect.name
+    try:
+        if dialect == "sqlite":
+            # dbstat: pages of the table and its indexes (needs SQLITE_ENABLE_DBSTAT_VTAB)
+            return db.session.scalar(db.text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                "(SELECT name FROM sqlite_master WHERE tbl_name = :table)"
+            ), {"table": table})
+        if dialect == "postgresql":
+            return db.session.scalar(db.text("SELECT pg_total_relation_size(:table)"), {"table": table})
+    except DBAPIError:
+        db.session.rollback()
+    return None
+
+
+def table_sizes(tables=REPORT_TABLES):
+    """{table: (rows, bytes or None)}; bytes include the table's indexes.
+
+    SQLite counts pages in use: freed pages are reused by later inserts,
+    but the file itself only shrinks after a VACUUM.
+    """
+    return {
+        table: (db.session.scalar(select(func.count()).select_from(db.table(table))), _table_bytes(table))
+        for table in tables
+    }
+
+
+def _size(size):
+    if size is None:
+        return "?"
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def format_report(before, after):
+    lines = [f"{'table':<24}{'rows before':>14}{'rows after':>14}{'size before':>14}{'size after':>14}"]
+    for table, (rows, size) in before.items():
+        rows_after, size_after = after[table]
+        lines.append(f"{table:<24}{rows:>14,}{rows_after:>14,}{_size(size):>14}{_size(size_after):>14}")
+    return "\n".join(lines)
+
+
+# scheduled by `flask worker` (backend.jobs): expiry hourly, archival daily
+job_queue.task("expire-listings", every=3600)(expire_listings)
+job_queue.task("archive-listings", every=86400)(archive_listings)
+
+
+@click.command("archive-listings")
+@click.option("--batch-size", default=ARCHIVE_BATCH, show_default=True)
+@with_appcontext
+def archive_listings_command(batch_size):
+    """Expire listings past expires_at and archive long-inactive ones (run from cron, e.g. nightly)."""
+    before = table_sizes()
+    click.echo(f"{expire_listings(batch_size)} listing(s) expired")
+    click.echo(f"{archive_listings(batch_size)} listing(s) archived")
+    click.echo(format_report(before, table_sizes()))
@@ -0,0 +1,116 @@
+# loader_profiles.py
+"""Named relationship-loading profiles, applied per view.
+
+Relationships in ``models.py`` are lazy by default; a view states what its
+template is going to touch by picking a profile::
+
+    Post.query.options(*loader_options("feed"))
+
+so the feed loads the authors and tags of all posts in two extra queries
+instead of one per card, while a view that never renders tags does not pay
+for them.
+
+``lazy="dynamic"`` relationships (``Post.comments``, ``Post.upvotes``) cannot
+take loader options; for those a view hands the template a
+:class:`BatchLoader`, which fetches the values for every row of the page in
+one query the first time the template asks for any of them.
+"""
+from sqlalchemy.orm import joinedload, selectinload
+
+from backend.models import Comment, Conversation, Listing, ListingMatch, Message, Post
+
+
+LOADER_PROFILES = {}
+
+
+def loader_profile(name):
+    """Register the decorated zero-argument function as the option factory for ``name``."""
+    def decorator(factory):
+        LOADER_PROFILES[name] = factory
+        return factory
+    return decorator
+
+
+def loader_options(name):
+    """The loader options of profile ``name`` (built once, then reused)."""
+    profile = LOADER_PROFILES[name]
+    if callable(profile):
+        profile = LOADER_PROFILES[name] = tuple(profile())
+    return profile
+
+
+class BatchLoader:
+    """``loader(key)`` for a page of keys, loaded by one ``load(keys) -> dict`` call on first use.
+
+    Nothing is queried when the template never calls it (e.g. every card
+    came from the fragment cache).
+    """
+
+    def __init__(self, keys, load, default=None):
+        self.keys = list(keys)
+        self.default = default
+        self._load = load
+        self._values = None
+
+    def __call__(self, key):
+        if self._values is None:
+            self._values = self._load(self.keys) if self.keys else {}
+        return self._values.get(key, self.default)
+
+
+# ----------------------------
+# Community
+# ----------------------------
+@loader_profile("feed")
+def _feed():
+    return [selectinload(Post.author), selectinload(Post.tags)]
+
+
+@loader_profile("detail")
+def _detail():
+    return [joinedload(Post.author), selectinload(Post.tags)]
+
+
+@loader_profile("comment_tree")
+def _comment_tree():
+    # replies are attached by the view in one query (routes_community._attach_replies)
+    return [joinedload(Comment.author)]
+
+
+# ----------------------------
+# Marketplace
+# ----------------------------
+@loader_profile("listing_card")
+def _listing_card():
+    return [joinedload(Listing.category)]
+
+
+@loader_profile("listing_detail")
+def _listing_detail():
+    return [joinedload(Listing.category), selectinload(Listing.images)]
+
+
+@loader_profile("match_card")
+def _match_card():
+    return [joinedload(ListingMatch.listing).joinedload(Listing.category)]
+
+
+# ----------------------------
+# Messaging
+# ----------------------------
+@loader_profile("inbox")
+def _inbox():
+    return [selectinload(Conversation.participants)]
+
+
+@loader_profile("thread")
+def _thread():
+    return [
+        selectinload(Conversation.participants),
+        selectinload(Conversation.messages).joinedload(Message.sender),
+    ]
+
+
+@loader_profile("message_preview")
+def _message_preview():
+    return [joinedload(Message.sender)]
@@ -0,0 +1,392 @@
+# matching.py
+"""Matching waste listings with the recyclers who want them.
+
+Recyclers register ``RecyclerInterest`` rows: a category, optionally a
+region (as normalised by ``backend.geo``), a maximum distance and a minimum
+quantity. ``ix_recycler_interests_category_region`` makes that table an
+inverted index from (category, region) to recyclers: matching a listing
+reads only the interests for its category in its region, plus the
+"anywhere" ones.
+
+Each candidate gets a score in [0, 1] from
+
+* quantity: log-scaled, saturating at ``QUANTITY_SCALE``;
+* distance: ``exp(-km / DISTANCE_SCALE_KM)`` between the listing and the
+  recycler's profile location (``UNKNOWN_DISTANCE`` if either is not geocoded);
+* history: conversations the recycler and the listing owner already share,
+
+and the best ``MAX_MATCHES`` per listing are kept in ``listing_matches``.
+
+Matching is incremental. An ``after_flush`` hook rematches, in the same
+transaction, every listing whose category, region, quantity, position or
+status changed, and the recent listings an added interest covers. The top
+``NOTIFY_TOP`` matches of a listing are notified once, batched as one
+notification per recycler ("3 new listings match your interests").
+
+``flask rematch`` rebuilds every match in keyset chunks of listings,
+committing (and notifying) per chunk; run it after bulk imports or a change
+of weights. ``flask rematch --enqueue`` (or ``rematch_job.enqueue()``) runs
+the same rebuild in ``flask worker``, one job per chunk.
+"""
+from collections import defaultdict
+from datetime import datetime
+import math
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, delete, event, func, inspect, or_, select, update
+
+from backend import geo
+from backend.extensions import db, job_queue
+from backend.models import (
+    Listing, ListingMatch, ListingTypeEnum, Notification, RecyclerInterest, RoleEnum, User,
+    conversation_participants,
+)
+
+
+MAX_MATCHES = 20  # stored per listing
+NOTIFY_TOP = 5  # of those, notified
+INTEREST_BACKFILL = 200  # recent listings matched when an interest is added
+MAX_MATCHES_SHOWN = 50  # on /marketplace/matches
+
+QUANTITY_SCALE = 1000  # quantity at which the quantity term reaches 1
+DISTANCE_SCALE_KM = 25
+UNKNOWN_DISTANCE = 0.3
+HISTORY_HALF = 2  # shared conversations for half the history term
+WEIGHTS = {"quantity": 0.35, "distance": 0.45, "history": 0.2}
+
+# a change to any of these rematches the listing
+MATCH_FIELDS = ("category_id", "region", "quantity", "latitude", "longitude", "is_active", "listing_type")
+
+_listings = Listing.__table__
+_interests = RecyclerInterest.__table__
+_matches = ListingMatch.__table__
+_users = User.__table__
+
+
+def score(quantity, distance_km, shared_conversations):
+    quantity_term = min(math.log1p(max(quantity or 0, 0)) / math.log1p(QUANTITY_SCALE), 1.0)
+    distance_term = UNKNOWN_DISTANCE if distance_km is None else math.exp(-distance_km / DISTANCE_SCALE_KM)
+    history_term = shared_conversations / (shared_conversations + HISTORY_HALF)
+    return round(
+        WEIGHTS["quantity"] * quantity_term
+        + WEIGHTS["distance"] * distance_term
+        + WEIGHTS["history"] * history_term,
+        4,
+    )
+
+
+# ----------------------------
+# Candidates
+# ----------------------------
+class InterestIndex:
+    """Interest rows (with the recycler's coordinates) keyed by (category_id, region)."""
+
+    def __init__(self, rows):
+        self._by_key = defaultdict(list)
+        for row in rows:
+            self._by_key[row.category_id, row.region].append(row)
+
+    @classmethod
+    def load(cls, connection, keys=None):
+        """Interests of active recyclers for ``keys`` {(category_id, region)}, or all of them."""
+        statement = (
+            select(_interests.c.user_id, _interests.c.category_id, _interests.c.region,
+                   _interests.c.max_distance_km, _interests.c.min_quantity,
+                   _users.c.latitude, _users.c.longitude)
+            .join(_users, _users.c.id == _interests.c.user_id)
+            .where(_users.c.role == RoleEnum.recycler, _users.c.is_deleted.isnot(True))
+        )
+        if keys is not None:
+            if not keys:
+                return cls([])
+            regions = {region for _, region in keys if region is not None}
+            statement = statement.where(
+                _interests.c.category_id.in_({category_id for category_id, _ in keys}),
+                or_(_interests.c.region.is_(None), _interests.c.region.in_(regions)),
+            )
+        return cls(connection.execute(statement).all())
+
+    def candidates(self, category_id, region):
+        found = list(self._by_key.get((category_id, None), ()))
+        if region is not None:
+            found += self._by_key.get((category_id, region), ())
+        return found
+
+
+def _shared_conversations(connection, pairs):
+    """{(owner_id, recycler_id): conversations both take part in} for ``pairs``."""
+    if not pairs:
+        return {}
+    owner = conversation_participants.alias("owner")
+    other = conversation_participants.alias("other")
+    rows = connection.execute(
+        select(owner.c.user_id.label("owner_id"), other.c.user_id.label("recycler_id"), func.count())
+        .join(other, other.c.conversation_id == owner.c.conversation_id)
+        .where(owner.c.user_id.in_({o for o, _ in pairs}), other.c.user_id.in_({r for _, r in pairs}))
+        .group_by(owner.c.user_id, other.c.user_id)
+    )
+    return {(o, r): n for o, r, n in rows if (o, r) in pairs}
+
+
+def _eligible(row):
+    return bool(row.is_active) and row.listing_type == ListingTypeEnum.waste and row.category_id is not None
+
+
+def _rank(connection, rows, index):
+    """{listing_id: [(user_id, score, distance_km)] best first, at most MAX_MATCHES}."""
+    import numpy as np  # imported on first use, not at worker boot
+
+    candidates = {
+        row.id: [i for i in index.candidates(row.category_id, row.region) if i.user_id != row.owner_id]
+        for row in rows if _eligible(row)
+    }
+    owners = {row.id: row.owner_id for row in rows}
+    history = _shared_conversations(
+        connection, {(owners[listing_id], i.user_id) for listing_id, found in candidates.items() for i in found}
+    )
+
+    ranked = {}
+    for row in rows:
+        found = candidates.get(row.id)
+        if not found:
+            ranked[row.id] = []
+            continue
+        distances = [None] * len(found)
+        if row.latitude is not None and row.longitude is not None:
+            latitudes = np.array([np.nan if i.latitude is None else i.latitude for i in found], dtype=np.float64)
+            longitudes = np.array([np.nan if i.longitude is None else i.longitude for i in found], dtype=np.float64)
+            distances = [
+                None if math.isnan(d) else round(float(d), 2)
+                for d in geo.haversine_km(row.latitude, row.longitude, latitudes, longitudes)
+            ]
+
+        best = {}  # a recycler can hit one listing through a regional and an "anywhere" interest
+        for interest, distance in zip(found, distances):
+            if interest.min_quantity is not None and (row.quantity or 0) < interest.min_quantity:
+                continue
+            if interest.max_distance_km is not None and distance is not None and distance > interest.max_distance_km:
+                continue
+            value = score(row.quantity, distance, history.get((row.owner_id, interest.user_id), 0))
+            if interest.user_id not in best or value > best[interest.user_id][0]:
+                best[interest.user_id] = (value, distance)
+        ordered = sorted(best.items(), key=lambda item: (-item[1][0], item[0]))[:MAX_MATCHES]
+        ranked[row.id] = [(user_id, value, distance) for user_id, (value, distance) in ordered]
+    return ranked
+
+
+# ----------------------------
+# Storing and notifying
+# ----------------------------
+def match_listings(connection, listing_ids, index=None, now=None):
+    """Recompute the stored matches of ``listing_ids``; return the matches to notify.
+
+    ``index`` is loaded for just these listings when not given. Returns
+    [(user_id, listing row, distance_km)] for top matches not notified before;
+    their ``notified_at`` is already set.
+    """
+    if not listing_ids:
+        return []
+    now = now or datetime.utcnow()
+    rows = connection.execute(
+        select(_listings.c.id, _listings.c.owner_id, _listings.c.category_id, _listings.c.region,
+               _listings.c.quantity, _listings.c.latitude, _listings.c.longitude, _listings.c.is_active,
+               _listings.c.listing_type, _listings.c.title, _listings.c.slug)
+        .where(_listings.c.id.in_(listing_ids))
+    ).all()
+    if index is None:
+        index = InterestIndex.load(connection, {(r.category_id, r.region) for r in rows if _eligible(r)})
+    ranked = _rank(connection, rows, index)
+
+    existing = {
+        (m.listing_id, m.user_id): m
+        for m in connection.execute(
+            select(_matches.c.id, _matches.c.listing_id, _matches.c.user_id, _matches.c.score,
+                   _matches.c.distance_km, _matches.c.notified_at)
+            .where(_matches.c.listing_id.in_(listing_ids))
+        )
+    }
+    inserts, updates, pending = [], [], []
+    for row in rows:
+        for position, (user_id, value, distance) in enumerate(ranked.get(row.id, ())):
+            notify = position < NOTIFY_TOP
+            old = existing.pop((row.id, user_id), None)
+            if old is None:
+                inserts.append({"listing_id": row.id, "user_id": user_id, "score": value, "distance_km": distance,
+                                "created_at": now, "notified_at": now if notify else None})
+            elif old.score != value or old.distance_km != distance or (notify and old.notified_at is None):
+                updates.append({"match_id": old.id, "new_score": value, "new_distance": distance,
+                                "new_notified_at": old.notified_at or (now if notify else None)})
+            if notify and (old is None or old.notified_at is None):
+                pending.append((user_id, row, distance))
+
+    if existing:  # no longer a top match (or the listing stopped being eligible)
+        connection.execute(delete(_matches).where(_matches.c.id.in_([m.id for m in existing.values()])))
+    if inserts:
+        connection.execute(_matches.insert(), inserts)
+    if updates:
+        connection.execute(
+            update(_matches)
+            .where(_matches.c.id == bindparam("match_id"))
+            .values(score=bindparam("new_score"), distance_km=bindparam("new_distance"),
+                    notified_at=bindparam("new_notified_at")),
+            updates,
+        )
+    return pending
+
+
+def _path(endpoint, **values):
+    # url_for needs a request (or SERVER_NAME); the CLI job has neither
+    return current_app.url_map.bind("").build(endpoint, values)
+
+
+def notify(connection, pending):
+    """One notification per recycler for ``pending`` matches; returns notifications written."""
+    by_user = defaultdict(list)
+    for user_id, row, distance in pending:
+        by_user[user_id].append((row, distance))
+    notifications = []
+    for user_id, found in sorted(by_user.items()):
+        if len(found) == 1:
+            row, distance = found[0]
+            away = f" ({distance:.0f} km away)" if distance is not None else ""
+            message = f"New listing matches your interests: '{row.title[:150]}'{away}"
+            link = _path("marketplace.view_listing", slug=row.slug)
+        else:
+            message = f"{len(found)} new listings match your interests"
+            link = _path("marketplace.matches")
+        notifications.append({"user_id": user_id, "message": message, "link": link})
+    if notifications:
+        connection.execute(Notification.__table__.insert(), notifications)
+    return len(notifications)
+
+
+# ----------------------------
+# Incremental matching
+# ----------------------------
+def _listing_changed(session, listing):
+    if listing in session.new:
+        return True
+    attrs = inspect(listing).attrs
+    return any(attrs[name].history.has_changes() for name in MATCH_FIELDS)
+
+
+def _listings_for_interest(connection, interest):
+    statement = (
+        select(_listings.c.id)
+        .where(_listings.c.category_id == interest.category_id,
+               _listings.c.is_active == True,
+               _listings.c.listing_type == ListingTypeEnum.waste)
+        .order_by(_listings.c.id.desc())
+        .limit(INTEREST_BACKFILL)
+    )
+    if interest.region is not None:
+        statement = statement.where(_listings.c.region == interest.region)
+    return connection.scalars(statement).all()
+
+
+@event.listens_for(db.session, "after_flush")
+def _match_on_flush(session, flush_context):
+    listing_ids = set()
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Listing) and _listing_changed(session, obj):
+            listing_ids.add(obj.id)
+    interests = [obj for obj in session.new | session.deleted if isinstance(obj, RecyclerInterest)]
+    if not listing_ids and not interests:
+        return
+
+    connection = session.connection()
+    for interest in interests:
+        if interest in session.new:
+            listing_ids.update(_listings_for_interest(connection, interest))
+        else:  # re-rank the listings this recycler was matched to
+            listing_ids.update(connection.scalars(
+                select(_matches.c.listing_id).where(_matches.c.user_id == interest.user_id)
+            ))
+    notify(connection, match_listings(connection, sorted(listing_ids)))
+
+
+# ----------------------------
+# Full rematch
+# ----------------------------
+def _drop_ineligible_matches():
+    """Matches of listings that are no longer eligible go in one statement."""
+    db.session.execute(delete(_matches).where(_matches.c.listing_id.in_(
+        select(_listings.c.id).where(or_(_listings.c.is_active.isnot(True),
+                                         _listings.c.listing_type != ListingTypeEnum.waste,
+                                         _listings.c.category_id.is_(None)))
+    )))
+
+
+def _rematch_chunk(after_id, batch_size, send_notifications, index=None):
+    """Match the next ``batch_size`` eligible listings after ``after_id``; return (ids, notifications sent).
+
+    The caller commits.
+    """
+    ids = db.session.scalars(
+        select(_listings.c.id)
+        .where(
+            _listings.c.is_active == True,
+            _listings.c.listing_type == ListingTypeEnum.waste,
+            _listings.c.category_id.isnot(None),
+            _listings.c.id > after_id,
+        )
+        .order_by(_listings.c.id)
+        .limit(batch_size)
+    ).all()
+    if not ids:
+        return ids, 0
+    connection = db.session.connection()
+    pending = match_listings(connection, ids, index=index or InterestIndex.load(connection))
+    return ids, notify(connection, pending) if send_notifications else 0
+
+
+def rematch(batch_size=1000, send_notifications=True):
+    """Recompute matches for every listing in chunks; return (listings matched, notifications sent)."""
+    index = InterestIndex.load(db.session.connection())
+    _drop_ineligible_matches()
+    db.session.commit()
+
+    last_id, listings, sent = 0, 0, 0
+    while True:
+        ids, chunk_sent = _rematch_chunk(last_id, batch_size, send_notifications, index=index)
+        if not ids:
+            return listings, sent
+        db.session.commit()
+        listings += len(ids)
+        sent += chunk_sent
+        last_id = ids[-1]
+
+
+@job_queue.task("rematch")
+def rematch_job(after_id=0, batch_size=1000, send_notifications=True):
+    """One chunk of :func:`rematch` per job, for ``flask worker``.
+
+    Each chunk enqueues the next one in its own commit, so a failed chunk is
+    retried on its own and the run resumes from it instead of starting over.
+    """
+    if not after_id:
+        _drop_ineligible_matches()
+    ids, _ = _rematch_chunk(after_id, batch_size, send_notifications)
+    if ids:
+        rematch_job.enqueue(after_id=ids[-1], batch_size=batch_size, send_notifications=send_notifications)
+    db.session.commit()
+
+
+@click.command("rematch")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--notify/--no-notify", "send_notifications", default=True, show_default=True,
+              help="Notify recyclers of new top matches, one notification per recycler per chunk "
+                   "(--no-notify marks them as notified without sending).")
+@click.option("--enqueue", is_flag=True, help="Queue the rebuild as chunked jobs for `flask worker` instead.")
+@with_appcontext
+def rematch_command(batch_size, send_notifications, enqueue):
+    """Rebuild listing/recycler matches for the whole catalog."""
+    if enqueue:
+        rematch_job.enqueue(batch_size=batch_size, send_notifications=send_notifications)
+        db.session.commit()
+        click.echo("rematch queued")
+        return
+    listings, sent = rematch(batch_size, send_notifications)
+    click.echo(f"{listings} listing(s) matched, {sent} notification(s) sent")
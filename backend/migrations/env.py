@@ -90,9 +90,16 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the SQLite full-text index (backend/search.py) is a virtual table with
+    # shadow tables; it is managed by hand, not by autogenerate
+    def include_name(name, type_, parent_names):
+        return not (type_ == "table" and name.startswith("messages_fts"))
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_name") is None:
+        conf_args["include_name"] = include_name
 
     connectable = get_engine()
 
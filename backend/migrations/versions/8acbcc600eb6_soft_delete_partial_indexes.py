@@ -0,0 +1,106 @@
+"""soft delete partial indexes
+
+Revision ID: 8acbcc600eb6
+Revises: c2448bfb7343
+Create Date: 2026-10-19 08:24:29.365946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8acbcc600eb6'
+down_revision = 'c2448bfb7343'
+branch_labels = None
+depends_on = None
+
+
+LIVE = sa.column('is_deleted') == sa.false()  # renders "= 0" on SQLite, "= false" on PostgreSQL
+ACTIVE = sa.column('is_active') == sa.true()
+
+
+def upgrade():
+    # is_deleted was nullable and NULL counted as live; make it false so the
+    # soft-delete filter and the partial index predicates agree.
+    for table in ('users', 'posts', 'comments'):
+        op.execute(sa.text(f'UPDATE {table} SET is_deleted = :no WHERE is_deleted IS NULL').bindparams(no=False))
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.alter_column('is_deleted',
+               existing_type=sa.BOOLEAN(),
+               nullable=False,
+               server_default=sa.false())
+        batch_op.drop_index(batch_op.f('ix_comments_is_deleted'))
+        batch_op.create_index('ix_comments_live_parent', ['parent_id'], unique=False, sqlite_where=LIVE, postgresql_where=LIVE)
+        batch_op.create_index('ix_comments_live_post', ['post_id', 'created_at'], unique=False, sqlite_where=LIVE, postgresql_where=LIVE)
+
+    with op.batch_alter_table('listings', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_listing_type_active'))
+        batch_op.drop_index(batch_op.f('ix_listings_is_active'))
+        batch_op.create_index('ix_listings_active_created', ['created_at'], unique=False, sqlite_where=ACTIVE, postgresql_where=ACTIVE)
+        batch_op.create_index('ix_listings_active_type', ['listing_type', 'category_id'], unique=False, sqlite_where=ACTIVE, postgresql_where=ACTIVE)
+
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.alter_column('is_deleted',
+               existing_type=sa.BOOLEAN(),
+               nullable=False,
+               server_default=sa.false())
+        batch_op.drop_index(batch_op.f('ix_posts_deleted_hot'))
+        batch_op.drop_index(batch_op.f('ix_posts_deleted_upvotes'))
+        batch_op.drop_index(batch_op.f('ix_posts_is_deleted'))
+        batch_op.drop_index(batch_op.f('ix_posts_pinned_deleted'))
+        # superseded by the live indexes below: nothing reads deleted posts by author or date
+        batch_op.drop_index(batch_op.f('ix_posts_created_at'))
+        batch_op.drop_index(batch_op.f('ix_posts_user_id'))
+        batch_op.create_index('ix_posts_live_created', ['created_at'], unique=False, sqlite_where=LIVE, postgresql_where=LIVE)
+        batch_op.create_index('ix_posts_live_hot', ['hot_score'], unique=False, sqlite_where=LIVE, postgresql_where=LIVE)
+        batch_op.create_index('ix_posts_live_upvotes', ['upvote_count'], unique=False, sqlite_where=LIVE, postgresql_where=LIVE)
+        batch_op.create_index('ix_posts_live_user', ['user_id', 'created_at'], unique=False, sqlite_where=LIVE, postgresql_where=LIVE)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('is_deleted',
+               existing_type=sa.BOOLEAN(),
+               nullable=False,
+               server_default=sa.false())
+        batch_op.drop_index(batch_op.f('ix_users_is_deleted'))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_is_deleted'), ['is_deleted'], unique=False)
+        batch_op.alter_column('is_deleted',
+               existing_type=sa.BOOLEAN(),
+               nullable=True,
+               server_default=None)
+
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_index('ix_posts_live_user')
+        batch_op.drop_index('ix_posts_live_upvotes')
+        batch_op.drop_index('ix_posts_live_hot')
+        batch_op.drop_index('ix_posts_live_created')
+        batch_op.create_index(batch_op.f('ix_posts_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_posts_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_posts_pinned_deleted'), ['pinned', 'is_deleted'], unique=False)
+        batch_op.create_index(batch_op.f('ix_posts_is_deleted'), ['is_deleted'], unique=False)
+        batch_op.create_index(batch_op.f('ix_posts_deleted_upvotes'), ['is_deleted', 'upvote_count'], unique=False)
+        batch_op.create_index(batch_op.f('ix_posts_deleted_hot'), ['is_deleted', 'hot_score'], unique=False)
+        batch_op.alter_column('is_deleted',
+               existing_type=sa.BOOLEAN(),
+               nullable=True,
+               server_default=None)
+
+    with op.batch_alter_table('listings', schema=None) as batch_op:
+        batch_op.drop_index('ix_listings_active_type')
+        batch_op.drop_index('ix_listings_active_created')
+        batch_op.create_index(batch_op.f('ix_listings_is_active'), ['is_active'], unique=False)
+        batch_op.create_index(batch_op.f('ix_listing_type_active'), ['listing_type', 'is_active'], unique=False)
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_index('ix_comments_live_post')
+        batch_op.drop_index('ix_comments_live_parent')
+        batch_op.create_index(batch_op.f('ix_comments_is_deleted'), ['is_deleted'], unique=False)
+        batch_op.alter_column('is_deleted',
+               existing_type=sa.BOOLEAN(),
+               nullable=True,
+               server_default=None)
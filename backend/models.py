@@ -4,10 +4,9 @@ import enum
 from enum import Enum
 import secrets
 from flask_login import UserMixin
-from slugify import slugify
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from sqlalchemy import Index, Table, UniqueConstraint
+from sqlalchemy import Index, Table, UniqueConstraint, false, true
 from backend.extensions import db  # your flask-sqlalchemy instance
 
 
@@ -27,6 +26,18 @@ class ListingTypeEnum(str, enum.Enum):
     recycled = "recycled"
 
 
+def partial(condition):
+    """Keyword arguments making an ``Index`` partial (``WHERE condition``) on SQLite and PostgreSQL."""
+    return {"sqlite_where": condition, "postgresql_where": condition}
+
+
+def slugify(text):
+    """python-slugify's ``slugify``, imported on first use rather than at worker boot."""
+    from slugify import slugify as _slugify
+
+    return _slugify(text)
+
+
 # ----------------------------
 # Mixins
 # ----------------------------
@@ -36,7 +47,9 @@ class TimestampMixin:
 
 
 class SoftDeleteMixin:
-    is_deleted = db.Column(db.Boolean, default=False, index=True)
+    # ORM queries skip deleted rows (backend/soft_delete.py). No index of its own: a flag narrows
+    # nothing; hot lookups use partial indexes WHERE is_deleted = false instead.
+    is_deleted = db.Column(db.Boolean, nullable=False, default=False, server_default=false())
 
 
 # ----------------------------
@@ -59,6 +72,11 @@ class User(db.Model, UserMixin, TimestampMixin, SoftDeleteMixin):
     full_name = db.Column(db.String(120), nullable=True)
     bio = db.Column(db.Text, nullable=True)
     location = db.Column(db.String(150), nullable=True, index=True)
+    # resolved from `location` by backend.geo (gazetteer lookup)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geo_cell = db.Column(db.Integer, nullable=True, index=True)
+    region = db.Column(db.String(120), nullable=True, index=True)
     avatar_url = db.Column(db.String(512), nullable=True, default="/static/images/default-avatar.png")
 
     # Social links
@@ -90,24 +108,30 @@ class User(db.Model, UserMixin, TimestampMixin, SoftDeleteMixin):
     post_upvotes = db.relationship("PostUpvote", back_populates="user", lazy="dynamic", cascade="all, delete-orphan")
     notifications = db.relationship("Notification", back_populates="user", lazy="dynamic", cascade="all, delete-orphan")
     sent_messages = db.relationship("Message", back_populates="sender", lazy="dynamic", cascade="all, delete-orphan")
+    interests = db.relationship("RecyclerInterest", back_populates="user", lazy="dynamic", cascade="all, delete-orphan")
 
     conversations = db.relationship(
         "Conversation",
         secondary="conversation_participants",
         back_populates="participants",
-        lazy="subquery"
+        lazy="select"  # was "subquery": loaded every conversation on each user load
     )
 
     # --- Convenience properties ---
     @property
     def total_messages(self):
-        # cheaper alternative: count messages across conversations without loading all messages
-        return sum(conv.messages.count() if hasattr(conv.messages, 'count') else len(conv.messages) for conv in self.conversations)
+        # one COUNT across the user's conversations, without loading conversations or messages
+        return (
+            Message.query
+            .join(conversation_participants, conversation_participants.c.conversation_id == Message.conversation_id)
+            .filter(conversation_participants.c.user_id == self.id)
+            .count()
+        )
 
     @property
     def total_upvotes_received(self):
-        # sum upvotes on posts (posts are lazy='dynamic')
-        return sum(p.upvotes.count() for p in self.posts)
+        # one COUNT over upvotes joined to the user's posts (not one per post)
+        return PostUpvote.query.join(Post, Post.id == PostUpvote.post_id).filter(Post.user_id == self.id).count()
 
     @property
     def total_posts(self):
@@ -163,14 +187,20 @@ class User(db.Model, UserMixin, TimestampMixin, SoftDeleteMixin):
 # --------------------------------------------------------------------
 
 
-# ---------- FIX wishlist table definition (replace existing wishlist) ----------
+Index("ix_users_lat_lon", User.latitude, User.longitude)
+
+
+# ----------------------------
+# Wishlist (see backend/wishlist.py)
+# ----------------------------
 wishlist = db.Table(
     "wishlist",
     db.Column("user_id", db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
     db.Column("listing_id", db.Integer, db.ForeignKey("listings.id", ondelete="CASCADE"), primary_key=True),
     db.Column("created_at", db.DateTime, default=datetime.utcnow),
 )
-# --------------------------------------------------------------------
+# the alert job joins pending alerts to wishlist rows by listing
+Index("ix_wishlist_listing", wishlist.c.listing_id)
 
 # ----------------------------
 # Category
@@ -206,17 +236,29 @@ class Listing(db.Model):
     title = db.Column(db.String(255), nullable=False, index=True)
     slug = db.Column(db.String(300), nullable=False, unique=True, index=True)
     description = db.Column(db.Text, nullable=True)
-    listing_type = db.Column(db.Enum(ListingTypeEnum), nullable=False, index=True)
-
-    category_id = db.Column(db.Integer, db.ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True)
+    # active_history on the impact dimensions and measures: backend.impact moves the old
+    # values out of their rollup row when they change
+    listing_type = db.column_property(db.Column(db.Enum(ListingTypeEnum), nullable=False, index=True),
+                                      active_history=True)
+
+    category_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True),
+        active_history=True,
+    )
     category = db.relationship("Category", back_populates="listings", lazy=True)
 
-    quantity = db.Column(db.Float, default=0)
-    unit = db.Column(db.String(20), default="kg")
-    price = db.Column(db.Float, nullable=True)
+    quantity = db.column_property(db.Column(db.Float, default=0), active_history=True)
+    unit = db.column_property(db.Column(db.String(20), default="kg"), active_history=True)
+    # active_history: backend.wishlist compares old and new price / is_active to raise alerts
+    price = db.column_property(db.Column(db.Float, nullable=True), active_history=True)
     currency = db.Column(db.String(10), default="RWF")
     location = db.Column(db.String(200), nullable=True, index=True)
-    is_active = db.Column(db.Boolean, default=True, index=True)
+    # resolved from `location` by backend.geo (gazetteer lookup)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geo_cell = db.Column(db.Integer, nullable=True, index=True)
+    region = db.column_property(db.Column(db.String(120), nullable=True, index=True), active_history=True)
+    is_active = db.column_property(db.Column(db.Boolean, default=True), active_history=True)
 
     owner_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     owner = db.relationship("User", back_populates="listings", lazy=True)
@@ -225,8 +267,12 @@ class Listing(db.Model):
     contact_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # deactivated by `flask archive-listings` once passed (see backend.lifecycle); None: never
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
 
     images = db.relationship("ListingImage", back_populates="listing", lazy=True, cascade="all, delete-orphan")
+    matches = db.relationship("ListingMatch", back_populates="listing", lazy="dynamic",
+                              cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -238,8 +284,92 @@ class Listing(db.Model):
         return f"<Listing {self.title} ({self.listing_type})>"
 
 
-Index("ix_listing_type_active", Listing.listing_type, Listing.is_active)
+# active listings only: the marketplace, nearby search filters and recycler matching
+Index("ix_listings_active_created", Listing.created_at, **partial(Listing.is_active == true()))
+Index("ix_listings_active_type", Listing.listing_type, Listing.category_id, **partial(Listing.is_active == true()))
 Index("ix_listing_owner_category", Listing.owner_id, Listing.category_id)
+Index("ix_listings_lat_lon", Listing.latitude, Listing.longitude)
+
+
+# ----------------------------
+# Supply-demand matching (see backend/matching.py)
+# ----------------------------
+class RecyclerInterest(db.Model):
+    """A recycler wants waste of ``category`` in ``region`` (None: anywhere)."""
+    __tablename__ = "recycler_interests"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id", ondelete="CASCADE"), nullable=False)
+    region = db.Column(db.String(120), nullable=True)
+    max_distance_km = db.Column(db.Float, nullable=True)
+    min_quantity = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    user = db.relationship("User", back_populates="interests")
+    category = db.relationship("Category", lazy="select")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "category_id", "region", name="uq_interest_user_category_region"),
+    )
+
+    def __repr__(self):
+        return f"<RecyclerInterest User {self.user_id} -> {self.category_id}/{self.region or '*'}>"
+
+
+# the inverted index: (category, region) -> interested recyclers
+Index("ix_recycler_interests_category_region", RecyclerInterest.category_id, RecyclerInterest.region)
+
+
+class ListingMatch(db.Model):
+    """A scored pairing of a waste listing with an interested recycler."""
+    __tablename__ = "listing_matches"
+
+    id = db.Column(db.Integer, primary_key=True)
+    listing_id = db.Column(db.Integer, db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    distance_km = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    notified_at = db.Column(db.DateTime, nullable=True)
+
+    listing = db.relationship("Listing", back_populates="matches")
+    user = db.relationship("User", lazy="select")
+
+    __table_args__ = (
+        UniqueConstraint("listing_id", "user_id", name="uq_listing_match"),
+    )
+
+    def __repr__(self):
+        return f"<ListingMatch Listing {self.listing_id} -> User {self.user_id} ({self.score:.2f})>"
+
+
+Index("ix_listing_matches_user_score", ListingMatch.user_id, ListingMatch.score)
+
+
+class ListingAlertKindEnum(str, enum.Enum):
+    price_drop = "price_drop"
+    available = "available"
+    unavailable = "unavailable"
+
+
+class ListingAlert(db.Model):
+    """A price or availability change of a listing, waiting to be sent to wishlists."""
+    __tablename__ = "listing_alerts"
+
+    id = db.Column(db.Integer, primary_key=True)
+    listing_id = db.Column(db.Integer, db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False)
+    kind = db.Column(db.Enum(ListingAlertKindEnum), nullable=False)
+    old_price = db.Column(db.Float, nullable=True)
+    new_price = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ListingAlert {self.kind} Listing {self.listing_id}>"
+
+
+Index("ix_listing_alerts_pending", ListingAlert.processed_at, ListingAlert.id)
 
 
 # ----------------------------
@@ -252,8 +382,11 @@ post_tags = Table(
     db.Column("tag_id", db.Integer, db.ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
 )
 
+# covering index for "posts with this tag", newest first (the primary key leads with post_id)
+Index("ix_post_tags_tag_post", post_tags.c.tag_id, post_tags.c.post_id)
 
-class Post(db.Model):
+
+class Post(db.Model, SoftDeleteMixin):
     __tablename__ = "posts"
 
     id = db.Column(db.Integer, primary_key=True)
@@ -261,17 +394,25 @@ class Post(db.Model):
     content=db.Column(db.Text, nullable=False)
     image= db.Column(db.String(255), nullable= True)
     slug = db.Column(db.String(300), nullable=False, unique=True, index=True) 
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
 
     author = db.relationship("User", back_populates="posts", lazy=True, foreign_keys=[user_id])
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    is_deleted = db.Column(db.Boolean, default=False, index=True)
+    # active_history: the flush hook in backend.tags needs the previous value to adjust Tag.post_count
+    is_deleted = db.column_property(db.Column(db.Boolean, nullable=False, default=False, server_default=false()),
+                                    active_history=True)
     pinned = db.Column(db.Boolean, default=False)
     view_count = db.Column(db.Integer, default=0)
 
-    tags = db.relationship("Tag", secondary=post_tags, back_populates="posts", lazy="subquery")
+    # denormalised for feed ranking, maintained by backend.ranking
+    upvote_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    hot_score = db.Column(db.Float, nullable=False, default=0, server_default="0")
+
+    # lazy by default: views pick eager loading through backend.loader_profiles
+    tags = db.relationship("Tag", secondary=post_tags, back_populates="posts", lazy="select")
 
     comments = db.relationship("Comment", back_populates="post",lazy='dynamic', cascade="all, delete-orphan")
     upvotes = db.relationship("PostUpvote", back_populates="post",lazy='dynamic', cascade="all, delete-orphan")
@@ -288,7 +429,12 @@ class Post(db.Model):
         return f"<Post {self.title} by {author_name}>"
 
 
-Index("ix_posts_pinned_deleted", Post.pinned, Post.is_deleted)
+# live posts only (the feeds, a user's posts); deleted ones never reach these indexes.
+# No query reads deleted posts by author or date, so user_id and created_at have no full index.
+Index("ix_posts_live_hot", Post.hot_score, **partial(Post.is_deleted == false()))
+Index("ix_posts_live_upvotes", Post.upvote_count, **partial(Post.is_deleted == false()))
+Index("ix_posts_live_created", Post.created_at, **partial(Post.is_deleted == false()))
+Index("ix_posts_live_user", Post.user_id, Post.created_at, **partial(Post.is_deleted == false()))
 
 
 class Tag(db.Model):
@@ -297,8 +443,10 @@ class Tag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False, unique=True, index=True)
     slug = db.Column(db.String(120), nullable=False, unique=True, index=True)
+    # live posts with this tag, maintained on flush by backend.tags
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default="0", index=True)
 
-    posts = db.relationship("Post", secondary=post_tags, back_populates="tags", lazy="subquery")
+    posts = db.relationship("Post", secondary=post_tags, back_populates="tags", lazy="select")
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -312,7 +460,7 @@ class Tag(db.Model):
 # ----------------------------
 # Comments
 # ----------------------------
-class Comment(db.Model):
+class Comment(db.Model, SoftDeleteMixin):
     __tablename__ = "comments"
 
     id = db.Column(db.Integer, primary_key=True)
@@ -323,7 +471,6 @@ class Comment(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    is_deleted = db.Column(db.Boolean, default=False, index=True)
 
     post = db.relationship("Post", back_populates="comments")
     author = db.relationship("User", back_populates="comments", lazy=True, foreign_keys=[user_id])
@@ -340,6 +487,11 @@ class Comment(db.Model):
         return f"<Comment by {author_name} on Post {self.post_id}>"
 
 
+# a post's live comments in thread order, and the live replies to a comment
+Index("ix_comments_live_post", Comment.post_id, Comment.created_at, **partial(Comment.is_deleted == false()))
+Index("ix_comments_live_parent", Comment.parent_id, **partial(Comment.is_deleted == false()))
+
+
 # ----------------------------
 # PostUpvote
 # ----------------------------
@@ -381,6 +533,79 @@ class ListingImage(db.Model):
         return f"<ListingImage {self.image_url} for Listing {self.listing_id}>"
 
 
+# ----------------------------
+# Listing archive (see backend/lifecycle.py)
+# ----------------------------
+class ListingArchive(db.Model):
+    """A listing moved out of ``listings``; same columns, ids and slugs, plus ``archived_at``."""
+
+    __tablename__ = "listings_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(255), nullable=False)
+    slug = db.Column(db.String(300), nullable=False, unique=True, index=True)
+    description = db.Column(db.Text, nullable=True)
+    listing_type = db.Column(db.Enum(ListingTypeEnum), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id", ondelete="SET NULL"), nullable=True)
+    quantity = db.Column(db.Float)
+    unit = db.Column(db.String(20))
+    price = db.Column(db.Float, nullable=True)
+    currency = db.Column(db.String(10))
+    location = db.Column(db.String(200), nullable=True)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geo_cell = db.Column(db.Integer, nullable=True)
+    region = db.Column(db.String(120), nullable=True)
+    is_active = db.Column(db.Boolean)
+    owner_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    views = db.Column(db.Integer)
+    contact_count = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    category = db.relationship("Category", lazy=True)
+    images = db.relationship("ListingImageArchive", lazy=True, order_by="ListingImageArchive.position")
+
+    def __repr__(self):
+        return f"<ListingArchive {self.title}>"
+
+
+class ListingImageArchive(db.Model):
+    __tablename__ = "listing_images_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    listing_id = db.Column(db.Integer, db.ForeignKey("listings_archive.id", ondelete="CASCADE"), nullable=False, index=True)
+    image_url = db.Column(db.String(512), nullable=False)
+    alt_text = db.Column(db.String(255), nullable=True)
+    position = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime)
+
+
+# ----------------------------
+# Impact rollups (see backend/impact.py)
+# ----------------------------
+class ImpactRollup(db.Model):
+    """Listings and kilograms per month, listing type, category and region; maintained on flush."""
+    __tablename__ = "impact_rollups"
+
+    period = db.Column(db.Date, primary_key=True)  # first day of the month the listing was created
+    listing_type = db.Column(db.Enum(ListingTypeEnum), primary_key=True)
+    # 0 / "": no category / region (primary key columns cannot be NULL)
+    category_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    region = db.Column(db.String(120), primary_key=True)
+
+    # every listing created, archived ones included; "active" counts only those still on offer
+    listings = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    quantity_kg = db.Column(db.Float, nullable=False, default=0, server_default="0")
+    active_listings = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    active_kg = db.Column(db.Float, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return f"<ImpactRollup {self.period:%Y-%m} {self.listing_type} {self.category_id}/{self.region or '-'}>"
+
+
 # ----------------------------
 # Conversations / Messages
 # ----------------------------
@@ -388,7 +613,12 @@ conversation_participants = db.Table(
     "conversation_participants",
     db.Column("conversation_id", db.Integer, db.ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True),
     db.Column("user_id", db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    # read cursor: this participant has read every message up to this id (backend/read_state.py)
+    db.Column("last_read_message_id", db.Integer, nullable=True),
+    db.Column("last_read_at", db.DateTime, nullable=True),
 )
+# a user's conversations (inbox, message search); the primary key leads with conversation_id
+Index("ix_conversation_participants_user", conversation_participants.c.user_id, conversation_participants.c.conversation_id)
 
 
 class Conversation(db.Model):
@@ -403,7 +633,7 @@ class Conversation(db.Model):
         "User",
         secondary=conversation_participants,
         back_populates="conversations",
-        lazy="subquery"
+        lazy="select"
     )
 
     messages = db.relationship("Message", back_populates="conversation", cascade="all, delete-orphan", lazy=True)
@@ -416,10 +646,11 @@ class Message(db.Model):
     __tablename__ = "messages"
 
     id = db.Column(db.Integer, primary_key=True)
-    conversation_id = db.Column(db.Integer, db.ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False, index=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
     sender_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # superseded by the participants' read cursors; no longer read or updated
     is_read = db.Column(db.Boolean, default=False)
 
     conversation = db.relationship("Conversation", back_populates="messages")
@@ -429,6 +660,10 @@ class Message(db.Model):
         return f"<Message {self.id} from {self.sender_id}>"
 
 
+# unread counts: a range over (conversation_id, id > cursor), sender checked in the index
+Index("ix_messages_conversation_id_sender", Message.conversation_id, Message.id, Message.sender_id)
+
+
 # ----------------------------
 # Notifications
 # ----------------------------
@@ -464,22 +699,45 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     # Relationship with User (back_populates from User.notifications)
-    user = db.relationship("User", back_populates="notifications", lazy="joined")
+    user = db.relationship("User", back_populates="notifications", lazy="select")
 
     # String representation for debugging/logging
     def __repr__(self):
         return f"<Notification {self.id} ({self.type}) for User {self.user_id}>"
+
+
 # ----------------------------
+# Background jobs (see backend/jobs.py)
+# ----------------------------
+class JobStatusEnum(str, enum.Enum):
+    queued = "queued"    # waiting for run_at (new, or retrying after a failure)
+    running = "running"
+    done = "done"
+    dead = "dead"        # out of attempts; kept until retried (`flask jobs retry`)
 
 
+class Job(db.Model):
+    __tablename__ = "jobs"
 
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.Enum(JobStatusEnum), nullable=False, default=JobStatusEnum.queued)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # periodic jobs: "<name>:<slot>", so several workers schedule each run once
+    unique_key = db.Column(db.String(200), nullable=True, unique=True)
+    locked_by = db.Column(db.String(200), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
 
-# Wishlist association table
-# ----------------------------
-wishlist = db.Table(
-    "wishlist",
-    db.Column("user_id", db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
-    db.Column("listing_id", db.Integer, db.ForeignKey("listings.id", ondelete="CASCADE"), primary_key=True),
-    db.Column("created_at", db.DateTime, default=datetime.utcnow),
-    extend_existing= True
-)
+    def __repr__(self):
+        return f"<Job {self.id} {self.name} ({self.status})>"
+
+
+# the worker's claim query: ready jobs in run_at order
+Index("ix_jobs_status_run_at", Job.status, Job.run_at)
+Index("ix_jobs_name_status", Job.name, Job.status)
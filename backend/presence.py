@@ -0,0 +1,300 @@
+# presence.py
+"""Who is online, without a write per page view.
+
+Every request from a logged-in user (the id comes from the session cookie,
+no user lookup) and every connected Socket.IO client *touches* the user:
+
+* the touch goes to a presence store, at most once per
+  ``PRESENCE_TOUCH_INTERVAL`` seconds per user and worker. ``shared``
+  (default) is a fixed table of (user id, last active) slots in an
+  ``mmap``-ed file under ``/dev/shm`` that every gunicorn worker on the
+  host reads and writes. ``memory`` is a per-process dict (tests,
+  single-process dev server);
+* the user id is queued for the database. A background thread writes
+  ``users.last_seen`` every ``PRESENCE_FLUSH_INTERVAL`` seconds as one
+  batched ``UPDATE`` (never moving it backwards, never touching
+  ``updated_at``), and again at interpreter exit.
+
+:meth:`Presence.online`, :meth:`Presence.active_since`,
+:meth:`Presence.is_online` and :meth:`Presence.last_seen` read only the
+store. ``users.last_seen`` is for users the store has forgotten (restart,
+evicted slot, another host).
+"""
+from datetime import datetime, timedelta
+import atexit
+import fcntl
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+from flask import session as cookie_session
+from sqlalchemy import bindparam, or_, update
+
+
+log = logging.getLogger(__name__)
+
+
+class MemoryStore:
+    def __init__(self, app=None):
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def touch(self, user_id, now):
+        with self._lock:
+            self._seen[user_id] = max(now, self._seen.get(user_id, 0.0))
+
+    def get(self, user_id):
+        return self._seen.get(user_id)
+
+    def since(self, cutoff):
+        with self._lock:
+            return {user_id: seen for user_id, seen in self._seen.items() if seen >= cutoff}
+
+
+class SharedStore:
+    """(user id, last active) slots in an ``mmap``-ed file shared by the workers on the host.
+
+    A user lives in one of ``PROBE`` slots after ``user_id % slots``; when
+    all of them are taken the least recently active one is reused, so the
+    file never grows and an evicted user only falls back to
+    ``users.last_seen``. Reads scan the whole table with NumPy.
+    """
+
+    PROBE = 8
+
+    def __init__(self, app=None, path=None, slots=None):
+        config = app.config if app is not None else {}
+        self.path = path or config.get("PRESENCE_SHARED_PATH") or self._default_path()
+        self.slots = slots or config.get("PRESENCE_SHARED_SLOTS", 65536)
+        self._pid = None
+        self._lock = threading.Lock()  # threads in one worker share the fd
+
+    @staticmethod
+    def _default_path():
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        return os.path.join(directory, f"w2v-presence-{os.getuid()}")
+
+    def _open(self):
+        import numpy as np
+
+        # each forked worker maps the file itself
+        if self._pid == os.getpid():
+            return
+        size = self.slots * 16
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size != size:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size != size:
+                    os.ftruncate(fd, size)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._table = np.frombuffer(self._map, dtype=[("user_id", "<i8"), ("seen", "<f8")])
+        self._pid = os.getpid()
+
+    def _probe(self, user_id):
+        start = user_id % self.slots
+        return [(start + probe) % self.slots for probe in range(self.PROBE)]
+
+    def touch(self, user_id, now):
+        with self._lock:
+            self._open()
+            table = self._table
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                victim = None
+                for slot in self._probe(user_id):
+                    stored = table["user_id"][slot]
+                    if stored == user_id or stored == 0:
+                        victim = slot
+                        break
+                    if victim is None or table["seen"][slot] < table["seen"][victim]:
+                        victim = slot
+                if table["user_id"][victim] != user_id or table["seen"][victim] < now:
+                    table[victim] = (user_id, now)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def get(self, user_id):
+        with self._lock:
+            self._open()
+            for slot in self._probe(user_id):
+                stored = self._table[slot]
+                if stored["user_id"] == user_id:
+                    return float(stored["seen"])
+                if stored["user_id"] == 0:
+                    return None
+            return None
+
+    def since(self, cutoff):
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+            try:
+                rows = self._table[(self._table["seen"] >= cutoff) & (self._table["user_id"] != 0)].copy()
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return dict(zip(rows["user_id"].tolist(), rows["seen"].tolist()))
+
+
+STORES = {"memory": MemoryStore, "shared": SharedStore}
+
+
+class Presence:
+    """Flask extension tracking user activity in a presence store and batching ``last_seen`` writes."""
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.db = db
+        self.store = None
+        self.flush_interval = 60
+        self.touch_interval = 30
+        self.online_seconds = 300
+        self._touched = {}  # user id -> when this worker last wrote it to the store
+        self._pending = {}  # user id -> last activity not yet written to users.last_seen
+        self._sockets = {}  # user id -> open Socket.IO connections in this worker
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread_pid = None
+        self._atexit = False
+        self.flushes = 0
+        self.flushed_rows = 0
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        from backend.models import User
+
+        self.app = app
+        self.db = db
+        app.config.setdefault("PRESENCE_ENABLED", True)
+        self.flush_interval = app.config.setdefault("PRESENCE_FLUSH_INTERVAL", 60)
+        self.touch_interval = app.config.setdefault("PRESENCE_TOUCH_INTERVAL", 30)
+        self.online_seconds = app.config.setdefault("PRESENCE_ONLINE_SECONDS", 300)
+        self.store = STORES[app.config.setdefault("PRESENCE_BACKEND", "shared")](app)
+        self._users = User.__table__
+        app.before_request(self._touch_request)
+        app.extensions["presence"] = self
+        if not self._atexit:
+            atexit.register(self.flush)
+            self._atexit = True
+
+    # ----------------------------
+    # Recording
+    # ----------------------------
+    def _touch_request(self):
+        user_id = cookie_session.get("_user_id")  # Flask-Login's key; no user load
+        if user_id is not None and self.app.config["PRESENCE_ENABLED"]:
+            self.touch(int(user_id))
+
+    def touch(self, user_id, now=None):
+        """Record activity of ``user_id``; cheap enough for every request."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if now - self._touched.get(user_id, 0.0) < self.touch_interval:
+                return
+            self._touched[user_id] = now
+            self._pending[user_id] = now
+        self.store.touch(user_id, now)
+        self._ensure_flusher()
+
+    def connected(self, user_id):
+        """A Socket.IO client of ``user_id`` connected to this worker; it counts as activity until it leaves."""
+        with self._lock:
+            self._sockets[user_id] = self._sockets.get(user_id, 0) + 1
+            self._touched.pop(user_id, None)
+        self.touch(user_id)
+
+    def disconnected(self, user_id):
+        with self._lock:
+            left = self._sockets.get(user_id, 0) - 1
+            if left > 0:
+                self._sockets[user_id] = left
+            else:
+                self._sockets.pop(user_id, None)
+            self._touched.pop(user_id, None)
+        self.touch(user_id)
+
+    # ----------------------------
+    # Queries (store only)
+    # ----------------------------
+    def active_since(self, seconds, now=None):
+        """{user_id: last active datetime (UTC)} for users active in the last ``seconds``."""
+        now = time.time() if now is None else now
+        return {user_id: datetime.utcfromtimestamp(seen) for user_id, seen in self.store.since(now - seconds).items()}
+
+    def online(self, now=None):
+        """Ids of the users active within PRESENCE_ONLINE_SECONDS."""
+        return set(self.active_since(self.online_seconds, now))
+
+    def last_seen(self, user_id):
+        """Last activity known to the store as a UTC datetime, or None (fall back to ``users.last_seen``)."""
+        seen = self.store.get(user_id)
+        return datetime.utcfromtimestamp(seen) if seen else None
+
+    def is_online(self, user_id, now=None):
+        seen = self.store.get(user_id)
+        return bool(seen) and (time.time() if now is None else now) - seen < self.online_seconds
+
+    # ----------------------------
+    # Flushing
+    # ----------------------------
+    def _ensure_flusher(self):
+        # one thread per worker process; a forked worker starts its own
+        if self._thread_pid == os.getpid() or not self.flush_interval:
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._run, name="presence-flush", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                with self._lock:
+                    sockets = list(self._sockets)
+                for user_id in sockets:  # a connected socket keeps its user online
+                    self.touch(user_id)
+                self.flush()
+            except Exception:
+                log.exception("presence flush failed")
+
+    def flush(self):
+        """Write pending ``last_seen`` values now in one batched UPDATE; returns the number of users."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            users = self._users
+            statement = (
+                update(users)
+                .where(users.c.id == bindparam("user_id"),
+                       or_(users.c.last_seen.is_(None), users.c.last_seen < bindparam("seen")))
+                .values(last_seen=bindparam("seen"), updated_at=users.c.updated_at)
+            )
+            rows = [{"user_id": user_id, "seen": datetime.utcfromtimestamp(seen)}
+                    for user_id, seen in sorted(pending.items())]  # id order: no deadlocks between workers
+            try:
+                with self.app.app_context(), self.db.engine.begin() as connection:
+                    connection.execute(statement, rows)
+            except Exception:
+                with self._lock:
+                    for user_id, seen in pending.items():  # retried on the next flush
+                        self._pending[user_id] = max(seen, self._pending.get(user_id, 0.0))
+                raise
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+            return len(rows)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), "sockets": sum(self._sockets.values()),
+                    "flushes": self.flushes, "flushed_rows": self.flushed_rows}
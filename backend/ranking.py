@@ -0,0 +1,165 @@
+# ranking.py
+"""Materialised "hot" ranking for the community feed.
+
+Every post stores ``upvote_count``, ``comment_count`` and ``hot_score``:
+
+    hot_score = (1 + upvotes + COMMENT_WEIGHT * comments) / (age_hours + 2) ** GRAVITY
+
+(the 1 is the author's own point, so new posts surface before their first
+vote)
+
+* upvotes and comments update the counters with an atomic
+  ``count = count + delta`` and recompute the post's score in the same
+  UPDATE (:func:`bump`),
+* scores fall as posts age, so ``flask rank-decay`` recomputes them in
+  batches for posts younger than ``HOT_MAX_AGE_DAYS``; older posts are set
+  to 0 once and then skipped (schedule it every few minutes),
+* ``flask rank-decay --recount`` also rebuilds the counters from
+  ``post_upvotes``/``comments`` (after bulk imports or manual fixes).
+
+The feed then reads the top N straight off ``ix_posts_live_hot``.
+"""
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, func, or_, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from backend.extensions import db, job_queue
+from backend.models import Comment, Post, PostUpvote
+
+
+GRAVITY = 1.8
+COMMENT_WEIGHT = 2
+HOT_MAX_AGE_DAYS = 30
+
+# ?window= values for the "top" feed
+WINDOWS = {"day": timedelta(days=1), "week": timedelta(weeks=1), "month": timedelta(days=30),
+           "year": timedelta(days=365), "all": None}
+
+_posts = Post.__table__
+
+
+def _age_factor(created_at, now=None):
+    """``(age_hours + 2) ** GRAVITY``, or None once the post is past ``HOT_MAX_AGE_DAYS`` (score 0)."""
+    age_hours = max(((now or datetime.utcnow()) - created_at).total_seconds() / 3600, 0)
+    if age_hours > HOT_MAX_AGE_DAYS * 24:
+        return None
+    return (age_hours + 2) ** GRAVITY
+
+
+def hot_score(upvotes, comments, created_at, now=None):
+    factor = _age_factor(created_at, now) if created_at is not None else None
+    if factor is None:
+        return 0.0
+    points = 1 + (upvotes or 0) + COMMENT_WEIGHT * (comments or 0)
+    return points / factor
+
+
+def bump(post, upvotes=0, comments=0, now=None):
+    """Add to ``post``'s counters and rescore it; returns the new (upvote_count, comment_count).
+
+    One UPDATE: the score's points come from the row's counters in SQL, its
+    age factor from ``post.created_at``, which never changes.
+    """
+    upvote_count = func.coalesce(_posts.c.upvote_count, 0) + upvotes
+    comment_count = func.coalesce(_posts.c.comment_count, 0) + comments
+    factor = _age_factor(post.created_at, now) if post.created_at is not None else None
+    score = (1 + upvote_count + COMMENT_WEIGHT * comment_count) / float(factor) if factor else 0.0
+    upvote_count, comment_count, score = db.session.execute(
+        update(_posts)
+        .where(_posts.c.id == post.id)
+        .values(
+            upvote_count=upvote_count,
+            comment_count=comment_count,
+            hot_score=score,
+            updated_at=_posts.c.updated_at,  # not a content edit: skip the onupdate timestamp
+        )
+        .returning(_posts.c.upvote_count, _posts.c.comment_count, _posts.c.hot_score)
+    ).one()
+    for key, value in (("upvote_count", upvote_count), ("comment_count", comment_count), ("hot_score", score)):
+        set_committed_value(post, key, value)
+    return upvote_count, comment_count
+
+
+def _batches(statement, batch_size):
+    """Yield lists of rows of ``statement`` (which must select posts.id first), keyset-paginated by id."""
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            statement.where(_posts.c.id > last_id).order_by(_posts.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def recount(batch_size=1000):
+    """Rebuild ``upvote_count``/``comment_count`` from the source tables; return posts updated."""
+    upvotes = (
+        select(func.count()).where(PostUpvote.post_id == _posts.c.id).correlate(_posts).scalar_subquery()
+    )
+    comments = (
+        select(func.count())
+        .where(Comment.post_id == _posts.c.id, Comment.is_deleted.isnot(True))
+        .correlate(_posts)
+        .scalar_subquery()
+    )
+    statement = select(_posts.c.id, upvotes, comments, _posts.c.upvote_count, _posts.c.comment_count)
+    fixed = 0
+    for rows in _batches(statement, batch_size):
+        changed = [
+            {"post_id": post_id, "ups": ups, "comments": n}
+            for post_id, ups, n, stored_ups, stored_n in rows
+            if (ups, n) != (stored_ups, stored_n)
+        ]
+        if changed:
+            db.session.execute(
+                update(_posts)
+                .where(_posts.c.id == bindparam("post_id"))
+                .values(upvote_count=bindparam("ups"), comment_count=bindparam("comments"),
+                        updated_at=_posts.c.updated_at),
+                changed,
+            )
+        db.session.commit()
+        fixed += len(changed)
+    return fixed
+
+
+def redecay(batch_size=1000, now=None):
+    """Recompute ``hot_score`` of recent (or still non-zero) posts in batches; return posts rescored."""
+    now = now or datetime.utcnow()
+    horizon = now - timedelta(days=HOT_MAX_AGE_DAYS)
+    statement = (
+        select(_posts.c.id, _posts.c.upvote_count, _posts.c.comment_count, _posts.c.created_at)
+        .where(or_(_posts.c.created_at >= horizon, _posts.c.hot_score > 0))
+    )
+    rescored = 0
+    for rows in _batches(statement, batch_size):
+        db.session.execute(
+            update(_posts)
+            .where(_posts.c.id == bindparam("post_id"))
+            .values(hot_score=bindparam("score"), updated_at=_posts.c.updated_at),
+            [{"post_id": post_id, "score": hot_score(ups, n, created_at, now)}
+             for post_id, ups, n, created_at in rows],
+        )
+        db.session.commit()
+        rescored += len(rows)
+    return rescored
+
+
+# scheduled every 5 minutes by `flask worker` (backend.jobs)
+job_queue.task("rank-decay", every=300)(redecay)
+
+
+@click.command("rank-decay")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--recount", "do_recount", is_flag=True, help="Rebuild upvote/comment counters first.")
+@with_appcontext
+def rank_decay_command(batch_size, do_recount):
+    """Re-decay community hot scores (run periodically, e.g. every 5 minutes)."""
+    if do_recount:
+        click.echo(f"{recount(batch_size)} post counter(s) corrected")
+    click.echo(f"{redecay(batch_size)} post(s) rescored")
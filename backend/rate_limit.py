@@ -0,0 +1,234 @@
+# rate_limit.py
+"""Token-bucket rate limiting for hot write and CPU-heavy endpoints.
+
+Views opt in with a named limit from ``RATELIMITS``::
+
+    @rate_limiter.limit("login", per="ip", methods=["POST"])
+
+A limit like ``"10/minute"`` is a bucket of 10 tokens refilled at 10 per
+minute; ``"10/minute;burst=20"`` allows a larger burst. Buckets are keyed by
+limit name, endpoint and the ``per`` subject (``user``, ``ip`` or
+``user+ip``). A rejected request gets ``429`` with ``Retry-After``. The IP
+is ``request.remote_addr``: behind a reverse proxy, set
+``TRUSTED_PROXY_HOPS`` so it is the client's, or every client shares the
+proxy's buckets.
+
+Bucket state lives in a pluggable backend (``RATELIMIT_BACKEND``):
+
+* ``shared`` (default): a fixed-size table in a memory-mapped file under
+  ``/dev/shm`` guarded by ``flock``, shared by every gunicorn worker on the
+  host,
+* ``memory``: per-process dict (tests, single-process dev server),
+* ``"package.module:Class"``: any class with ``hit(key, rate, capacity, now)``.
+"""
+import fcntl
+import hashlib
+import importlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_login import current_user
+
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_limit(spec):
+    """``"10/minute;burst=20"`` -> (refill rate per second, bucket capacity)."""
+    spec, _, options = spec.partition(";")
+    count, _, period = spec.strip().partition("/")
+    count = float(count)
+    rate = count / _PERIODS[period.strip().rstrip("s") or "second"]
+    capacity = count
+    for option in filter(None, (o.strip() for o in options.split(","))):
+        name, _, value = option.partition("=")
+        if name.strip() == "burst":
+            capacity = float(value)
+    return rate, capacity
+
+
+def _refill(tokens, last, rate, capacity, now):
+    return min(capacity, tokens + (now - last) * rate)
+
+
+class MemoryBackend:
+    """Buckets in a per-process dict."""
+
+    def __init__(self, app=None):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, rate, capacity, now):
+        """Take one token; return (allowed, seconds until a token is available)."""
+        with self._lock:
+            tokens, last = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, last, rate, capacity, now)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            return False, (1 - tokens) / rate
+
+
+class SharedMemoryBackend:
+    """Buckets in an ``mmap``-ed file shared by all worker processes on the host.
+
+    The file is a fixed array of ``RATELIMIT_SHARED_SLOTS`` slots of
+    (key hash, tokens, last refill). Keys are placed by hash with a short
+    linear probe; when every probed slot is taken, the least recently
+    touched one is reused, so the table never grows and a flood of distinct
+    keys can only ever reset someone's bucket to full.
+    """
+
+    SLOT = struct.Struct("<Qdd")
+    PROBE = 8
+
+    def __init__(self, app=None, path=None, slots=None):
+        config = app.config if app is not None else {}
+        self.path = path or config.get("RATELIMIT_SHARED_PATH") or self._default_path()
+        self.slots = slots or config.get("RATELIMIT_SHARED_SLOTS", 65536)
+        self._pid = None
+        self._lock = threading.Lock()  # threads in one worker share the fd
+
+    @staticmethod
+    def _default_path():
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        return os.path.join(directory, f"w2v-ratelimit-{os.getuid()}")
+
+    def _open(self):
+        # each forked worker maps the file itself
+        if self._pid == os.getpid():
+            return
+        size = self.slots * self.SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size != size:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size != size:
+                    os.ftruncate(fd, size)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def _hash(self, key):
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def hit(self, key, rate, capacity, now):
+        """Take one token; return (allowed, seconds until a token is available)."""
+        with self._lock:
+            self._open()
+            key_hash = self._hash(key)
+            start = key_hash % self.slots
+            slot_size, unpack, pack = self.SLOT.size, self.SLOT.unpack_from, self.SLOT.pack_into
+            buf = self._map
+
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                found, victim, victim_last = None, None, None
+                for probe in range(self.PROBE):
+                    offset = ((start + probe) % self.slots) * slot_size
+                    stored, tokens, last = unpack(buf, offset)
+                    if stored == key_hash:
+                        found = offset
+                        break
+                    if stored == 0:  # free slot: the key is not stored further along
+                        victim = offset
+                        break
+                    if victim_last is None or last < victim_last:
+                        victim, victim_last = offset, last
+                if found is None:
+                    offset, tokens, last = victim, capacity, now
+
+                tokens = _refill(tokens, last, rate, capacity, now)
+                if tokens >= 1:
+                    pack(buf, offset, key_hash, tokens - 1, now)
+                    return True, 0.0
+                pack(buf, offset, key_hash, tokens, now)
+                return False, (1 - tokens) / rate
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+BACKENDS = {"memory": MemoryBackend, "shared": SharedMemoryBackend}
+
+
+def _load_backend(name, app):
+    if name in BACKENDS:
+        return BACKENDS[name](app)
+    module, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module), attr)(app)
+
+
+def _subject(per):
+    ip = request.remote_addr or "-"
+    if per == "ip":
+        return f"ip:{ip}"  # no current_user lookup: per-IP limits run before the user is loaded
+    user = current_user.get_id() if current_user.is_authenticated else None
+    if per == "user":
+        return f"u:{user}" if user else f"ip:{ip}"
+    return f"u:{user}|ip:{ip}"
+
+
+class RateLimiter:
+    """Flask extension providing the ``limit`` decorator."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self._parsed = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RATELIMIT_ENABLED", True)
+        app.config.setdefault("RATELIMIT_BACKEND", "shared")
+        limits = {
+            "login": "10/minute;burst=5",
+            "upvote": "60/minute;burst=20",
+            "comment": "10/minute",
+            "message": "30/minute;burst=10",
+            "wishlist": "60/minute;burst=20",
+        }
+        limits.update(app.config.get("RATELIMITS") or {})
+        app.config["RATELIMITS"] = limits
+
+        self.backend = _load_backend(app.config["RATELIMIT_BACKEND"], app)
+        self._parsed = {name: parse_limit(spec) for name, spec in limits.items()}
+        app.extensions["rate_limiter"] = self
+
+    def hit(self, name, subject, now=None):
+        """Charge one request for limit ``name``; return (allowed, retry_after seconds)."""
+        rate, capacity = self._parsed[name]
+        return self.backend.hit(f"{name}:{subject}", rate, capacity, time.time() if now is None else now)
+
+    def limit(self, name, per="user", methods=None, json=False):
+        """Decorate a view with the named limit; ``json`` picks the 429 body format."""
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if (methods is None or request.method in methods) and current_app.config["RATELIMIT_ENABLED"]:
+                    allowed, retry_after = self.hit(name, f"{request.endpoint}:{_subject(per)}")
+                    if not allowed:
+                        return self._too_many(retry_after, json)
+                return view(*args, **kwargs)
+            return wrapped
+        return decorator
+
+    @staticmethod
+    def _too_many(retry_after, json):
+        message = "Too many requests, please slow down."
+        if json:
+            response = jsonify({"status": "error", "message": message})
+        else:
+            response = current_app.response_class(message, mimetype="text/plain")
+        response.status_code = 429
+        response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+        return response
@@ -0,0 +1,69 @@
+# read_state.py
+"""Per-participant read cursors for conversations.
+
+Each ``conversation_participants`` row stores ``last_read_message_id``:
+the participant has read every message of the conversation up to that
+id. It replaces the single ``Message.is_read`` flag, which could not
+describe a group conversation and which took an update per message to
+clear.
+
+* marking read moves one cursor (one row), and never moves it backwards;
+* unread counts are a range count over ``ix_messages_conversation_id_sender``
+  (``conversation_id``, ``id > cursor``), with the participant's own
+  messages left out.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, select, update
+
+from backend.extensions import db
+from backend.models import Message, conversation_participants
+
+
+def latest_message_id(conversation_id):
+    """Id of the newest message in the conversation, or None (one seek on ix_messages_conversation_id_sender)."""
+    return db.session.scalar(select(func.max(Message.id)).where(Message.conversation_id == conversation_id))
+
+
+def mark_read(conversation_id, user_id, up_to, now=None):
+    """Move ``user_id``'s cursor in the conversation to ``up_to``; returns True when it moved.
+
+    The caller commits.
+    """
+    cp = conversation_participants
+    result = db.session.execute(
+        update(cp)
+        .where(cp.c.conversation_id == conversation_id, cp.c.user_id == user_id,
+               or_(cp.c.last_read_message_id.is_(None), cp.c.last_read_message_id < up_to))
+        .values(last_read_message_id=up_to, last_read_at=now or datetime.utcnow())
+    )
+    return result.rowcount > 0
+
+
+def _unread(user_id, *columns):
+    cp = conversation_participants
+    messages = Message.__table__.alias("unread_messages")  # never correlated with an outer query on messages
+    return (
+        select(*columns, func.count(messages.c.id))
+        .select_from(cp.join(messages, and_(
+            messages.c.conversation_id == cp.c.conversation_id,
+            messages.c.id > func.coalesce(cp.c.last_read_message_id, 0),
+        )))
+        .where(cp.c.user_id == user_id, messages.c.sender_id.is_distinct_from(user_id))
+    )
+
+
+def unread_column(user_id, conversation_id):
+    """Unread messages of ``user_id`` in ``conversation_id`` (a column of the outer query), as a labelled column."""
+    cp = conversation_participants
+    return (
+        _unread(user_id)
+        .where(cp.c.conversation_id == conversation_id)
+        .scalar_subquery()
+        .label("unread")
+    )
+
+
+def unread_total(user_id):
+    """Unread messages across all of ``user_id``'s conversations."""
+    return db.session.scalar(_unread(user_id))
@@ -0,0 +1,163 @@
+# realtime.py
+"""Socket.IO events for conversations.
+
+A logged-in browser connects once (the Flask session cookie authenticates
+the socket) and is put in its ``user_<id>`` room, where
+``utils.create_notification`` pushes notifications. While connected, the
+user counts as online (``backend.presence``). Per conversation:
+
+* ``join {conversation_id}``: participants only; the connection joins the
+  ``conversation_<id>`` room. Later events for that conversation skip the
+  participant query.
+* ``send_message {conversation_id, content, client_id}``: the message is
+  stored, broadcast to the room as ``message`` and acknowledged to the
+  sender with its id (``{"ok": true, "id": ...}``), so the sender does not
+  reload the page and the recipients do not have to refresh. It shares the
+  form POST's rate-limit bucket.
+* ``typing {conversation_id, is_typing}``: relayed to the rest of the room.
+* ``read {conversation_id, up_to}``: moves the user's read cursor to
+  ``up_to``, capped at the conversation's newest message
+  (``backend.read_state``), and relays the receipt if the cursor moved.
+
+The form POST in ``view_conversation`` still works without JavaScript and
+broadcasts the same ``message`` event.
+"""
+from flask import current_app, request
+from flask_login import current_user
+from flask_socketio import emit, join_room
+from sqlalchemy import exists, select
+
+from backend import read_state
+from backend.extensions import db, presence, rate_limiter, socketio
+from backend.models import Message, conversation_participants
+
+
+MAX_MESSAGE_LENGTH = 4000
+
+_joined = {}  # socket sid -> ids of the conversations this connection joined
+
+
+def room(conversation_id):
+    return f"conversation_{conversation_id}"
+
+
+def message_payload(message, sender_name, client_id=None):
+    return {
+        "id": message.id,
+        "conversation_id": message.conversation_id,
+        "sender_id": message.sender_id,
+        "sender": sender_name,
+        "content": message.content,
+        "created_at": message.created_at.strftime("%Y-%m-%d %H:%M"),
+        "client_id": client_id,
+    }
+
+
+def broadcast_message(payload):
+    socketio.emit("message", payload, to=room(payload["conversation_id"]))
+
+
+def is_participant(conversation_id, user_id):
+    cp = conversation_participants
+    return db.session.scalar(select(exists().where(cp.c.conversation_id == conversation_id, cp.c.user_id == user_id)))
+
+
+def _conversation_id(data):
+    try:
+        return int(data["conversation_id"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _joined_conversation(data):
+    conversation_id = _conversation_id(data)
+    return conversation_id if conversation_id in _joined.get(request.sid, ()) else None
+
+
+# ----------------------------
+# Connection
+# ----------------------------
+@socketio.on("connect")
+def on_connect(auth=None):
+    if not current_user.is_authenticated:
+        return False  # refuse the connection
+    join_room(f"user_{current_user.id}")
+    presence.connected(current_user.id)
+
+
+@socketio.on("disconnect")
+def on_disconnect(*args):
+    _joined.pop(request.sid, None)
+    if current_user.is_authenticated:
+        presence.disconnected(current_user.id)
+
+
+@socketio.on("join")
+def on_join(data):
+    conversation_id = _conversation_id(data)
+    if conversation_id is None or not is_participant(conversation_id, current_user.id):
+        return {"ok": False, "error": "not a participant"}
+    join_room(room(conversation_id))
+    _joined.setdefault(request.sid, set()).add(conversation_id)
+    return {"ok": True}
+
+
+# ----------------------------
+# Messages
+# ----------------------------
+@socketio.on("send_message")
+def on_send_message(data):
+    conversation_id = _joined_conversation(data)
+    client_id = data.get("client_id") if isinstance(data, dict) else None
+    content = (data.get("content") or "").strip() if isinstance(data, dict) else ""
+    if conversation_id is None:
+        return {"ok": False, "error": "join the conversation first", "client_id": client_id}
+    if not content or len(content) > MAX_MESSAGE_LENGTH:
+        return {"ok": False, "error": "empty or too long", "client_id": client_id}
+    if current_app.config["RATELIMIT_ENABLED"]:
+        # same bucket as the form POST (rate_limiter.limit on view_conversation)
+        allowed, retry_after = rate_limiter.hit("message", f"messaging.view_conversation:u:{current_user.id}")
+        if not allowed:
+            return {"ok": False, "error": "rate limited", "retry_after": retry_after, "client_id": client_id}
+
+    sender_id, sender_name = current_user.id, current_user.username
+    message = Message(conversation_id=conversation_id, sender_id=sender_id, content=content)
+    db.session.add(message)
+    db.session.flush()
+    payload = message_payload(message, sender_name, client_id)  # before the commit expires it
+    db.session.commit()
+    broadcast_message(payload)
+    return {"ok": True, "id": payload["id"], "client_id": client_id}
+
+
+@socketio.on("typing")
+def on_typing(data):
+    conversation_id = _joined_conversation(data)
+    if conversation_id is None:
+        return
+    emit("typing", {
+        "conversation_id": conversation_id,
+        "user_id": current_user.id,
+        "username": current_user.username,
+        "is_typing": bool(data.get("is_typing")),
+    }, to=room(conversation_id), include_self=False)
+
+
+@socketio.on("read")
+def on_read(data):
+    conversation_id = _joined_conversation(data)
+    try:
+        up_to = int(data["up_to"])
+    except (KeyError, TypeError, ValueError):
+        return {"ok": False, "error": "up_to required"}
+    if conversation_id is None:
+        return {"ok": False, "error": "join the conversation first"}
+    # the client's id is only a claim: never past the newest message, or later ones would arrive read
+    up_to = min(up_to, read_state.latest_message_id(conversation_id) or 0)
+    user_id = current_user.id
+    moved = up_to > 0 and read_state.mark_read(conversation_id, user_id, up_to)
+    db.session.commit()
+    if moved:  # receipts only for cursors that actually moved
+        emit("read", {"conversation_id": conversation_id, "user_id": user_id, "up_to": up_to},
+             to=room(conversation_id), include_self=False)
+    return {"ok": True, "up_to": up_to}
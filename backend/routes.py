@@ -1,10 +1,12 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
 from sqlalchemy import desc
 
 from backend.extensions import db
+from backend import impact, read_state  # impact: maintains the rollups on flush
 from backend.models import (
     Listing,
+    ListingTypeEnum,
     Post,
     Message,
     Conversation,
@@ -24,7 +26,7 @@ def dashboard():
 
     # Counts
     listings_count = Listing.query.filter_by(owner_id=user_id, is_active=True).count()
-    posts_count = Post.query.filter_by(user_id=user_id, is_deleted=False).count()
+    posts_count = Post.query.filter_by(user_id=user_id).count()
 
     # Upvotes on user's posts:
     # join PostUpvote -> Post and count where Post.user_id == user_id
@@ -35,15 +37,8 @@ def dashboard():
         .count()
     )
 
-    # Unread messages for user:
-    # Messages belonging to conversations the user participates in and is_read==False
-    unread_messages_count = (
-        db.session.query(Message)
-        .join(Conversation, Message.conversation_id == Conversation.id)
-        .join(conversation_participants, conversation_participants.c.conversation_id == Conversation.id)
-        .filter(conversation_participants.c.user_id == user_id, Message.is_read == False)
-        .count()
-    )
+    # Unread messages for user: past the user's read cursor in each conversation
+    unread_messages_count = read_state.unread_total(user_id)
 
     # Recent items (show latest 3)
     recent_listings = (
@@ -54,7 +49,7 @@ def dashboard():
     )
 
     recent_posts = (
-        Post.query.filter_by(user_id=user_id, is_deleted=False)
+        Post.query.filter_by(user_id=user_id)
         .order_by(desc(Post.created_at))
         .limit(3)
         .all()
@@ -82,4 +77,22 @@ def dashboard():
         recent_listings=recent_listings,
         recent_posts=recent_posts,
         recent_messages=recent_messages,
-    )
\ No newline at end of file
+    )
+
+
+# Headline impact, read from the rollups only: ?type=waste|recycled&months=12 (0: all time)
+def _impact_args():
+    listing_type = request.args.get("type")
+    listing_type = ListingTypeEnum(listing_type) if listing_type in ListingTypeEnum.__members__ else None
+    months = min(max(request.args.get("months", impact.DEFAULT_MONTHS, type=int), 0), 120)
+    return listing_type, months
+
+
+@dashboard_bp.route('/impact')
+def impact_page():
+    return render_template("impact.html", impact=impact.summary(*_impact_args()))
+
+
+@dashboard_bp.route('/impact.json')
+def impact_json():
+    return jsonify({"status": "success", **impact.summary(*_impact_args())})
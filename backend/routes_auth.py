@@ -3,7 +3,7 @@ from flask_login import login_user, logout_user, login_required
 
 from backend.forms import RegistrationForm, LoginForm
 from backend.models import User
-from backend.extensions import db, login_manager
+from backend.extensions import db, login_manager, rate_limiter, user_cache
 
 
 auth_bp = Blueprint('auth', __name__, template_folder='../templates')
@@ -11,7 +11,8 @@ auth_bp = Blueprint('auth', __name__, template_folder='../templates')
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # cached column snapshot, no query on a hit; relationships load only if a view uses them
+    return user_cache.load(int(user_id))
 
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
@@ -38,6 +39,7 @@ def register():
 
 
 @auth_bp.route("/login", methods=['GET', 'POST'])
+@rate_limiter.limit("login", per="ip", methods=["POST"])  # check_password_hash is deliberately slow
 def login():
 
     form = LoginForm()
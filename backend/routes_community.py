@@ -1,9 +1,18 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, request, current_app
 from flask_login import login_required, current_user
 
+import math
+
+from sqlalchemy import and_, exists, or_, select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
 from backend.forms import PostForm
-from backend.models import Post, PostUpvote, Notification, NotificationTypeEnum, Comment
-from backend.extensions import db
+from backend.models import Post, PostUpvote, Notification, NotificationTypeEnum, Comment, Tag, User, post_tags
+from backend.extensions import db, job_queue, rate_limiter, view_counter
+from backend.loader_profiles import BatchLoader, loader_options
+from backend.tags import parse_tags, tags_for
+from backend import ranking
 
 from datetime import datetime
 import secrets
@@ -14,12 +23,97 @@ from werkzeug.utils import secure_filename
 
 community_bp = Blueprint("community", __name__, template_folder="../templates")
 
+TAG_PAGE_SIZE = 20
+TAG_CLOUD_SIZE = 100
+FEED_SORTS = ("hot", "new", "top")
+FEED_TOP_N = 50
+
+
+@job_queue.task("notify-upvote", max_attempts=3)
+def notify_upvote(post_id, user_id):
+    """Tell the post's author about an upvote, unless it was withdrawn before the job ran."""
+    upvoted = db.session.scalar(select(exists().where(PostUpvote.post_id == post_id, PostUpvote.user_id == user_id)))
+    post, voter = db.session.get(Post, post_id), db.session.get(User, user_id)
+    if not upvoted or post is None or voter is None:
+        return
+    db.session.add(Notification(
+        user_id=post.user_id,
+        message=f"{voter.username} upvoted your post '{post.title}'"[:255],
+        type=NotificationTypeEnum.info,
+        # url_for needs a request; the worker has none
+        link=current_app.url_map.bind("").build("community.view_post", {"slug": post.slug}),
+    ))
+    db.session.commit()
+
+
+def _comments_by_post(post_ids):
+    comments = {}
+    query = (
+        Comment.query.options(joinedload(Comment.author))
+        .filter(Comment.post_id.in_(post_ids))
+        .order_by(Comment.id)
+    )
+    for comment in query:
+        comments.setdefault(comment.post_id, []).append(comment)
+    return comments
+
+
+def _attach_replies(post, comments):
+    """Fill ``comment.replies`` for the top-level ``comments`` of ``post`` with one query.
+
+    A selectinload sends one IN query per 500 parents, so a busy thread
+    would cost a query per 500 comments.
+    """
+    replies = {}
+    query = post.comments.options(*loader_options("comment_tree")).filter(Comment.parent_id.isnot(None))
+    for reply in query.order_by(Comment.id):
+        replies.setdefault(reply.parent_id, []).append(reply)
+    for comment in comments:
+        set_committed_value(comment, "replies", replies.get(comment.id, []))
+
+
 # List all posts
 @community_bp.route("/community")
 def community():
-    
-    posts = Post.query.filter_by(is_deleted=False).order_by(Post.created_at.desc()).all()
-    return render_template("community.html", posts=posts)
+    sort = request.args.get("sort", "hot")
+    if sort not in FEED_SORTS:
+        sort = "hot"
+    window = request.args.get("window", "week")
+    if window not in ranking.WINDOWS:
+        window = "week"
+
+    query = Post.query.options(*loader_options("feed"))  # deleted posts are filtered by backend.soft_delete
+    if sort == "hot":
+        # top N off ix_posts_live_hot; scores are kept current by backend.ranking
+        query = query.order_by(Post.hot_score.desc(), Post.id.desc()).limit(FEED_TOP_N)
+    elif sort == "top":
+        if ranking.WINDOWS[window] is not None:
+            query = query.filter(Post.created_at >= datetime.utcnow() - ranking.WINDOWS[window])
+        query = query.order_by(Post.upvote_count.desc(), Post.id.desc()).limit(FEED_TOP_N)
+    else:
+        # newest first in pages of FEED_TOP_N; ?before=<post id> walks ix_posts_live_created by keyset
+        before = request.args.get("before", type=int)
+        if before is not None:
+            cursor = select(Post.created_at).where(Post.id == before).scalar_subquery()
+            query = query.filter(or_(Post.created_at < cursor, and_(Post.created_at == cursor, Post.id < before)))
+        query = query.order_by(Post.created_at.desc(), Post.id.desc()).limit(FEED_TOP_N + 1)
+    posts = query.all()
+    next_before = None
+    if sort == "new" and len(posts) > FEED_TOP_N:
+        posts = posts[:FEED_TOP_N]
+        next_before = posts[-1].id
+
+    # comment lists are only queried if a card misses the fragment cache
+    post_ids = [p.id for p in posts]
+    return render_template(
+        "community.html",
+        posts=posts,
+        sort=sort,
+        window=window,
+        windows=ranking.WINDOWS,
+        next_before=next_before,
+        post_comments=BatchLoader(post_ids, _comments_by_post, default=()),
+    )
 
 
 # Ask a question / share idea
@@ -46,8 +140,9 @@ def ask_post():
             image= filename,
             user_id=current_user.id,
             created_at=datetime.utcnow(),
-            is_deleted=False
         )
+        post.tags = tags_for(parse_tags(form.tags.data))
+        post.hot_score = ranking.hot_score(0, 0, post.created_at)
         db.session.add(post)
         db.session.commit()
         flash("Your post has been published!", "success")
@@ -55,11 +150,57 @@ def ask_post():
     return render_template("ask_post.html", form=form)
 
 
+# Posts with a tag, newest first; ?before=<post id> pages through older ones
+@community_bp.route("/community/tag/<slug>")
+def tag_posts(slug):
+    tag = Tag.query.filter_by(slug=slug).first_or_404()
+    before = request.args.get("before", type=int)
+
+    # keyset pagination walks ix_post_tags_tag_post; no OFFSET scans on deep pages
+    query = (
+        Post.query.options(*loader_options("feed"))
+        .join(post_tags, post_tags.c.post_id == Post.id)
+        .filter(post_tags.c.tag_id == tag.id)
+    )
+    if before is not None:
+        query = query.filter(post_tags.c.post_id < before)
+    posts = query.order_by(post_tags.c.post_id.desc()).limit(TAG_PAGE_SIZE + 1).all()
+
+    next_before = posts[TAG_PAGE_SIZE - 1].id if len(posts) > TAG_PAGE_SIZE else None
+    return render_template("tag_posts.html", tag=tag, posts=posts[:TAG_PAGE_SIZE], next_before=next_before)
+
+
+# Tag cloud: the most used tags, sized by their precomputed post counts
+@community_bp.route("/community/tags")
+def tag_cloud():
+    tags = (
+        Tag.query.filter(Tag.post_count > 0)
+        .order_by(Tag.post_count.desc(), Tag.id)
+        .limit(TAG_CLOUD_SIZE)
+        .all()
+    )
+    weights = {}
+    if tags:
+        # 1..5 on a log scale, so one huge tag does not flatten the rest
+        low, high = math.log(tags[-1].post_count), math.log(tags[0].post_count)
+        spread = (high - low) or 1
+        weights = {tag.id: 1 + round(4 * (math.log(tag.post_count) - low) / spread) for tag in tags}
+    tags.sort(key=lambda tag: tag.name.lower())
+    return render_template("tag_cloud.html", tags=tags, weights=weights)
+
+
 @community_bp.route("/community/<slug>")
 def view_post(slug):
-    post = Post.query.filter_by(slug=slug, is_deleted=False).first_or_404()
+    post = Post.query.options(*loader_options("detail")).filter_by(slug=slug).first_or_404()
 
-    comments= post.comments.filter_by(parent_id=None, is_deleted=False).order_by(Comment.created_at.asc()).all()
+    comments= (
+        post.comments.options(*loader_options("comment_tree"))
+        .filter_by(parent_id=None)
+        .order_by(Comment.created_at.asc())
+        .all()
+    )
+    _attach_replies(post, comments)
+    view_counter.record("post_views", post.id)
     return render_template("view_post.html", post=post, comments= comments)
 
 
@@ -67,6 +208,7 @@ def view_post(slug):
 
 @community_bp.route("/community/upvote/<int:post_id>", methods=["POST"])
 @login_required
+@rate_limiter.limit("upvote", json=True)
 def upvote_post(post_id):
     post = Post.query.get_or_404(post_id)
 
@@ -77,29 +219,24 @@ def upvote_post(post_id):
         # User already upvoted → remove upvote (toggle)
         db.session.delete(existing_upvote)
         action = "removed"
+        delta = -1
     else:
         # Add a new upvote
         new_upvote = PostUpvote(post_id=post.id, user_id=current_user.id)
         db.session.add(new_upvote)
         action = "added"
+        delta = 1
 
-        # Optional: Create a notification for the post author
-        if post.author and post.author.id != current_user.id:
-            # Assuming Notification and NotificationTypeEnum are already imported at the top
-            notification = Notification(
-                user_id=post.author.id,
-                message=f"{current_user.username} upvoted your post '{post.title}'",
-                type=NotificationTypeEnum.info,
-                link=url_for('community.view_post', slug=post.slug)
-            )
-            db.session.add(notification)
+        # The author is notified by a background job, committed together with the upvote
+        if post.user_id is not None and post.user_id != current_user.id:
+            notify_upvote.enqueue(post_id=post.id, user_id=current_user.id)
+
+    # Counter and hot score move in the same transaction as the upvote row
+    total_upvotes, _ = ranking.bump(post, upvotes=delta)
 
     # Commit all changes (upvote/downvote and notification) at once
     db.session.commit()
 
-    # Get the final count after the transaction
-    total_upvotes= PostUpvote.query.filter_by(post_id=post.id).count()
-
     return jsonify({
         "status": "success",
         "action": action,
@@ -109,6 +246,7 @@ def upvote_post(post_id):
 @community_bp.route('/community/comment/<slug>', methods=['POST'])
 
 @login_required
+@rate_limiter.limit("comment", json=True)
 def post_comment(slug):
     post = Post.query.filter_by(slug=slug).first_or_404()
     content = request.form.get("content")
@@ -125,6 +263,7 @@ def post_comment(slug):
     )
 
     db.session.add(comment)
+    _, total_comments = ranking.bump(post, comments=1)
     db.session.commit()
 
     return jsonify({
@@ -135,5 +274,5 @@ def post_comment(slug):
             "content": comment.content,
             "parent_id": comment.parent_id
         },
-        "total_comments": post.comments.count()
+        "total_comments": total_comments
     })
\ No newline at end of file
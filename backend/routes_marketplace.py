@@ -1,25 +1,50 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 
-from backend.forms import ListingForm
-from backend.models import Listing, Category, ListingImage
-from backend.extensions import db
+from backend.forms import InterestForm, ListingForm
+from backend.models import Listing, Category, ListingImage, ListingMatch, ListingTypeEnum, RecyclerInterest, wishlist
+from backend import geo, lifecycle, matching  # matching: rematches listings on flush
+from backend import wishlist as wishlists  # records price / availability alerts on flush
+from backend.extensions import db, rate_limiter, view_counter
+from backend.loader_profiles import loader_options
 
 from datetime import datetime
 
 marketplace_bp = Blueprint("marketplace", __name__, template_folder="../templates")
 
+WISHLIST_PAGE_SIZE = 20
+
 # List all active listings
 @marketplace_bp.route("/marketplace")
 def marketplace():
-    listings = Listing.query.filter_by(is_active=True).order_by(Listing.created_at.desc()).all()
+    listings = (
+        Listing.query.options(*loader_options("listing_card"))
+        .filter_by(is_active=True)
+        .order_by(Listing.created_at.desc())
+        .all()
+    )
     return render_template("marketplace.html", listings=listings)
 
 # View single listing
 @marketplace_bp.route("/marketplace/<slug>")
 def view_listing(slug):
-    listing = Listing.query.filter_by(slug=slug, is_active=True).first_or_404()
-    return render_template("view_listing.html", listing=listing)
+    # expired or deactivated listings still resolve; they render as no longer available
+    query = Listing.query.options(*loader_options("listing_detail")).filter_by(slug=slug)
+    if current_user.is_authenticated:
+        listing, saved = query.add_columns(wishlists.saved_column(current_user.id)).first() or (None, False)
+    else:
+        listing, saved = query.first(), False
+    if listing is None:
+        # moved out of `listings` by `flask archive-listings`; old links keep working
+        archived = lifecycle.find_archived(slug)
+        if archived is None:
+            abort(404)
+        return render_template("view_listing.html", listing=archived, saved=False, archived=True)
+    if not listing.is_active:
+        return render_template("view_listing.html", listing=listing, saved=saved, archived=True)
+    view_counter.record("listing_views", listing.id)
+    return render_template("view_listing.html", listing=listing, saved=saved)
 
 # Create new listing
 @marketplace_bp.route("/marketplace/create", methods=["GET", "POST"])
@@ -35,8 +60,11 @@ def create_listing():
             unit=form.unit.data,
             owner_id=current_user.id,
             category_id=form.category_id.data,
+            listing_type=ListingTypeEnum(form.listing_type.data),
+            location=form.location.data or None,  # geocoded on insert (backend.geo)
             is_active=True,
             created_at=datetime.utcnow(),
+            expires_at=lifecycle.expiry(),
         )
        
         db.session.add(listing)
@@ -44,3 +72,141 @@ def create_listing():
         flash("Listing created successfully!", "success")
         return redirect(url_for("marketplace.view_listing", slug=listing.slug))
     return render_template("create_listing.html", form=form)
+
+
+# Listings near a place: ?near=Kigali&radius_km=20, or the k nearest with &k=10
+@marketplace_bp.route("/marketplace/nearby")
+def nearby_listings():
+    try:
+        latitude, longitude, radius_km, k, label = geo.search_args(request.args)
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+
+    query = Listing.query.filter_by(is_active=True)
+    if request.args.get("category"):
+        query = query.join(Category).filter(Category.slug == request.args["category"])
+    if request.args.get("type") in ListingTypeEnum.__members__:
+        query = query.filter(Listing.listing_type == ListingTypeEnum(request.args["type"]))
+
+    if k:
+        found = geo.nearest(query, Listing, latitude, longitude, k, max_radius_km=radius_km)
+    else:
+        found = geo.within(query, Listing, latitude, longitude, radius_km, limit=100)
+    listings = {
+        l.id: l for l in
+        Listing.query.options(*loader_options("listing_card")).filter(Listing.id.in_([i for i, _ in found]))
+    }
+    return jsonify({
+        "status": "success",
+        "center": {"label": label, "lat": latitude, "lon": longitude, "radius_km": radius_km},
+        "results": [
+            {
+                "id": listing_id,
+                "title": listings[listing_id].title,
+                "url": url_for("marketplace.view_listing", slug=listings[listing_id].slug),
+                "category": listings[listing_id].category.name if listings[listing_id].category else None,
+                "type": listings[listing_id].listing_type.value,
+                "location": listings[listing_id].location,
+                "region": listings[listing_id].region,
+                "distance_km": round(distance, 2),
+            }
+            for listing_id, distance in found
+            if listing_id in listings  # deactivated or archived between the two queries
+        ],
+    })
+
+
+# A recycler's interests and the listings matched to them (backend.matching)
+@marketplace_bp.route("/marketplace/matches", methods=["GET", "POST"])
+@login_required
+def matches():
+    form = InterestForm()
+    form.set_choices()
+    if form.validate_on_submit():
+        if not current_user.is_recycler():
+            flash("Only recyclers can register material interests.", "danger")
+            return redirect(url_for("marketplace.matches"))
+        region = None
+        if form.region.data:
+            place = geo.geocode(form.region.data)
+            if place is None or place.region is None:
+                flash(f"Unknown location: {form.region.data}", "danger")
+                return redirect(url_for("marketplace.matches"))
+            region = place.region
+        exists = RecyclerInterest.query.filter_by(
+            user_id=current_user.id, category_id=form.category_id.data, region=region
+        ).first()
+        if exists is None:
+            db.session.add(RecyclerInterest(
+                user_id=current_user.id,
+                category_id=form.category_id.data,
+                region=region,
+                max_distance_km=form.max_distance_km.data,
+                min_quantity=form.min_quantity.data,
+            ))
+            db.session.commit()  # matched against recent listings on flush
+        flash("Interest saved. Matching listings are shown below.", "success")
+        return redirect(url_for("marketplace.matches"))
+
+    interests = (
+        current_user.interests.options(joinedload(RecyclerInterest.category))
+        .order_by(RecyclerInterest.created_at.desc())
+        .all()
+    )
+    found = (
+        ListingMatch.query.options(*loader_options("match_card"))
+        .join(Listing)
+        .filter(ListingMatch.user_id == current_user.id, Listing.is_active == True)
+        .order_by(ListingMatch.score.desc(), ListingMatch.id)
+        .limit(matching.MAX_MATCHES_SHOWN)
+        .all()
+    )
+    return render_template("matches.html", form=form, interests=interests, matches=found)
+
+
+@marketplace_bp.route("/marketplace/interests/<int:interest_id>/delete", methods=["POST"])
+@login_required
+def delete_interest(interest_id):
+    interest = RecyclerInterest.query.filter_by(id=interest_id, user_id=current_user.id).first_or_404()
+    db.session.delete(interest)
+    db.session.commit()
+    flash("Interest removed.", "success")
+    return redirect(url_for("marketplace.matches"))
+
+
+# ----------------------------
+# Wishlist
+# ----------------------------
+@marketplace_bp.route("/marketplace/wishlist")
+@login_required
+def view_wishlist():
+    before = request.args.get("before", type=int)
+    # keyset pagination over the (user_id, listing_id) primary key, newest listings first
+    query = (
+        Listing.query.options(*loader_options("listing_card"))
+        .join(wishlist, wishlist.c.listing_id == Listing.id)
+        .filter(wishlist.c.user_id == current_user.id)
+    )
+    if before is not None:
+        query = query.filter(wishlist.c.listing_id < before)
+    listings = query.order_by(wishlist.c.listing_id.desc()).limit(WISHLIST_PAGE_SIZE + 1).all()
+
+    next_before = listings[WISHLIST_PAGE_SIZE - 1].id if len(listings) > WISHLIST_PAGE_SIZE else None
+    return render_template("wishlist.html", listings=listings[:WISHLIST_PAGE_SIZE], next_before=next_before)
+
+
+@marketplace_bp.route("/marketplace/wishlist/<int:listing_id>", methods=["POST"])
+@login_required
+@rate_limiter.limit("wishlist", json=True)
+def add_to_wishlist(listing_id):
+    listing = Listing.query.filter_by(id=listing_id, is_active=True).first_or_404()
+    added = wishlists.add(current_user.id, listing.id)
+    return jsonify({"status": "success", "action": "added" if added else "unchanged", "saved": True})
+
+
+@marketplace_bp.route("/marketplace/wishlist/<int:listing_id>/remove", methods=["POST"])
+@login_required
+@rate_limiter.limit("wishlist", json=True)
+def remove_from_wishlist(listing_id):
+    removed = wishlists.remove(current_user.id, listing_id)
+    return jsonify({"status": "success", "action": "removed" if removed else "unchanged", "saved": False})
@@ -1,8 +1,12 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 
-from backend.models import Conversation, Message, User, conversation_participants
-from backend.extensions import db
+from sqlalchemy import exists, func, select
+
+from backend.models import Conversation, Listing, Message, User, conversation_participants
+from backend.extensions import db, rate_limiter, view_counter
+from backend.loader_profiles import loader_options
+from backend import read_state, realtime, search
 
 from datetime import datetime
 
@@ -14,14 +18,53 @@ messaging_bp = Blueprint("messaging", __name__, template_folder="../templates")
 @login_required
 def conversations():
     # Get conversations current_user participates in
-    convs = current_user.conversations
-    return render_template("conversations.html", conversations=convs)
+    convs = (
+        Conversation.query.options(*loader_options("inbox"))
+        .join(conversation_participants)
+        .filter(conversation_participants.c.user_id == current_user.id)
+        .order_by(Conversation.id)
+        .all()
+    )
+    # newest message of every conversation in one query, instead of loading whole threads
+    latest = (
+        db.session.query(func.max(Message.id))
+        .filter(Message.conversation_id.in_([c.id for c in convs]))
+        .group_by(Message.conversation_id)
+    )
+    # with the unread count of each conversation (a range count past the user's read cursor)
+    rows = (
+        Message.query.filter(Message.id.in_(latest.scalar_subquery()))
+        .add_columns(read_state.unread_column(current_user.id, Message.conversation_id))
+    )
+    last_messages, unread = {}, {}
+    for m, count in rows:
+        last_messages[m.conversation_id] = m
+        unread[m.conversation_id] = count
+    return render_template("conversations.html", conversations=convs, last_messages=last_messages, unread=unread)
+
+# Search the messages of the user's conversations
+@messaging_bp.route("/messages/search")
+@login_required
+def search_messages():
+    query = request.args.get("q", "").strip()
+    before = request.args.get("before", type=int)
+    # one row past the page tells whether there is a next one
+    results = search.search_messages(current_user.id, query, before=before, limit=search.SEARCH_PAGE_SIZE + 1)
+    next_before = results[search.SEARCH_PAGE_SIZE - 1]["id"] if len(results) > search.SEARCH_PAGE_SIZE else None
+    return render_template(
+        "message_search.html",
+        query=query,
+        results=results[:search.SEARCH_PAGE_SIZE],
+        next_before=next_before,
+    )
 
 # View a conversation and send a message
 @messaging_bp.route("/messages/<int:conversation_id>", methods=["GET", "POST"])
 @login_required
+@rate_limiter.limit("message", methods=["POST"])
 def view_conversation(conversation_id):
-    conv = Conversation.query.get_or_404(conversation_id)
+    profile = "thread" if request.method == "GET" else "inbox"  # a POST only redirects
+    conv = db.get_or_404(Conversation, conversation_id, options=loader_options(profile))
     # Check if user is participant
     if current_user not in conv.participants:
         flash("Access denied", "danger")
@@ -34,27 +77,38 @@ def view_conversation(conversation_id):
                 conversation_id=conv.id,
                 sender_id=current_user.id,
                 content=content,
-                is_read=False,
                 created_at=datetime.utcnow(),
             )
             db.session.add(msg)
+            db.session.flush()
+            payload = realtime.message_payload(msg, current_user.username)
+            target = url_for("messaging.view_conversation", conversation_id=conv.id)  # before the commit expires conv
             db.session.commit()
+            realtime.broadcast_message(payload)  # live to the rest of the room
             flash("Message sent", "success")
-            return redirect(url_for("messaging.view_conversation", conversation_id=conv.id))
+            return redirect(target)
 
-    # Mark unread messages as read for current user
-    for msg in conv.messages:
-        if msg.sender_id != current_user.id and not msg.is_read:
-            msg.is_read = True
-    db.session.commit()
-
-    return render_template("view_conversation.html", conversation=conv)
+    # Mark read for current user: move their cursor to the newest message shown
+    moved = conv.messages and read_state.mark_read(conv.id, current_user.id, max(m.id for m in conv.messages))
+    # render first: committing expires conv, its messages and current_user (the layout reads its role),
+    # and the cursor update changes none of them
+    page = render_template("view_conversation.html", conversation=conv)
+    if moved:
+        db.session.commit()
+    return page
 
 # Start new conversation
 @messaging_bp.route("/messages/new/<int:user_id>", methods=["GET", "POST"])
 @login_required
 def new_conversation(user_id):
     other_user = User.query.get_or_404(user_id)
+    # "Contact seller" links pass the listing; count it as a contact (deduplicated per visitor),
+    # but only for an active listing of the user being contacted: the parameter is client-supplied
+    listing_id = request.args.get("listing", type=int)
+    if listing_id is not None and other_user.id != current_user.id and db.session.scalar(select(exists().where(
+        Listing.id == listing_id, Listing.owner_id == other_user.id, Listing.is_active == True,
+    ))):
+        view_counter.record("listing_contacts", listing_id)
     # Check if conversation exists
     conv = (
         Conversation.query
@@ -1,20 +1,22 @@
 from backend.forms import EditProfileForm, AvatarUploadForm
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 
-from backend.extensions import db
+from backend.extensions import db, presence, user_cache
 from datetime import datetime
 
 
 import os 
 from  werkzeug.utils import secure_filename
-from PIL import Image
 import uuid
 
-from backend.models import User, Post
+from backend.models import User, Post, RoleEnum
+from backend import geo
 
 def detect_image_type(file_storage):
+    from PIL import Image  # Pillow is only needed for avatar uploads; keep it out of worker boot
+
     try:
         img=Image.open(file_storage)
         return img.format.lower()
@@ -26,6 +28,9 @@ def detect_image_type(file_storage):
 
 
 profile_bp=Blueprint('profile', __name__, template_folder='../templates')
+
+ONLINE_IDS_SHOWN = 500
+
 @profile_bp.route('/profile/edit',methods=['GET','POST'])
 @login_required
 def edit_profile():
@@ -41,6 +46,7 @@ def edit_profile():
         current_user.github = form.github.data
 
         db.session.commit()
+        user_cache.invalidate(current_user)
         flash("Profile updated successfully!", "success")
         return redirect(url_for("profile.profile", username=current_user.username))
 
@@ -82,13 +88,69 @@ def upload_avatar():
     current_user.avatar_url_filename = filename
     current_user.updated_at = datetime.utcnow()  # optional: for cache-busting
     db.session.commit()
+    user_cache.invalidate(current_user)
 
     flash("Avatar updated successfully!", "success")
     return redirect(url_for("profile.edit_profile"))
 
 
+# Users near a place, e.g. recyclers within 20 km of Kigali:
+# /profile/nearby?near=Kigali&radius_km=20&role=recycler (add &k=10 for the 10 nearest).
+# Region and whole-km distances only: exact distances from a few probe points would locate a user.
+@profile_bp.route("/profile/nearby")
+@login_required
+def nearby_users():
+    try:
+        latitude, longitude, radius_km, k, label = geo.search_args(request.args)
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+
+    query = User.query
+    if request.args.get("role") in RoleEnum.__members__:
+        query = query.filter(User.role == RoleEnum(request.args["role"]))
+
+    if k:
+        found = geo.nearest(query, User, latitude, longitude, k, max_radius_km=radius_km)
+    else:
+        found = geo.within(query, User, latitude, longitude, radius_km, limit=100)
+    users = {u.id: u for u in User.query.filter(User.id.in_([i for i, _ in found]))}
+    return jsonify({
+        "status": "success",
+        "center": {"label": label, "lat": latitude, "lon": longitude, "radius_km": radius_km},
+        "results": [
+            {
+                "username": users[user_id].username,
+                "role": users[user_id].role.value,
+                "url": url_for("profile.profile", username=users[user_id].username),
+                "region": users[user_id].region,
+                "distance_km": round(distance),
+            }
+            for user_id, distance in found
+            if user_id in users
+        ],
+    })
+
+
+# Who is around: ?minutes=15 for "active in the last 15 minutes"; read from presence, not from users
+@profile_bp.route("/profile/online")
+@login_required
+def online_users():
+    minutes = min(max(request.args.get("minutes", 5, type=int), 1), 24 * 60)
+    active = presence.active_since(minutes * 60)
+    online = presence.online()
+    return jsonify({
+        "status": "success",
+        "online_now": len(online),
+        "active": {"minutes": minutes, "count": len(active)},
+        "user_ids": sorted(online)[:ONLINE_IDS_SHOWN],
+    })
+
+
 @profile_bp.route("/profile/<username>")
 def profile(username):
     """View a public profile."""
     user = User.query.filter_by(username=username).first_or_404()
-    return render_template("profile.html", user=user, Post=Post)
+    # presence knows about recent activity before it is flushed to users.last_seen
+    last_seen = presence.last_seen(user.id) or user.last_seen
+    return render_template("profile.html", user=user, Post=Post, last_seen=last_seen,
+                           online=presence.is_online(user.id))
@@ -0,0 +1,170 @@
+# search.py
+"""Full-text search over the messages of a user's conversations.
+
+The index depends on the database:
+
+* SQLite: ``messages_fts``, an external-content FTS5 table over
+  ``messages.content`` (it stores only the index, not a second copy of
+  the text), kept in sync by insert/update/delete triggers;
+* PostgreSQL: a GIN index on ``to_tsvector('simple', content)``. The
+  ``simple`` configuration does no stemming or stop words, so it works
+  the same whatever language a conversation is in.
+
+The DDL below runs with ``create_all`` (tests, benchmarks); the migration
+creates the same objects on existing databases. Other databases fall back
+to ``LIKE``.
+
+Matches are restricted to the user's conversations by joining
+``conversation_participants`` on both of its columns, an index-only lookup
+per matching message (the primary key, or
+``ix_conversation_participants_user`` when the planner starts from the
+user). They are ordered newest first and paged by keyset on the message
+id (``before``), so a deep page costs the same as the first.
+"""
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import DDL, DateTime, event, text
+
+from backend.extensions import db
+from backend.models import Message
+
+
+SEARCH_PAGE_SIZE = 20
+SNIPPET_TOKENS = 12
+MAX_TERMS = 8
+
+# private-use characters around each hit; swapped for <mark> after HTML-escaping the snippet
+MARK_START, MARK_END = "\ue000", "\ue001"
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+# ----------------------------
+# Index DDL
+# ----------------------------
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+    "content, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+_POSTGRES_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_messages_content_fts ON messages USING gin (to_tsvector('simple', content))",
+]
+
+for _statement in _SQLITE_DDL:
+    event.listen(Message.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in _POSTGRES_DDL:
+    event.listen(Message.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+event.listen(Message.__table__, "before_drop", DDL("DROP TABLE IF EXISTS messages_fts").execute_if(dialect="sqlite"))
+
+
+# ----------------------------
+# Queries
+# ----------------------------
+def terms(query):
+    """The words of a user query (at most MAX_TERMS); operators and quotes are dropped."""
+    return _TERM.findall(query or "")[:MAX_TERMS]
+
+
+def _fts5_query(words):
+    # every word must match, the last one as a prefix (search-as-you-type)
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _tsquery(words):
+    return " & ".join(words[:-1] + [f"{words[-1]}:*"])
+
+
+_SELECT = """
+    SELECT m.id, m.conversation_id, m.sender_id, m.created_at, u.username AS sender, {snippet} AS snippet
+"""
+_PARTICIPANT_JOIN = """
+    JOIN conversation_participants cp ON cp.conversation_id = m.conversation_id AND cp.user_id = :user_id
+    LEFT JOIN users u ON u.id = m.sender_id
+"""
+
+_SQLITE_SEARCH = _SELECT.format(
+    snippet=f"snippet(messages_fts, 0, :mark_start, :mark_end, '…', {SNIPPET_TOKENS})"
+) + """
+    FROM messages_fts
+    JOIN messages m ON m.id = messages_fts.rowid
+""" + _PARTICIPANT_JOIN + """
+    WHERE messages_fts MATCH :query AND messages_fts.rowid < :before
+    ORDER BY messages_fts.rowid DESC
+    LIMIT :limit
+"""
+
+_POSTGRES_SEARCH = _SELECT.format(
+    snippet="ts_headline('simple', m.content, q.query, :headline_options)"
+) + """
+    FROM messages m
+    CROSS JOIN to_tsquery('simple', :query) AS q(query)
+""" + _PARTICIPANT_JOIN + """
+    WHERE to_tsvector('simple', m.content) @@ q.query AND m.id < :before
+    ORDER BY m.id DESC
+    LIMIT :limit
+"""
+
+_LIKE_SEARCH = _SELECT.format(snippet="m.content") + """
+    FROM messages m
+""" + _PARTICIPANT_JOIN + """
+    WHERE {conditions} AND m.id < :before
+    ORDER BY m.id DESC
+    LIMIT :limit
+"""
+
+
+def _like_snippet(content, words):
+    pattern = re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+    return pattern.sub(lambda hit: f"{MARK_START}{hit.group(0)}{MARK_END}", content)
+
+
+def highlight(snippet):
+    """HTML for a snippet: the text escaped, the hits wrapped in <mark>."""
+    html = str(escape(snippet or "")).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+    return Markup(html)
+
+
+def search_messages(user_id, query, before=None, limit=SEARCH_PAGE_SIZE):
+    """Messages of ``user_id``'s conversations matching ``query``, newest first, ids below ``before``.
+
+    Returns rows with id, conversation_id, sender_id, created_at, sender and
+    an HTML ``snippet``.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    params = {"user_id": user_id, "before": before or 2 ** 62, "limit": limit}
+    dialect = db.session.get_bind(mapper=Message).dialect.name
+    if dialect == "sqlite":
+        statement = text(_SQLITE_SEARCH)
+        params.update(query=_fts5_query(words), mark_start=MARK_START, mark_end=MARK_END)
+    elif dialect == "postgresql":
+        statement = text(_POSTGRES_SEARCH)
+        params.update(query=_tsquery(words), headline_options=(
+            f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={SNIPPET_TOKENS + 8}, MinWords=5"
+        ))
+    else:
+        conditions = " AND ".join(f"m.content LIKE :word_{i}" for i in range(len(words)))
+        statement = text(_LIKE_SEARCH.format(conditions=conditions))
+        params.update({f"word_{i}": f"%{word}%" for i, word in enumerate(words)})
+
+    statement = statement.columns(created_at=DateTime)  # raw SQL: SQLite returns datetimes as strings otherwise
+    rows = db.session.execute(statement, params).mappings().all()
+    results = []
+    for row in rows:
+        row = dict(row)
+        if dialect not in ("sqlite", "postgresql"):
+            row["snippet"] = _like_snippet(row["snippet"], words)
+        row["snippet"] = highlight(row["snippet"])
+        results.append(row)
+    return results
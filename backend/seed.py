@@ -0,0 +1,426 @@
+# seed.py
+"""Synthetic data generator for load and benchmark runs.
+
+Volumes are configurable and the distributions are skewed on purpose:
+authors, sellers and message senders are drawn from a Zipf-like
+(power-law) distribution, and upvotes/comments concentrate on a handful of
+"viral" posts, which is what real community data looks like and what makes
+N+1 patterns and hot rows show up.
+
+Rows are written with bulk core INSERTs and explicit ids, so seeding a
+100k-row dataset takes seconds and can be appended to a non-empty database.
+
+    flask --app main seed --scale 2
+"""
+from datetime import datetime, timedelta
+from itertools import accumulate
+import random
+import secrets
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert
+from werkzeug.security import generate_password_hash
+
+from backend.extensions import db
+from backend.models import (
+    User, Category, Listing, ListingImage, Post, Tag, Comment, PostUpvote,
+    Conversation, Message, Notification, RoleEnum, ListingTypeEnum,
+    NotificationTypeEnum, RecyclerInterest, post_tags, conversation_participants, wishlist, slugify,
+)
+from backend.tags import reconcile_tag_counts
+from backend import geo, impact, lifecycle, matching, ranking
+
+
+DEFAULT_VOLUMES = {
+    "users": 500,
+    "categories": 12,
+    "listings": 3000,
+    "posts": 2000,
+    "comments": 12000,
+    "upvotes": 20000,
+    "conversations": 800,
+    "messages": 10000,
+    "notifications": 8000,
+    "wishlist": 4000,
+}
+
+CATEGORY_NAMES = [
+    "Plastic", "Paper & Cardboard", "Glass", "Metal Scrap", "E-waste", "Organic",
+    "Textiles", "Rubber & Tyres", "Wood", "Construction Debris", "Batteries", "Used Oil",
+    "Compost", "Recycled Pellets", "Upcycled Furniture", "Biogas Slurry",
+]
+LOCATIONS = [
+    "Kigali", "Musanze", "Huye", "Rubavu", "Nairobi", "Mombasa", "Kampala",
+    "Lagos", "Accra", "Dar es Salaam", "Addis Ababa", "Johannesburg", "Kisumu",
+]
+WORDS = (
+    "waste value recycle plastic bottles collection compost circular economy sorting "
+    "pickup kilogram bale buyer seller price market community clean-up upcycle "
+    "e-waste metal paper glass organic project cooperative training impact"
+).split()
+UNITS = ["kg", "kg", "kg", "t", "pcs"]
+
+
+def zipf_weights(n, alpha=1.1):
+    """Cumulative weights for picking item ``i`` with probability ~ 1 / (i + 1) ** alpha."""
+    return list(accumulate(1.0 / (rank + 1) ** alpha for rank in range(n)))
+
+
+def sentence(rng, low=4, high=12):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _bulk(target, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(target), rows[start:start + batch_size])
+    if rows and "id" in rows[0] and db.engine.dialect.name == "postgresql":
+        # explicit ids do not advance the serial sequence; without this the next ORM insert collides
+        db.session.execute(
+            db.text(f"SELECT setval(pg_get_serial_sequence(:table, 'id'), (SELECT max(id) FROM {target.name}))"),
+            {"table": target.name},
+        )
+
+
+def generate(volumes=None, seed=42, batch_size=2000, days=365):
+    """Insert a synthetic dataset and return the number of rows written per table."""
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    rng = random.Random(seed)
+    jitter = random.Random(seed)  # separate stream: adding geo data must not reshuffle the rest
+    now = datetime.utcnow()
+    token = secrets.token_hex(3)
+
+    def place(location):
+        # scatter around the town centre (~±5 km) so radius searches have something to sort
+        found = geo.geocode(location)
+        jittered = geo.Place(found.name, found.region, found.country, found.kind,
+                             found.latitude + jitter.uniform(-0.045, 0.045),
+                             found.longitude + jitter.uniform(-0.045, 0.045))
+        return {"location": location, **geo.location_fields(jittered)}
+
+    def ago(max_days=days):
+        return now - timedelta(seconds=rng.randint(0, max_days * 86400))
+
+    # ----------------------------
+    # Users
+    # ----------------------------
+    password = generate_password_hash("password")  # one hash, reused; hashing is deliberately slow
+    roles = [RoleEnum.producer] * 4 + [RoleEnum.recycler] * 3 + [RoleEnum.consumer] * 5 + [RoleEnum.expert]
+    first_user = _next_id(User)
+    users = []
+    for offset in range(volumes["users"]):
+        uid = first_user + offset
+        created = ago()
+        users.append({
+            "id": uid,
+            "username": f"user{uid}_{token}",
+            "email": f"user{uid}_{token}@example.com",
+            "password": password,
+            "role": rng.choice(roles),
+            "is_verified": rng.random() < 0.3,
+            "full_name": f"User {uid}",
+            **place(rng.choice(LOCATIONS)),
+            "created_at": created,
+            "updated_at": created,
+            "last_seen": ago(30),
+            "is_deleted": False,
+        })
+    _bulk(User.__table__, users, batch_size)
+    user_ids = [u["id"] for u in users]
+    user_weights = zipf_weights(len(user_ids))
+
+    def pick_user():
+        return rng.choices(user_ids, cum_weights=user_weights)[0]
+
+    # ----------------------------
+    # Categories
+    # ----------------------------
+    existing = {name for (name,) in db.session.query(Category.name)}
+    first_category = _next_id(Category)
+    categories = []
+    for name in CATEGORY_NAMES[:volumes["categories"]]:
+        if name in existing:
+            continue
+        categories.append({
+            "id": first_category + len(categories),
+            "name": name,
+            "slug": slugify(name),
+            "is_active": True,
+            "created_at": ago(),
+        })
+    _bulk(Category.__table__, categories, batch_size)
+    category_ids = [cid for (cid,) in db.session.query(Category.id)]
+
+    # ----------------------------
+    # Listings + images
+    # ----------------------------
+    first_listing = _next_id(Listing)
+    first_image = _next_id(ListingImage)
+    listings, images = [], []
+    for offset in range(volumes["listings"]):
+        lid = first_listing + offset
+        title = sentence(rng, 2, 5)
+        created = ago()
+        listings.append({
+            "id": lid,
+            "title": title,
+            "slug": f"{slugify(title)[:200]}-{lid}-{token}",
+            "description": sentence(rng, 10, 40),
+            "listing_type": rng.choice([ListingTypeEnum.waste] * 3 + [ListingTypeEnum.recycled]),
+            "category_id": rng.choice(category_ids) if category_ids else None,
+            "quantity": round(rng.paretovariate(1.5) * 20, 1),
+            "unit": rng.choice(UNITS),
+            "price": round(rng.uniform(50, 5000), 0) if rng.random() < 0.7 else None,
+            "currency": "RWF",
+            **place(rng.choice(LOCATIONS)),
+            "is_active": rng.random() < 0.85,
+            "owner_id": pick_user(),
+            "views": 0,
+            "contact_count": 0,
+            "created_at": created,
+            "updated_at": created,
+            "expires_at": lifecycle.expiry(created),
+        })
+        for position in range(rng.randint(0, 3)):
+            images.append({
+                "id": first_image + len(images),
+                "listing_id": lid,
+                "image_url": f"/static/uploads/listings/{lid}_{position}.jpg",
+                "position": position,
+                "created_at": created,
+            })
+    _bulk(Listing.__table__, listings, batch_size)
+    _bulk(ListingImage.__table__, images, batch_size)
+
+    # ----------------------------
+    # Posts + tags
+    # ----------------------------
+    existing_tags = {slug: tid for tid, slug in db.session.query(Tag.id, Tag.slug)}
+    first_tag = _next_id(Tag)
+    tags = []
+    for word in sorted(set(WORDS)):
+        if word not in existing_tags:
+            existing_tags[word] = first_tag + len(tags)
+            tags.append({"id": existing_tags[word], "name": word, "slug": word})
+    _bulk(Tag.__table__, tags, batch_size)
+    tag_ids = list(existing_tags.values())
+
+    first_post = _next_id(Post)
+    posts, post_tag_rows = [], []
+    for offset in range(volumes["posts"]):
+        pid = first_post + offset
+        title = sentence(rng, 3, 8)
+        created = ago()
+        posts.append({
+            "id": pid,
+            "title": title,
+            "content": " ".join(sentence(rng, 8, 20) + "." for _ in range(rng.randint(1, 6))),
+            "slug": f"{slugify(title)[:200]}-{pid}-{token}",
+            "user_id": pick_user(),
+            "created_at": created,
+            "updated_at": created,
+            "is_deleted": rng.random() < 0.03,
+            "pinned": rng.random() < 0.01,
+            "view_count": 0,
+        })
+        for tag_id in rng.sample(tag_ids, k=min(len(tag_ids), rng.randint(0, 3))):
+            post_tag_rows.append({"post_id": pid, "tag_id": tag_id})
+    _bulk(Post.__table__, posts, batch_size)
+    _bulk(post_tags, post_tag_rows, batch_size)
+
+    # viral skew: a shuffled Zipf ranking, so the hottest posts are not simply the oldest
+    post_ids = [p["id"] for p in posts]
+    ranked_posts = post_ids[:]
+    rng.shuffle(ranked_posts)
+    post_weights = zipf_weights(len(ranked_posts), alpha=1.3)
+    post_created = {p["id"]: p["created_at"] for p in posts}
+
+    def pick_post():
+        return rng.choices(ranked_posts, cum_weights=post_weights)[0]
+
+    # ----------------------------
+    # Comment trees
+    # ----------------------------
+    first_comment = _next_id(Comment)
+    comments = []
+    comments_by_post = {}
+    for offset in range(volumes["comments"] if post_ids else 0):
+        cid = first_comment + offset
+        pid = pick_post()
+        siblings = comments_by_post.setdefault(pid, [])
+        parent_id = rng.choice(siblings) if siblings and rng.random() < 0.4 else None
+        created = post_created[pid] + timedelta(minutes=rng.randint(1, 60 * 24 * 14))
+        comments.append({
+            "id": cid,
+            "post_id": pid,
+            "user_id": pick_user(),
+            "parent_id": parent_id,
+            "content": sentence(rng, 3, 25),
+            "created_at": created,
+            "updated_at": created,
+            "is_deleted": rng.random() < 0.02,
+        })
+        siblings.append(cid)
+    _bulk(Comment.__table__, comments, batch_size)
+
+    # ----------------------------
+    # Upvotes (unique per post/user)
+    # ----------------------------
+    first_upvote = _next_id(PostUpvote)
+    seen = {(pid, uid) for pid, uid in db.session.query(PostUpvote.post_id, PostUpvote.user_id)}
+    upvotes = []
+    attempts = 0
+    while post_ids and len(upvotes) < volumes["upvotes"] and attempts < volumes["upvotes"] * 5:
+        attempts += 1
+        pair = (pick_post(), rng.choice(user_ids))
+        if pair in seen:
+            continue
+        seen.add(pair)
+        upvotes.append({
+            "id": first_upvote + len(upvotes),
+            "post_id": pair[0],
+            "user_id": pair[1],
+            "created_at": post_created[pair[0]] + timedelta(minutes=rng.randint(1, 60 * 24 * 7)),
+        })
+    _bulk(PostUpvote.__table__, upvotes, batch_size)
+
+    # ----------------------------
+    # Conversations + messages
+    # ----------------------------
+    first_conversation = _next_id(Conversation)
+    first_message = _next_id(Message)
+    conversations, participants, messages = [], [], []
+    for offset in range(volumes["conversations"] if len(user_ids) > 1 else 0):
+        conv_id = first_conversation + offset
+        is_group = rng.random() < 0.05
+        members = {pick_user()}
+        while len(members) < (rng.randint(3, 6) if is_group else 2):
+            members.add(rng.choice(user_ids))
+        conversations.append({"id": conv_id, "is_group": is_group, "created_at": ago()})
+        participants.extend({"conversation_id": conv_id, "user_id": uid} for uid in members)
+    conv_members = {}
+    for row in participants:
+        conv_members.setdefault(row["conversation_id"], []).append(row["user_id"])
+    conv_ids = list(conv_members)
+    conv_weights = zipf_weights(len(conv_ids), alpha=0.9)
+    conv_created = {c["id"]: c["created_at"] for c in conversations}
+    for offset in range(volumes["messages"] if conv_ids else 0):
+        conv_id = rng.choices(conv_ids, cum_weights=conv_weights)[0]
+        messages.append({
+            "id": first_message + offset,
+            "conversation_id": conv_id,
+            "sender_id": rng.choice(conv_members[conv_id]),
+            "content": sentence(rng, 2, 30),
+            "created_at": conv_created[conv_id] + timedelta(minutes=rng.randint(1, 60 * 24 * 30)),
+            "is_read": rng.random() < 0.8,
+        })
+    messages.sort(key=lambda m: (m["conversation_id"], m["created_at"]))
+    for offset, row in enumerate(messages):  # ids follow time order within a conversation
+        row["id"] = first_message + offset
+    # read cursors as the migration backfills them: up to the message before the first unread one from others
+    thread = {}
+    for row in messages:
+        thread.setdefault(row["conversation_id"], []).append(row)
+    for row in participants:
+        cursor = None
+        for message in thread.get(row["conversation_id"], ()):
+            if message["sender_id"] != row["user_id"] and not message["is_read"]:
+                break
+            cursor = message["id"]
+        row["last_read_message_id"] = cursor
+        row["last_read_at"] = None
+    _bulk(Conversation.__table__, conversations, batch_size)
+    _bulk(conversation_participants, participants, batch_size)
+    _bulk(Message.__table__, messages, batch_size)
+
+    # ----------------------------
+    # Notifications
+    # ----------------------------
+    first_notification = _next_id(Notification)
+    notification_types = list(NotificationTypeEnum)
+    notifications = [{
+        "id": first_notification + offset,
+        "user_id": pick_user(),
+        "message": sentence(rng, 4, 10),
+        "link": None,
+        "is_read": rng.random() < 0.6,
+        "type": rng.choice(notification_types),
+        "created_at": ago(60),
+    } for offset in range(volumes["notifications"])]
+    _bulk(Notification.__table__, notifications, batch_size)
+
+    # ----------------------------
+    # Recycler interests (own RNG stream, so the tables above stay as they were)
+    # ----------------------------
+    interest_rng = random.Random(seed + 1)
+    interests = []
+    for user in users:
+        if user["role"] != RoleEnum.recycler or not category_ids:
+            continue
+        for category_id in interest_rng.sample(category_ids, k=min(len(category_ids), interest_rng.randint(1, 3))):
+            interests.append({
+                "user_id": user["id"],
+                "category_id": category_id,
+                "region": user["region"] if interest_rng.random() < 0.7 else None,
+                "max_distance_km": interest_rng.choice([None, 25, 50, 100]),
+                "created_at": now,
+            })
+    _bulk(RecyclerInterest.__table__, interests, batch_size)
+
+    # ----------------------------
+    # Wishlists (own RNG stream too); popular listings are saved more often
+    # ----------------------------
+    wishlist_rng = random.Random(seed + 2)
+    listing_ids = [row["id"] for row in listings]
+    listing_weights = zipf_weights(len(listing_ids))
+    saved = set()
+    for _ in range(volumes.get("wishlist", 0) if listing_ids else 0):
+        saved.add((wishlist_rng.choices(user_ids, cum_weights=user_weights)[0],
+                   wishlist_rng.choices(listing_ids, cum_weights=listing_weights)[0]))
+    wishlist_rows = [
+        {"user_id": uid, "listing_id": lid, "created_at": now - timedelta(seconds=wishlist_rng.randint(0, days * 86400))}
+        for uid, lid in sorted(saved)
+    ]
+    _bulk(wishlist, wishlist_rows, batch_size)
+
+    db.session.commit()
+    # bulk inserts bypass the flush hooks and counters that maintain these
+    reconcile_tag_counts()
+    ranking.recount(batch_size)
+    ranking.redecay(batch_size)
+    matching.rematch(batch_size, send_notifications=False)
+    impact.rebuild_rollups()
+    return {
+        "users": len(users), "categories": len(categories), "listings": len(listings),
+        "listing_images": len(images), "posts": len(posts), "tags": len(tags),
+        "post_tags": len(post_tag_rows), "comments": len(comments), "upvotes": len(upvotes),
+        "conversations": len(conversations), "messages": len(messages),
+        "notifications": len(notifications), "recycler_interests": len(interests),
+        "wishlist": len(wishlist_rows),
+    }
+
+
+@click.command("seed")
+@click.option("--scale", default=1.0, show_default=True, help="Multiplier applied to every default volume.")
+@click.option("--seed", "random_seed", default=42, show_default=True, help="Random seed, for reproducible datasets.")
+@click.option("--create-tables", is_flag=True, help="Run db.create_all() first (scratch databases).")
+@click.option("--set", "overrides", multiple=True, metavar="TABLE=N", help="Override one volume, e.g. --set posts=50000.")
+@with_appcontext
+def seed_command(scale, random_seed, create_tables, overrides):
+    """Fill the database with skewed synthetic data."""
+    volumes = {name: int(count * scale) for name, count in DEFAULT_VOLUMES.items()}
+    for item in overrides:
+        name, _, count = item.partition("=")
+        if name not in volumes:
+            raise click.BadParameter(f"unknown table {name!r}", param_hint="--set")
+        volumes[name] = int(count)
+
+    if create_tables:
+        db.create_all()
+    counts = generate(volumes, seed=random_seed)
+    for table, count in counts.items():
+        click.echo(f"{table:>15}: {count}")
@@ -0,0 +1,62 @@
+# soft_delete.py
+"""Soft-deleted rows stay out of ORM queries unless a query asks for them.
+
+A ``do_orm_execute`` hook on ``db.session`` adds ``is_deleted = false``
+for every :class:`~backend.models.SoftDeleteMixin` model (users, posts,
+comments) to each ORM SELECT, so views no longer repeat
+``is_deleted=False``. The criteria cover aliases and carry over to the
+relationship loads of the rows returned (a post's comments, a comment's
+replies). The comparison is written exactly like the predicate of the
+partial indexes in ``models.py``, which is what lets SQLite and PostgreSQL
+use them.
+
+Opting out, for admin tools and checks that must see every row (an email
+held by a deleted account is still taken):
+
+    User.query.execution_options(include_deleted=True).filter_by(email=email)
+
+    with including_deleted():
+        ...  # every query on db.session in the block
+
+Not filtered: loads that refresh an object already in the session (so a
+post soft-deleted and committed can still be read), and Core statements on
+``Table`` objects, which keep their explicit conditions (``matching.py``,
+``ranking.py``).
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event, false
+from sqlalchemy.orm import with_loader_criteria
+
+from backend.extensions import db
+from backend.models import SoftDeleteMixin
+
+
+INCLUDE_DELETED = "include_deleted"  # execution option and db.session.info key
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def _hide_deleted(state):
+    if (
+        not state.is_select
+        or state.is_column_load
+        or state.is_relationship_load  # carry the criteria of the query that loaded the parent
+        or state.execution_options.get(INCLUDE_DELETED, False)
+        or state.session.info.get(INCLUDE_DELETED, False)
+    ):
+        return
+    state.statement = state.statement.options(
+        with_loader_criteria(SoftDeleteMixin, lambda cls: cls.is_deleted == false(), include_aliases=True)
+    )
+
+
+@contextmanager
+def including_deleted():
+    """Let every query on ``db.session`` inside the block see soft-deleted rows."""
+    info = db.session.info
+    previous = info.get(INCLUDE_DELETED, False)
+    info[INCLUDE_DELETED] = True
+    try:
+        yield
+    finally:
+        info[INCLUDE_DELETED] = previous
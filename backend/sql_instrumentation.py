@@ -0,0 +1,346 @@
+# sql_instrumentation.py
+"""Per-request SQL accounting and N+1 detection.
+
+Cursor events on every engine of ``db`` record, for the current request,
+the query count, total SQL time and how often each statement *shape* ran.
+A shape that repeats ``SQL_N_PLUS_ONE_THRESHOLD`` times in one request is
+reported as an N+1 together with the template line (or view line) that
+triggered it, e.g. ``community.html:46``.
+
+Results are exposed four ways:
+
+* ``X-SQL-Stats`` response header on sampled requests (``commit_ms`` is the
+  time spent in COMMIT, which is where SQLite lock waits show up), when
+  ``SQL_STATS_HEADER`` is enabled (the benchmarks do),
+* a log line per sampled request (warning level when an N+1 is found),
+* ``GET /_debug/sql`` with the most recent sampled requests, when
+  ``SQL_DEBUG_ENDPOINT`` is enabled,
+* with ``SQL_CAPTURE_FILE`` set, a :class:`QueryCapture` appends every shape
+  seen in sampled requests (calls, time, endpoints and one sample statement)
+  to that file, the input of ``flask index-advisor`` (``index_advisor.py``).
+
+Only sampled requests (``SQL_SAMPLE_RATE``) pay for the bookkeeping; the
+listeners return immediately for everything else, so the hooks can stay
+installed in production.
+"""
+import atexit
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+
+
+logger = logging.getLogger("backend.sql")
+
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\([^)]*\)s|%s|:\w+)\s*,?)+\)")
+_PARAM = re.compile(r"%\([^)]*\)s|%s|:\w+|\?")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=2048)
+def normalize_statement(statement):
+    """Reduce a statement to its shape: params, literals and IN lists collapsed."""
+    shape = _PARAM.sub("?", statement)
+    shape = _LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("(?)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+def find_origin():
+    """Return the template line, or failing that the app line, running the current query."""
+    frame = sys._getframe(2)
+    app_frame = None
+    while frame is not None:
+        template = frame.f_globals.get("__jinja_template__")
+        if template is not None:
+            return f"{template.name}:{template.get_corresponding_lineno(frame.f_lineno)}"
+        filename = frame.f_code.co_filename
+        if app_frame is None and filename.startswith(_BACKEND_DIR) and filename != __file__:
+            app_frame = f"{os.path.relpath(filename, os.path.dirname(_BACKEND_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return app_frame or "unknown"
+
+
+class RequestQueryStats:
+    """Query bookkeeping for one request."""
+
+    __slots__ = ("count", "total_time", "commit_time", "commit_started", "shapes", "n_plus_one", "threshold",
+                 "capture", "endpoint")
+
+    def __init__(self, threshold, capture=None, endpoint=None):
+        self.count = 0
+        self.total_time = 0.0
+        self.commit_time = 0.0
+        self.commit_started = None
+        self.shapes = {}
+        self.n_plus_one = []
+        self.threshold = threshold
+        self.capture = capture
+        self.endpoint = endpoint
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+
+        shape = normalize_statement(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, elapsed]
+            return
+        entry[0] += 1
+        entry[1] += elapsed
+        if entry[0] == self.threshold:
+            self.n_plus_one.append({"statement": shape, "origin": find_origin()})
+
+    def as_dict(self):
+        repeated = {shape: count for shape, (count, _) in self.shapes.items() if count > 1}
+        for item in self.n_plus_one:
+            item["count"] = self.shapes[item["statement"]][0]
+        return {
+            "queries": self.count,
+            "time_ms": round(self.total_time * 1000, 3),
+            "commit_ms": round(self.commit_time * 1000, 3),
+            "distinct_statements": len(self.shapes),
+            "repeated": repeated,
+            "n_plus_one": self.n_plus_one,
+        }
+
+
+def _jsonable(parameters):
+    """One parameter set as JSON values; datetimes keep the text form both backends parse."""
+    if isinstance(parameters, list):  # executemany: the first row stands for all
+        parameters = parameters[0] if parameters else ()
+
+    def value(v):
+        if v is None or isinstance(v, (bool, int, float, str)):
+            return v
+        if isinstance(v, (datetime, date)):
+            return str(v)
+        if isinstance(v, Decimal):
+            return float(v)
+        if isinstance(v, (bytes, memoryview)):
+            return None
+        return str(v)
+
+    if isinstance(parameters, dict):
+        return {k: value(v) for k, v in parameters.items()}
+    return [value(v) for v in parameters or ()]
+
+
+class QueryCapture:
+    """Statement shapes across sampled requests, appended to a JSON-lines file.
+
+    Each flush writes one line per shape seen since the previous flush and
+    starts over, so a file holds deltas: several flushes, processes and
+    hosts can share a file (or be concatenated) and ``index_advisor.load``
+    adds them up. Parameter values are only kept with ``keep_parameters``;
+    they are user data.
+    """
+
+    def __init__(self, path, flush_interval=60, max_shapes=1000, keep_parameters=False):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_shapes = max_shapes
+        self.keep_parameters = keep_parameters
+        self.shapes = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+
+    def record(self, statement, parameters, elapsed, dialect, endpoint):
+        shape = normalize_statement(statement)
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            entry = self.shapes.get(shape)
+            if entry is None:
+                if len(self.shapes) >= self.max_shapes:
+                    self.dropped += 1
+                    return
+                entry = self.shapes[shape] = {
+                    "shape": shape, "statement": statement, "dialect": dialect,
+                    "parameters": _jsonable(parameters) if self.keep_parameters else None,
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "endpoints": {},
+                }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            endpoint = endpoint or "-"
+            entry["endpoints"][endpoint] = entry["endpoints"].get(endpoint, 0) + 1
+
+    def maybe_flush(self):
+        if time.monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            shapes, self.shapes = self.shapes, {}
+            dropped, self.dropped = self.dropped, 0
+            self._flushed = time.monotonic()
+        if dropped:
+            logger.warning("SQL capture: %d statement(s) of new shapes dropped (SQL_CAPTURE_MAX_SHAPES)", dropped)
+        if not shapes:
+            return 0
+        lines = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in shapes.values())
+        # one append per flush: O_APPEND keeps the lines of concurrent workers apart
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        return len(shapes)
+
+
+def current_stats():
+    """The stats object of the current request, or None when it is not sampled."""
+    if not has_request_context():
+        return None
+    return g.get("_sql_stats")
+
+
+class SQLInstrumentation:
+    """Flask extension installing the cursor listeners and request hooks."""
+
+    def __init__(self, app=None, db=None):
+        self.history = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._engines = set()
+        self.capture = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault("SQL_INSTRUMENTATION_ENABLED", True)
+        app.config.setdefault("SQL_SAMPLE_RATE", 1.0 if app.debug else 0.0)
+        app.config.setdefault("SQL_N_PLUS_ONE_THRESHOLD", 5)
+        app.config.setdefault("SQL_STATS_HEADER", app.debug)  # query counts and timings are for developers, not clients
+        app.config.setdefault("SQL_DEBUG_ENDPOINT", app.debug)
+        app.config.setdefault("SQL_HISTORY_SIZE", 100)
+        app.config.setdefault("SQL_CAPTURE_FILE", None)
+        app.config.setdefault("SQL_CAPTURE_FLUSH_INTERVAL", 60)
+        app.config.setdefault("SQL_CAPTURE_MAX_SHAPES", 1000)
+        app.config.setdefault("SQL_CAPTURE_PARAMETERS", False)
+
+        app.extensions["sql_instrumentation"] = self
+        if not app.config["SQL_INSTRUMENTATION_ENABLED"]:
+            return
+
+        self.history = deque(maxlen=app.config["SQL_HISTORY_SIZE"])
+        if app.config["SQL_CAPTURE_FILE"]:
+            self.capture = QueryCapture(
+                app.config["SQL_CAPTURE_FILE"],
+                flush_interval=app.config["SQL_CAPTURE_FLUSH_INTERVAL"],
+                max_shapes=app.config["SQL_CAPTURE_MAX_SHAPES"],
+                keep_parameters=app.config["SQL_CAPTURE_PARAMETERS"],
+            )
+            atexit.register(self.capture.flush)
+
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument_engine(engine)
+        if not event.contains(db.session, "after_commit", _after_commit):
+            event.listen(db.session, "after_commit", _after_commit)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        if app.config["SQL_DEBUG_ENDPOINT"]:
+            app.add_url_rule("/_debug/sql", "sql_debug", self._debug_view)
+
+    # ----------------------------
+    # Engine listeners
+    # ----------------------------
+    def instrument_engine(self, engine):
+        if engine in self._engines:
+            return
+        self._engines.add(engine)
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "commit", _before_commit)
+
+    # ----------------------------
+    # Request hooks
+    # ----------------------------
+    def _before_request(self):
+        from flask import current_app
+
+        rate = current_app.config["SQL_SAMPLE_RATE"]
+        if rate >= 1.0 or (rate > 0 and random.random() < rate):
+            g._sql_stats = RequestQueryStats(current_app.config["SQL_N_PLUS_ONE_THRESHOLD"],
+                                             capture=self.capture, endpoint=request.endpoint)
+
+    def _after_request(self, response):
+        from flask import current_app
+
+        stats = g.pop("_sql_stats", None)
+        if stats is None:
+            return response
+
+        summary = stats.as_dict()
+        summary.update(method=request.method, path=request.path, endpoint=request.endpoint, status=response.status_code)
+        with self._lock:
+            self.history.append(summary)
+        if self.capture is not None:
+            self.capture.maybe_flush()
+
+        if current_app.config["SQL_STATS_HEADER"]:
+            response.headers["X-SQL-Stats"] = (
+                f"queries={summary['queries']}; time_ms={summary['time_ms']}; "
+                f"n_plus_one={len(summary['n_plus_one'])}; commit_ms={summary['commit_ms']}"
+            )
+
+        if summary["n_plus_one"]:
+            logger.warning(
+                "%s %s: %d queries in %.1fms, N+1 at %s",
+                request.method, request.path, summary["queries"], summary["time_ms"],
+                ", ".join(f"{i['origin']} (x{i['count']})" for i in summary["n_plus_one"]),
+            )
+        else:
+            logger.info("%s %s: %d queries in %.1fms", request.method, request.path, summary["queries"], summary["time_ms"])
+        return response
+
+    def _debug_view(self):
+        with self._lock:
+            recent = list(self.history)
+        return jsonify({"requests": recent[::-1]})
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        conn.info.setdefault("_sql_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    if stats is None:
+        return
+    started = conn.info.get("_sql_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats.record(statement, elapsed)
+    if stats.capture is not None:
+        stats.capture.record(statement, parameters, elapsed, conn.dialect.name, stats.endpoint)
+
+
+def _before_commit(conn):
+    stats = current_stats()
+    if stats is not None:
+        stats.commit_started = time.perf_counter()
+
+
+def _after_commit(session):
+    stats = current_stats()
+    if stats is not None and stats.commit_started is not None:
+        stats.commit_time += time.perf_counter() - stats.commit_started
+        stats.commit_started = None
@@ -0,0 +1,134 @@
+# startup.py
+"""Worker boot: what a gunicorn worker pays before its first response.
+
+* :class:`LazyMigrate` stands in for Flask-Migrate, whose import pulls in
+  Alembic (about a fifth of ``create_app``). Only ``flask db`` needs it;
+  the real extension is built when that command group is first used.
+* :func:`init_templates` gives Jinja an on-disk bytecode cache
+  (``JINJA_BYTECODE_CACHE_DIR``). A template is parsed and compiled once
+  per deploy instead of once per worker, and restarted or newly scaled
+  workers load the compiled code.
+* :func:`warm_up` (``STARTUP_WARM_UP``) does at boot what the first
+  requests would otherwise do: import the libraries they need, configure
+  the ORM mappers and compile every template. With ``preload_app`` (``gunicorn.conf.py``) it runs once in the
+  master and the workers fork with the result.
+
+Heavy optional libraries (numpy, Pillow, python-slugify) are imported by
+the functions that use them. ``python -m backend.benchmarks.startup``
+measures import time, ``create_app`` and time to first byte.
+"""
+import logging
+import os
+import stat
+import time
+
+import click
+
+
+log = logging.getLogger(__name__)
+
+# imported by the first requests rather than at boot (numpy: presence store, geo); warm_up loads them
+WARM_UP_IMPORTS = ("numpy",)
+
+
+# ----------------------------
+# Flask-Migrate, imported on demand
+# ----------------------------
+class _LazyGroup(click.Group):
+    """A click group that loads the real one when it is invoked or listed."""
+
+    def __init__(self, load, **kwargs):
+        super().__init__(**kwargs)
+        self._load = load
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        # the real group parses its own options and runs its own callback
+        return self._load().make_context(info_name, args, parent=parent, **extra)
+
+    def invoke(self, ctx):
+        return ctx.command.invoke(ctx)
+
+    def get_command(self, ctx, name):
+        return self._load().get_command(ctx, name)
+
+    def list_commands(self, ctx):
+        return self._load().list_commands(ctx)
+
+
+class LazyMigrate:
+    """``flask_migrate.Migrate`` without importing Alembic until ``flask db`` runs."""
+
+    def __init__(self, directory="migrations", command="db", **kwargs):
+        self.directory = directory
+        self.command = command
+        self.kwargs = kwargs
+
+    def init_app(self, app, db, directory=None, **kwargs):
+        options = {**self.kwargs, **kwargs}
+        directory = directory or self.directory
+
+        def load():
+            # the real init_app sets app.extensions["migrate"] and replaces this group
+            from flask_migrate import Migrate
+            from flask_migrate.cli import db as db_group
+
+            if "migrate" not in app.extensions:
+                Migrate(app, db, directory, command=self.command, **options)
+            return db_group
+
+        app.cli.add_command(_LazyGroup(load, name=self.command, help="Perform database migrations."))
+
+
+# ----------------------------
+# Templates
+# ----------------------------
+def _private_dir(directory):
+    """True if ``directory`` (created if missing) is ours and writable by no one else."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    return stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+
+def init_templates(app):
+    """Install the on-disk Jinja bytecode cache unless ``JINJA_BYTECODE_CACHE_DIR`` is empty.
+
+    The cache files are loaded as code, so the directory must be ours alone:
+    unset uses Jinja's per-user temp directory (which checks its owner and
+    mode), and a configured one that another user could write to is refused.
+    """
+    from jinja2 import FileSystemBytecodeCache
+
+    directory = app.config.setdefault("JINJA_BYTECODE_CACHE_DIR", None)
+    if directory == "":
+        return
+    try:
+        if directory is not None and not _private_dir(directory):
+            raise RuntimeError(f"{directory} is not a directory owned by this user with mode 0700")
+        # keyed by template name and source checksum, written atomically: safe to share between workers
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    except (OSError, RuntimeError) as exc:
+        log.warning("Jinja bytecode cache disabled: %s", exc)
+
+
+def precompile_templates(app):
+    """Load every HTML template into the Jinja environment; returns how many."""
+    names = [name for name in app.jinja_env.list_templates() if name.endswith(".html")]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def warm_up(app):
+    """Import, configure the mappers and compile the templates now, not on the first requests."""
+    import importlib
+
+    from sqlalchemy.orm import configure_mappers
+
+    started = time.perf_counter()
+    for module in WARM_UP_IMPORTS:
+        importlib.import_module(module)
+    configure_mappers()
+    templates = precompile_templates(app)
+    log.info("warm-up: mappers configured, %d templates compiled in %.0f ms",
+             templates, (time.perf_counter() - started) * 1000)
+    return templates
@@ -0,0 +1,156 @@
+# tags.py
+"""Post tags: parsing, the denormalised ``Tag.post_count`` and its reconcile.
+
+``Tag.post_count`` is the number of live (not soft-deleted) posts carrying
+the tag. It is kept current by an ``after_flush`` hook that looks at the
+flushed posts' ``tags`` and ``is_deleted`` history and issues one
+``post_count = post_count + delta`` UPDATE per affected tag, in the same
+transaction as the change itself.
+
+Writes that bypass the ORM unit of work (bulk inserts in ``seed.py``, raw
+SQL, manual fixes) are not seen by the hook; ``flask reconcile-tags``
+recomputes the counts from ``post_tags`` and fixes any drift.
+"""
+from collections import Counter
+import re
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, event, func, inspect, select, update
+
+from backend.extensions import db, job_queue
+from backend.models import Post, Tag, post_tags, slugify
+
+
+MAX_TAGS_PER_POST = 5
+
+
+# ----------------------------
+# Parsing
+# ----------------------------
+def parse_tags(text):
+    """``"Plastic, e-waste,plastic"`` -> ``["Plastic", "e-waste"]`` (deduplicated by slug, capped)."""
+    names, seen = [], set()
+    for name in re.split(r"[,#]", text or ""):
+        name = " ".join(name.split())[:80]
+        slug = slugify(name)
+        if slug and slug not in seen:
+            seen.add(slug)
+            names.append(name)
+    return names[:MAX_TAGS_PER_POST]
+
+
+def tags_for(names):
+    """Existing ``Tag`` rows for ``names``, creating the missing ones (one SELECT)."""
+    by_slug = {slugify(name): name for name in names}
+    if not by_slug:
+        return []
+    existing = {tag.slug: tag for tag in Tag.query.filter(Tag.slug.in_(by_slug))}
+    tags = []
+    for slug, name in by_slug.items():
+        tag = existing.get(slug)
+        if tag is None:
+            tag = Tag(name=name, slug=slug)
+            db.session.add(tag)
+        tags.append(tag)
+    return tags
+
+
+# ----------------------------
+# post_count maintenance
+# ----------------------------
+def _was_and_is_live(state):
+    history = state.attrs.is_deleted.history
+    now = bool(state.attrs.is_deleted.value)
+    before = bool(history.deleted[0]) if history.deleted else now
+    return not before, not now
+
+
+def _tag_deltas(session):
+    deltas = Counter()
+
+    def count(tag_ids, delta):
+        for tag_id in tag_ids:
+            deltas[tag_id] += delta
+
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, Post):
+            continue
+        state = inspect(obj)
+        history = state.attrs.tags.history
+        added = {tag.id for tag in history.added}
+        removed = {tag.id for tag in history.deleted}
+        was_live, is_live = _was_and_is_live(state)
+
+        if obj in session.new:
+            count(added, +1 if is_live else 0)
+        elif obj in session.deleted:
+            # deleting a post loads its tags to remove the post_tags rows
+            count({tag.id for tag in history.unchanged} | removed, -1 if was_live else 0)
+        elif was_live == is_live:
+            if is_live:
+                count(added, +1)
+                count(removed, -1)
+        else:
+            # soft delete / restore: the post's tags after this flush, read from post_tags
+            current = set(session.connection().scalars(
+                select(post_tags.c.tag_id).where(post_tags.c.post_id == obj.id)
+            ))
+            count((current - added) | removed if was_live else (), -1)
+            count(current if is_live else (), +1)
+    return {tag_id: delta for tag_id, delta in deltas.items() if delta and tag_id is not None}
+
+
+@event.listens_for(db.session, "after_flush")
+def _update_post_counts(session, flush_context):
+    deltas = _tag_deltas(session)
+    if not deltas:
+        return
+    statement = (
+        update(Tag.__table__)
+        .where(Tag.__table__.c.id == bindparam("tag_id"))
+        .values(post_count=Tag.__table__.c.post_count + bindparam("delta"))
+    )
+    session.connection().execute(statement, [{"tag_id": k, "delta": v} for k, v in sorted(deltas.items())])
+    for tag_id in deltas:  # loaded Tag objects now hold a stale count
+        tag = session.identity_map.get(inspect(Tag).identity_key_from_primary_key((tag_id,)))
+        if tag is not None:
+            session.expire(tag, ["post_count"])
+
+
+def reconcile_tag_counts():
+    """Recompute ``Tag.post_count`` from ``post_tags``; return {tag_id: (stored, actual)} for drifted tags."""
+    actual = dict(
+        db.session.query(post_tags.c.tag_id, func.count())
+        .join(Post, Post.id == post_tags.c.post_id)
+        .filter(Post.is_deleted.isnot(True))  # NULL counts as live, as in the flush hook
+        .group_by(post_tags.c.tag_id)
+    )
+    drift = {
+        tag_id: (stored, actual.get(tag_id, 0))
+        for tag_id, stored in db.session.query(Tag.id, Tag.post_count)
+        if stored != actual.get(tag_id, 0)
+    }
+    if drift:
+        db.session.execute(
+            update(Tag.__table__)
+            .where(Tag.__table__.c.id == bindparam("tag_id"))
+            .values(post_count=bindparam("count")),
+            [{"tag_id": tag_id, "count": count} for tag_id, (_, count) in drift.items()],
+        )
+    db.session.commit()
+    return drift
+
+
+# scheduled hourly by `flask worker` (backend.jobs)
+job_queue.task("reconcile-tags", every=3600)(reconcile_tag_counts)
+
+
+@click.command("reconcile-tags")
+@with_appcontext
+def reconcile_tags_command():
+    """Fix drift in Tag.post_count (safe to run from cron)."""
+    drift = reconcile_tag_counts()
+    for tag_id, (stored, count) in sorted(drift.items()):
+        click.echo(f"tag {tag_id}: {stored} -> {count}")
+    click.echo(f"{len(drift)} tag count(s) corrected")
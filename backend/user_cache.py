@@ -0,0 +1,117 @@
+# user_cache.py
+"""Short-lived per-worker cache for the Flask-Login principal.
+
+``load_user`` runs on every authenticated request. Instead of a query per
+request, the user's *column values* are cached for ``USER_CACHE_TTL``
+seconds and turned back into a persistent ``User`` with
+``session.merge(..., load=False)``, which issues no SQL. Relationships are
+not part of the snapshot; they lazy-load only when a view touches them.
+
+Invalidation:
+
+* any ORM update/delete of a user drops the entry in this worker,
+* :meth:`UserCache.invalidate` also stamps the user's session cookie, so
+  the user's next request misses the cache on *every* worker (they always
+  see their own profile change); other viewers catch up within the TTL.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+from flask import has_request_context, session as cookie_session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+COOKIE_KEY = "_user_v"
+
+
+class UserCache:
+    """Flask extension caching ``User`` column snapshots by id."""
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        self.ttl = 30
+        self.max_entries = 10000
+        self._entries = OrderedDict()  # user_id -> (cached_at, values)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        from backend.models import User
+
+        self.db = db
+        self.ttl = app.config.setdefault("USER_CACHE_TTL", 30)
+        self.max_entries = app.config.setdefault("USER_CACHE_MAX_ENTRIES", 10000)
+        app.extensions["user_cache"] = self
+
+        if not event.contains(User, "after_update", self._on_change):
+            event.listen(User, "after_update", self._on_change)
+            event.listen(User, "after_delete", self._on_change)
+
+    # ----------------------------
+    # Loading
+    # ----------------------------
+    def load(self, user_id):
+        """Return the ``User`` for ``user_id`` attached to ``db.session``, or None."""
+        from backend.models import User
+
+        values = self._get(user_id) if self.ttl else None
+        if values is not None:
+            self.hits += 1
+            user = User.__mapper__.class_manager.new_instance()
+            for key, value in values.items():
+                set_committed_value(user, key, value)
+            make_transient_to_detached(user)
+            return self.db.session.merge(user, load=False)
+
+        self.misses += 1
+        user = self.db.session.get(User, user_id)
+        if user is not None and self.ttl:
+            self._put(user)
+        return user
+
+    def _get(self, user_id):
+        not_before = cookie_session.get(COOKIE_KEY, 0) if has_request_context() else 0
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            cached_at, values = entry
+            if cached_at + self.ttl < now or cached_at < not_before:
+                del self._entries[user_id]
+                return None
+            return values
+
+    def _put(self, user):
+        state = inspect(user)
+        values = {attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict}
+        with self._lock:
+            self._entries[user.id] = (time.time(), values)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # ----------------------------
+    # Invalidation
+    # ----------------------------
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def invalidate(self, user):
+        """Drop ``user`` here and make the owner's next request reload it on any worker."""
+        self.discard(user.id)
+        if has_request_context():
+            cookie_session[COOKIE_KEY] = time.time()
+
+    def _on_change(self, mapper, connection, target):
+        self.discard(target.id)
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
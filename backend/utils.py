@@ -1,6 +1,6 @@
 # utils.py
-from models import Notification, NotificationTypeEnum
-from extensions import db, socketio
+from backend.models import Notification, NotificationTypeEnum
+from backend.extensions import db, socketio
 
 def create_notification(user_id, message, link=None, notif_type="info", icon=None):
     """Create a notification and send a real-time update via Socket.IO."""
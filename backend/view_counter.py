@@ -0,0 +1,168 @@
+# view_counter.py
+"""Buffered view/contact counters for posts and listings.
+
+A page view does not write to the database. :meth:`ViewCounter.record`
+adds one to an in-memory tally in this worker; a background thread flushes
+the tallies every ``VIEW_COUNTER_FLUSH_INTERVAL`` seconds as one batched
+``UPDATE ... SET col = col + :n`` per counter column (rows in id order, so
+concurrent flushes from other workers cannot deadlock). A hot post viewed a
+thousand times between flushes costs one UPDATE instead of a thousand
+contended ones.
+
+* Repeat views of the same object by the same visitor (a random id kept
+  in the session cookie) within ``VIEW_COUNTER_DEDUPE_SECONDS`` count
+  once. Dedupe state is per worker, so a repeat view that lands on
+  another worker may still count.
+* Pending tallies are flushed at interpreter exit (gunicorn workers exit
+  normally on graceful shutdown/restart), so a crash loses at most one
+  flush interval. A failed flush puts its tallies back.
+* The counters never touch ``updated_at``: a view is not an edit, and the
+  feed's fragment cache keys on ``updated_at``.
+"""
+from collections import Counter, OrderedDict
+import atexit
+import logging
+import os
+import secrets
+import threading
+import time
+
+from flask import has_request_context, session as cookie_session
+from sqlalchemy import bindparam, func, update
+
+
+log = logging.getLogger(__name__)
+
+VISITOR_COOKIE_KEY = "_vid"
+
+
+class ViewCounter:
+    """Flask extension buffering counter increments and flushing them in batches."""
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.db = db
+        self.counters = {}
+        self.flush_interval = 10
+        self.dedupe_seconds = 1800
+        self._pending = Counter()  # (counter name, object id) -> increment
+        self._seen = OrderedDict()  # (counter name, object id, visitor) -> expires at
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread_pid = None
+        self._atexit = False
+        self.flushed_rows = 0
+        self.flushes = 0
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        from backend.models import Listing, Post
+
+        self.app = app
+        self.db = db
+        app.config.setdefault("VIEW_COUNTER_ENABLED", True)
+        self.flush_interval = app.config.setdefault("VIEW_COUNTER_FLUSH_INTERVAL", 10)
+        self.dedupe_seconds = app.config.setdefault("VIEW_COUNTER_DEDUPE_SECONDS", 1800)
+        self.max_seen = app.config.setdefault("VIEW_COUNTER_MAX_SEEN", 100000)
+        self.counters = {
+            "post_views": Post.__table__.c.view_count,
+            "listing_views": Listing.__table__.c.views,
+            "listing_contacts": Listing.__table__.c.contact_count,
+        }
+        app.extensions["view_counter"] = self
+        if not self._atexit:
+            atexit.register(self.flush)
+            self._atexit = True
+
+    # ----------------------------
+    # Recording
+    # ----------------------------
+    def record(self, counter, object_id):
+        """Count one ``counter`` event for ``object_id``; returns False for a deduplicated repeat."""
+        if not self.app.config["VIEW_COUNTER_ENABLED"]:
+            return False
+        now = time.time()
+        visitor = self._visitor()
+        with self._lock:
+            if visitor is not None and self.dedupe_seconds:
+                key = (counter, object_id, visitor)
+                if self._seen.get(key, 0) > now:
+                    return False
+                self._seen[key] = now + self.dedupe_seconds
+                self._seen.move_to_end(key)
+                while len(self._seen) > self.max_seen:
+                    self._seen.popitem(last=False)
+            self._pending[counter, object_id] += 1
+        self._ensure_flusher()
+        return True
+
+    @staticmethod
+    def _visitor():
+        if not has_request_context():
+            return None
+        visitor = cookie_session.get(VISITOR_COOKIE_KEY)
+        if visitor is None:
+            visitor = cookie_session[VISITOR_COOKIE_KEY] = secrets.token_hex(8)
+        return visitor
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    # ----------------------------
+    # Flushing
+    # ----------------------------
+    def _ensure_flusher(self):
+        # one thread per worker process; a forked worker starts its own
+        if self._thread_pid == os.getpid() or not self.flush_interval:
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._run, name="view-counter-flush", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                log.exception("view counter flush failed")
+
+    def flush(self):
+        """Write all pending increments now; returns the number of rows updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+            if not pending:
+                return 0
+
+            by_counter = {}
+            for (counter, object_id), count in pending.items():
+                by_counter.setdefault(counter, []).append({"object_id": object_id, "delta": count})
+            try:
+                with self.app.app_context(), self.db.engine.begin() as connection:
+                    for counter, rows in sorted(by_counter.items()):
+                        column = self.counters[counter]
+                        table = column.table
+                        statement = (
+                            update(table)
+                            .where(table.c.id == bindparam("object_id"))
+                            .values({column: func.coalesce(column, 0) + bindparam("delta"),
+                                     table.c.updated_at: table.c.updated_at})
+                        )
+                        connection.execute(statement, sorted(rows, key=lambda row: row["object_id"]))
+            except Exception:
+                with self._lock:
+                    self._pending.update(pending)  # retried on the next flush
+                raise
+            self.flushes += 1
+            self.flushed_rows += len(pending)
+            return len(pending)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), "seen": len(self._seen),
+                    "flushes": self.flushes, "flushed_rows": self.flushed_rows}
@@ -0,0 +1,233 @@
+# wishlist.py
+"""Wishlists and the price-drop / availability alerts sent to them.
+
+A price drop or a change of ``is_active`` on a listing is recorded as one
+``ListingAlert`` row by an ``after_flush`` hook, in the transaction that
+made the change. Nothing else happens on the request path, however many
+users saved the listing.
+
+:func:`send_alerts` (run every minute by ``flask worker``, or ``flask
+wishlist-alerts`` from cron) takes the
+pending alerts ``batch_size`` at a time and finds every affected
+(user, listing) with one join of those alerts against ``wishlist``. Alerts
+for the same listing are netted against its current state (100 -> 90 -> 80
+is one drop to 80; sold and relisted is no news), each user gets one
+notification per batch ("3 saved listings changed: 2 price drops, 1 back
+in stock") written with a single bulk INSERT, and the alerts are marked
+processed in the same transaction.
+
+Changes made with Core statements (bulk imports, raw SQL) bypass the hook
+and raise no alerts.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, event, exists, inspect, or_, select, update
+
+from backend.extensions import db, job_queue
+from backend.models import (
+    Listing, ListingAlert, ListingAlertKindEnum, Notification, NotificationTypeEnum, wishlist,
+)
+
+
+ALERT_BATCH = 1000
+ALERT_RETENTION_DAYS = 7  # processed alerts are deleted after this
+
+_alerts = ListingAlert.__table__
+_listings = Listing.__table__
+
+
+# ----------------------------
+# Wishlist rows
+# ----------------------------
+def is_saved(user_id, listing_id):
+    return db.session.scalar(select(exists().where(
+        wishlist.c.user_id == user_id, wishlist.c.listing_id == listing_id
+    )))
+
+
+def saved_column(user_id):
+    """An ``EXISTS`` column for Listing queries: has ``user_id`` saved this listing?"""
+    return exists().where(wishlist.c.user_id == user_id, wishlist.c.listing_id == Listing.id).label("saved")
+
+
+def add(user_id, listing_id):
+    """Save ``listing_id`` for ``user_id``; return False if it was already saved."""
+    if is_saved(user_id, listing_id):
+        return False
+    db.session.execute(wishlist.insert().values(user_id=user_id, listing_id=listing_id))
+    db.session.commit()
+    return True
+
+
+def remove(user_id, listing_id):
+    """Unsave ``listing_id``; return False if it was not saved."""
+    result = db.session.execute(
+        delete(wishlist).where(wishlist.c.user_id == user_id, wishlist.c.listing_id == listing_id)
+    )
+    db.session.commit()
+    return result.rowcount > 0
+
+
+# ----------------------------
+# Recording changes
+# ----------------------------
+def _changed(state, name):
+    history = state.attrs[name].history
+    if history.deleted and history.added:
+        return history.deleted[0], history.added[0]
+    return None
+
+
+def _alerts_for(listing):
+    state = inspect(listing)
+    alerts = []
+    price = _changed(state, "price")
+    if price and price[0] is not None and price[1] is not None and price[1] < price[0]:
+        alerts.append({"listing_id": listing.id, "kind": ListingAlertKindEnum.price_drop,
+                       "old_price": price[0], "new_price": price[1]})
+    active = _changed(state, "is_active")
+    if active and bool(active[0]) != bool(active[1]):
+        kind = ListingAlertKindEnum.available if active[1] else ListingAlertKindEnum.unavailable
+        alerts.append({"listing_id": listing.id, "kind": kind, "old_price": None, "new_price": None})
+    return alerts
+
+
+@event.listens_for(db.session, "after_flush")
+def _record_alerts(session, flush_context):
+    alerts = [
+        alert
+        for obj in session.dirty if isinstance(obj, Listing)
+        for alert in _alerts_for(obj)
+    ]
+    if alerts:
+        session.connection().execute(_alerts.insert(), alerts)
+
+
+# ----------------------------
+# Sending alerts
+# ----------------------------
+def _net(changes, price, is_active):
+    """(old price, new price, availability kind or None) for one listing's alerts, oldest first.
+
+    Compared with the listing as it is now, so a drop that was undone by a
+    later (unalerted) increase, or a sale followed by a relist, is no news.
+    """
+    old_price, availability = None, None
+    for kind, old, _ in changes:
+        if kind == ListingAlertKindEnum.price_drop:
+            old_price = old if old_price is None else old_price
+        elif availability is None:
+            availability = kind  # the first flip tells what the state was before the batch
+    if old_price is not None and (price is None or price >= old_price):
+        old_price = None
+    if availability is not None and (availability == ListingAlertKindEnum.available) != bool(is_active):
+        availability = None
+    return old_price, (price if old_price is not None else None), availability
+
+
+def _describe(listing, old_price, new_price, availability):
+    title = f"'{listing.title[:80]}'"
+    if availability == ListingAlertKindEnum.unavailable:
+        return f"{title} is no longer available"
+    if availability == ListingAlertKindEnum.available and old_price is None:
+        return f"{title} is available again"
+    price = f"{title} dropped from {old_price:,.0f} to {new_price:,.0f} {listing.currency or ''}".rstrip()
+    return price + (" and is available again" if availability else "")
+
+
+def _summary(changes):
+    drops = sum(1 for old, _, availability in changes
+                if old is not None and availability != ListingAlertKindEnum.unavailable)
+    back = sum(1 for _, _, availability in changes if availability == ListingAlertKindEnum.available)
+    gone = sum(1 for _, _, availability in changes if availability == ListingAlertKindEnum.unavailable)
+    parts = []
+    if drops:
+        parts.append(f"{drops} price drop{'s' if drops > 1 else ''}")
+    if back:
+        parts.append(f"{back} back in stock")
+    if gone:
+        parts.append(f"{gone} no longer available")
+    return f"{len(changes)} saved listings changed: " + ", ".join(parts)
+
+
+def _path(endpoint, **values):
+    # url_for needs a request (or SERVER_NAME); the CLI job has neither
+    return current_app.url_map.bind("").build(endpoint, values)
+
+
+def send_alerts(batch_size=ALERT_BATCH, now=None):
+    """Turn pending alerts into wishlist notifications; return (alerts processed, notifications sent)."""
+    now = now or datetime.utcnow()
+    processed, sent = 0, 0
+    while True:
+        alert_ids = db.session.scalars(
+            select(_alerts.c.id).where(_alerts.c.processed_at.is_(None)).order_by(_alerts.c.id).limit(batch_size)
+        ).all()
+        if not alert_ids:
+            break
+
+        # every (wishlist entry, alert) pair of the batch in one set-based join
+        rows = db.session.execute(
+            select(wishlist.c.user_id, _alerts.c.listing_id, _alerts.c.kind, _alerts.c.old_price,
+                   _alerts.c.new_price, _listings.c.title, _listings.c.slug, _listings.c.currency,
+                   _listings.c.price, _listings.c.is_active)
+            .join(wishlist, wishlist.c.listing_id == _alerts.c.listing_id)
+            .join(_listings, _listings.c.id == _alerts.c.listing_id)
+            .where(
+                _alerts.c.id.in_(alert_ids),
+                _listings.c.owner_id != wishlist.c.user_id,
+                or_(wishlist.c.created_at.is_(None), wishlist.c.created_at <= _alerts.c.created_at),
+            )
+            .order_by(wishlist.c.user_id, _alerts.c.listing_id, _alerts.c.id)
+        ).all()
+
+        by_user = defaultdict(dict)  # user_id -> {listing_id: (listing row, [changes])}
+        for row in rows:
+            entry = by_user[row.user_id].setdefault(row.listing_id, (row, []))
+            entry[1].append((row.kind, row.old_price, row.new_price))
+
+        notifications = []
+        for user_id, listings in by_user.items():
+            changes = [(row, _net(found, row.price, row.is_active)) for row, found in listings.values()]
+            changes = [(row, net) for row, net in changes if net != (None, None, None)]
+            if not changes:
+                continue
+            if len(changes) == 1:
+                row, net = changes[0]
+                message = _describe(row, *net)
+                link = _path("marketplace.view_listing", slug=row.slug)
+            else:
+                message = _summary([net for _, net in changes])
+                link = _path("marketplace.view_wishlist")
+            notifications.append({"user_id": user_id, "message": message[:255], "link": link,
+                                  "type": NotificationTypeEnum.info})
+        if notifications:
+            db.session.execute(Notification.__table__.insert(), notifications)
+        db.session.execute(update(_alerts).where(_alerts.c.id.in_(alert_ids)).values(processed_at=now))
+        db.session.commit()
+        processed += len(alert_ids)
+        sent += len(notifications)
+
+    db.session.execute(delete(_alerts).where(and_(
+        _alerts.c.processed_at.isnot(None),
+        _alerts.c.processed_at < now - timedelta(days=ALERT_RETENTION_DAYS),
+    )))
+    db.session.commit()
+    return processed, sent
+
+
+# scheduled every minute by `flask worker` (backend.jobs)
+job_queue.task("wishlist-alerts", every=60)(send_alerts)
+
+
+@click.command("wishlist-alerts")
+@click.option("--batch-size", default=ALERT_BATCH, show_default=True)
+@with_appcontext
+def wishlist_alerts_command(batch_size):
+    """Send pending price-drop / availability alerts to wishlists (run from cron)."""
+    processed, sent = send_alerts(batch_size)
+    click.echo(f"{processed} alert(s) processed, {sent} notification(s) sent")
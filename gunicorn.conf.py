@@ -0,0 +1,38 @@
+# gunicorn.conf.py
+"""Gunicorn settings for ``gunicorn main:app``, read from the working directory.
+
+Every setting can be overridden from the environment (below) or on the
+command line. The default matches the Socket.IO setup in ``backend/config.py``:
+one eventlet worker. With several workers of another class (for example
+``GUNICORN_WORKER_CLASS=gthread WEB_CONCURRENCY=4`` and
+``SOCKETIO_ASYNC_MODE=threading``), the app is preloaded: the master imports
+and warms it (``STARTUP_WARM_UP``, see ``backend/startup.py``) once, and
+every worker forks with the modules, mappers and compiled templates already
+in memory.
+"""
+import os
+
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "eventlet")
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+
+# eventlet has to monkey-patch a worker before the app's modules are imported, so it does not preload
+preload_app = os.getenv("GUNICORN_PRELOAD", "0" if worker_class == "eventlet" else "1") == "1"
+if preload_app:
+    os.environ.setdefault("STARTUP_WARM_UP", "1")  # read by backend.config when the master imports the app
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    # a pool the master may have opened must not be shared by the workers
+    from backend.extensions import db
+
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
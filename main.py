@@ -1,7 +1,8 @@
 # main.py in root
 from backend.app import create_app
+from backend.extensions import socketio
 
 app = create_app()
 
 if __name__ == "__main__":
-    app.run()
+    socketio.run(app)  # the dev server, with WebSocket support
@@ -0,0 +1,66 @@
+"""Queries per request stay within ``QUERY_BUDGETS`` (``backend/benchmarks/routes.py``).
+
+Seeds a small SQLite database, drives every budgeted route through the test
+client with the fragment cache off and reads the query count from the
+``X-SQL-Stats`` header, as ``python -m backend.benchmarks.routes
+--check-budgets`` does. The budgets do not depend on the seed volume.
+"""
+import pytest
+from flask import url_for
+
+from backend.benchmarks.routes import (
+    QUERY_BUDGETS, build_app, discover_routes, login, measure, power_user, sample_values,
+)
+
+
+SCALE = 0.05
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    from backend.extensions import db
+    from backend.seed import DEFAULT_VOLUMES, generate
+
+    path = tmp_path_factory.mktemp("budgets") / "budgets.db"
+    app = build_app(f"sqlite:///{path}", FRAGMENT_CACHE_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        generate({name: max(int(volume * SCALE), 2) for name, volume in DEFAULT_VOLUMES.items()}, seed=42)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def measured(app):
+    user_id = power_user(app)
+    targets, _ = discover_routes(app, sample_values(app, user_id))
+    client = app.test_client()
+    login(client, user_id)
+    return {
+        f"{method} {endpoint}": measure(client, method, url, data, iterations=3, warmup=1)
+        for endpoint, method, url, data in targets
+    }
+
+
+@pytest.mark.parametrize("key", sorted(QUERY_BUDGETS))
+def test_route_within_query_budget(measured, key):
+    assert key in measured, f"{key} was not measured (no sample arguments)"
+    assert measured[key]["queries"] <= QUERY_BUDGETS[key]
+
+
+def test_upvote_on_another_users_post_within_budget(app):
+    """The worst case: voting on someone else's post also enqueues the notification job."""
+    from backend.extensions import db
+    from backend.models import Post
+
+    user_id = power_user(app)
+    with app.app_context():
+        post_id = db.session.query(Post.id).filter(Post.user_id != user_id).order_by(Post.id).limit(1).scalar()
+    with app.test_request_context():
+        url = url_for("community.upvote_post", post_id=post_id)
+    client = app.test_client()
+    login(client, user_id)
+    result = measure(client, "POST", url, None, iterations=4, warmup=1)
+    assert result["status"] == [200]
+    assert result["queries"] <= QUERY_BUDGETS["POST community.upvote_post"]